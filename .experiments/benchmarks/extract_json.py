@@ -0,0 +1,80 @@
+"""
+Micro-benchmark for kaizen.helpers.parser.extract_json against the previous
+regex-based implementation, on the recorded responses in kaizen/tests/data.
+
+Run from the repository root:
+    python .experiments/benchmarks/extract_json.py
+"""
+
+import json
+import re
+import timeit
+from pathlib import Path
+
+from kaizen.helpers.parser import extract_json
+
+RESPONSES_PATH = (
+    Path(__file__).resolve().parents[2]
+    / "kaizen/tests/data/llm_responses/code_review.json"
+)
+
+
+def regex_extract_json(text):
+    # extract_json before the fast path and single-pass scanner were added.
+    start_index = text.find("{")
+    end_index = text.rfind("}") + 1
+    json_data = text[start_index:end_index]
+    json_data = re.sub(r"\s*\\*\n*\s*{\s*\n*\s*", "{", json_data)
+    json_data = re.sub(r"\s*\\*\n*\s*\[\s*\n*\s*", "[", json_data)
+    json_data = re.sub(r"\s*\\*\n*\s*}\s*\n*\s*", "}", json_data)
+    json_data = re.sub(r"\s*\\*\n\s*\]\s*\n\s*", "]", json_data)
+    json_data = re.sub(r",\s*\\*\n\s*", ",", json_data)
+    json_data = re.sub(r'"\s*\\*\n\s*', '"', json_data)
+    json_data = json_data.replace("\n", "\\n")
+    return json.loads(json_data)
+
+
+def bench(func, responses, number):
+    def run():
+        for response in responses:
+            try:
+                func(response)
+            except ValueError:
+                pass
+
+    return min(timeit.repeat(run, number=number, repeat=5)) / number
+
+
+def main(number=200):
+    responses = json.loads(RESPONSES_PATH.read_text())
+    valid = [r for r in responses if _is_valid(r)]
+    malformed = [r for r in responses if not _is_valid(r)]
+    print(f"{len(valid)} valid and {len(malformed)} malformed responses")
+
+    for name, group in (("valid", valid), ("malformed", malformed)):
+        old = bench(regex_extract_json, group, number)
+        new = bench(extract_json, group, number)
+        print(
+            f"{name:>9}: regex {old * 1e3:.3f} ms, "
+            f"extract_json {new * 1e3:.3f} ms ({old / new:.1f}x)"
+        )
+
+    differing = sum(
+        1 for r in responses if _safe(regex_extract_json, r) != _safe(extract_json, r)
+    )
+    print(f"{differing} responses parse differently (regex rewrites string content)")
+
+
+def _is_valid(response):
+    return _safe(json.loads, response[response.find("{") : response.rfind("}") + 1])
+
+
+def _safe(func, response):
+    try:
+        return func(response)
+    except ValueError:
+        return None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict
+
+# GitHub redelivers failed webhooks manually or within a few hours at most.
+DEFAULT_DELIVERY_TTL = 6 * 60 * 60
+
+
+class DeliveryTracker:
+    """
+    Remember `X-GitHub-Delivery` ids so redelivered webhooks are dropped.
+    """
+
+    def __init__(self, ttl: int = DEFAULT_DELIVERY_TTL):
+        self.ttl = ttl
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def is_duplicate(self, delivery_id: str) -> bool:
+        """
+        Record `delivery_id` and return True if it was already seen.
+        """
+        now = time.time()
+        with self._lock:
+            # Entries are kept in insertion order, so expired ones are in front.
+            while self._seen and next(iter(self._seen.values())) <= now:
+                self._seen.popitem(last=False)
+            if delivery_id in self._seen:
+                return True
+            self._seen[delivery_id] = now + self.ttl
+            return False
+
+
+class RedisDeliveryTracker(DeliveryTracker):
+    def __init__(
+        self,
+        ttl: int = DEFAULT_DELIVERY_TTL,
+        key_prefix: str = "kaizen:github_delivery:",
+    ):
+        super().__init__(ttl=ttl)
+        import redis
+
+        host = os.environ.get("REDIS_HOST")
+        port = os.environ.get("REDIS_PORT")
+        if not host or not port:
+            raise ValueError(
+                "Redis is enabled but REDIS_HOST or REDIS_PORT environment variables are missing"
+            )
+        self._client = redis.Redis(host=host, port=int(port))
+        self.key_prefix = key_prefix
+
+    def is_duplicate(self, delivery_id: str) -> bool:
+        return not self._client.set(
+            self.key_prefix + delivery_id, 1, nx=True, ex=self.ttl
+        )
+
+
+def create_delivery_tracker(config: Dict[str, Any]) -> DeliveryTracker:
+    if config.get("language_model", {}).get("redis_enabled", False):
+        return RedisDeliveryTracker()
+    return DeliveryTracker()
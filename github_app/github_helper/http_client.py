@@ -0,0 +1,153 @@
+import hashlib
+import json
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from kaizen.llms.cache import RedisCache, SQLiteCache
+from kaizen.utils.config import ConfigData
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 20
+DEFAULT_TIMEOUT = 30
+DEFAULT_HTTP_CACHE_PATH = ".kaizen/cache/github_http.db"
+DEFAULT_HTTP_CACHE_TTL = 24 * 60 * 60
+DEFAULT_HTTP_CACHE_MAX_ENTRIES = 5000
+# Larger bodies (e.g. diffs of big PRs) are not worth keeping: entries are
+# per token and tokens rotate hourly, so they are rarely served again.
+DEFAULT_HTTP_CACHE_MAX_BODY = 1024 * 1024
+
+_session = None
+_http_cache = None
+_lock = threading.Lock()
+
+
+def _pool_size():
+    github_app_config = ConfigData().get_config_data().get("github_app", {})
+    return github_app_config.get("http_pool_size", DEFAULT_POOL_SIZE)
+
+
+class TimeoutSession(requests.Session):
+    """A session that applies DEFAULT_TIMEOUT to requests made without one."""
+
+    def request(self, *args, **kwargs):
+        kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+        return super().request(*args, **kwargs)
+
+
+def get_session() -> requests.Session:
+    """
+    Return the process-wide requests session used for GitHub calls, so
+    connections are kept alive and reused across webhook jobs.
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                pool_size = _pool_size()
+                session = TimeoutSession()
+                adapter = HTTPAdapter(
+                    pool_connections=pool_size, pool_maxsize=pool_size
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def close_clients():
+    global _session
+    with _lock:
+        session, _session = _session, None
+    if session is not None:
+        session.close()
+
+
+def _get_http_cache():
+    global _http_cache
+    if _http_cache is None:
+        with _lock:
+            if _http_cache is None:
+                config = ConfigData().get_config_data()
+                kwargs = {
+                    "ttl": DEFAULT_HTTP_CACHE_TTL,
+                    "max_entries": DEFAULT_HTTP_CACHE_MAX_ENTRIES,
+                }
+                if config.get("language_model", {}).get("redis_enabled", False):
+                    _http_cache = RedisCache(key_prefix="kaizen:github_http:", **kwargs)
+                else:
+                    _http_cache = SQLiteCache(path=DEFAULT_HTTP_CACHE_PATH, **kwargs)
+    return _http_cache
+
+
+def _http_cache_key(url, headers, params):
+    # The credentials are part of the key so a body fetched with one
+    # installation's token is never served to another installation.
+    authorization = headers.get("Authorization") or ""
+    key = json.dumps(
+        {
+            "url": url,
+            "accept": headers.get("Accept"),
+            "params": params,
+            "auth": hashlib.sha256(authorization.encode("utf-8")).hexdigest(),
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def cached_get(url, headers=None, params=None) -> requests.Response:
+    """
+    GET a GitHub resource with a conditional request.
+
+    Successful responses are stored with their ETag / Last-Modified
+    validators. When GitHub answers 304 Not Modified, which does not count
+    against the rate limit, the stored body is returned as a 200 response.
+    """
+    headers = dict(headers or {})
+    cache = _get_http_cache()
+    key = _http_cache_key(url, headers, params)
+    try:
+        cached = cache.get(key)
+    except Exception as e:
+        logger.warning(f"GitHub HTTP cache lookup failed: {e}")
+        cached = None
+
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    response = get_session().get(url, headers=headers, params=params)
+    if response.status_code == 304 and cached:
+        response.status_code = 200
+        response._content = cached["content"].encode("utf-8")
+        response.encoding = "utf-8"
+        if cached.get("link"):
+            response.headers["Link"] = cached["link"]
+        return response
+
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if (
+        response.status_code == 200
+        and (etag or last_modified)
+        and len(response.content) <= DEFAULT_HTTP_CACHE_MAX_BODY
+    ):
+        try:
+            cache.set(
+                key,
+                {
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "link": response.headers.get("Link"),
+                    "content": response.text,
+                },
+            )
+        except Exception as e:
+            logger.warning(f"GitHub HTTP cache update failed: {e}")
+    return response
@@ -1,26 +1,59 @@
+import threading
+import time
+from datetime import datetime, timezone
 from github_app.github_helper import utils
-import requests
+from github_app.github_helper import http_client
 from github_app.github_helper.endpoints import GITHUB_ENDPOINTS
 
 
+_token_cache = {}
+_token_locks = {}
+_token_cache_lock = threading.Lock()
+
+
+def _parse_expires_at(expires_at):
+    return datetime.strptime(expires_at, "%Y-%m-%dT%H:%M:%SZ").replace(
+        tzinfo=timezone.utc
+    )
+
+
 def get_installations():
-    headers = utils.HEADERS
+    headers = dict(utils.HEADERS)
     headers["Authorization"] = f"Bearer {utils.generate_jwt()}"
     url = GITHUB_ENDPOINTS["get_installations"]
-    response = requests.get(url, headers=headers)
+    response = http_client.get_session().get(url, headers=headers)
     response.raise_for_status()
     return response.json()
 
 
 def get_installation_access_token(installation_id, permissions=None):
-    headers = utils.HEADERS
-    headers["Authorization"] = f"Bearer {utils.generate_jwt()}"
-    url = GITHUB_ENDPOINTS["get_installation_access_token"].format(
-        installation_id=installation_id
-    )
-    body = {}
-    if permissions:
-        body["permissions"] = permissions
-    response = requests.post(url, headers=headers)
-    response.raise_for_status()
-    return response.json()["token"]
+    """
+    Return an installation access token.
+
+    Tokens carry the app's full grant for the installation (`permissions`
+    is not sent), so they are cached per installation and reused until
+    shortly before their `expires_at`. A webhook that makes several API
+    calls only mints one token.
+    """
+    key = installation_id
+    with _token_cache_lock:
+        lock = _token_locks.setdefault(key, threading.Lock())
+
+    with lock:
+        cached = _token_cache.get(key)
+        if cached and cached[1] - utils.CREDENTIAL_EXPIRY_MARGIN > time.time():
+            return cached[0]
+
+        headers = dict(utils.HEADERS)
+        headers["Authorization"] = f"Bearer {utils.generate_jwt()}"
+        url = GITHUB_ENDPOINTS["get_installation_access_token"].format(
+            installation_id=installation_id
+        )
+        response = http_client.get_session().post(url, headers=headers)
+        response.raise_for_status()
+        data = response.json()
+        _token_cache[key] = (
+            data["token"],
+            _parse_expires_at(data["expires_at"]).timestamp(),
+        )
+    return data["token"]
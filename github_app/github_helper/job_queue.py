@@ -0,0 +1,403 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_PATH = ".kaizen/queue/jobs.db"
+DEFAULT_WORKERS = 4
+DEFAULT_PER_REPO_CONCURRENCY = 1
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_BACKOFF = 30
+DEFAULT_POLL_INTERVAL = 1
+# A running job whose worker died is handed out again after this many seconds.
+DEFAULT_LEASE_TIMEOUT = 30 * 60
+
+
+class JobNotRetryable(Exception):
+    """
+    Raised by a handler that failed after it already had visible effects,
+    e.g. once a review was posted, so that running it again would repeat them.
+    """
+
+
+@dataclass
+class Job:
+    id: str
+    task: str
+    payload: Dict[str, Any]
+    repo: str
+    dedup_key: str
+    attempts: int = 0
+
+
+def pull_request_job_key(task: str, payload: Dict[str, Any]) -> str:
+    """
+    Identify the work a webhook asks for, so redeliveries and overlapping
+    events (e.g. `opened` and `review_requested`) for the same head commit
+    only run once.
+    """
+    repo_name = payload["repository"]["full_name"]
+    pull_number = payload["pull_request"]["number"]
+    head_sha = payload["pull_request"]["head"]["sha"]
+    return f"{repo_name}#{pull_number}@{head_sha}:{task}"
+
+
+class JobQueue(ABC):
+    @abstractmethod
+    def enqueue(
+        self,
+        task: str,
+        payload: Dict[str, Any],
+        repo: str,
+        dedup_key: str,
+        delay: float = 0,
+    ):
+        """
+        Add a job unless an identical one is already pending or running.
+        The job becomes available to workers after `delay` seconds.
+
+        :return: True if the job was queued, False if it was a duplicate
+        """
+
+    @abstractmethod
+    def claim(self, exclude_repos: Iterable[str] = ()) -> Optional[Job]:
+        pass
+
+    @abstractmethod
+    def complete(self, job: Job) -> None:
+        pass
+
+    @abstractmethod
+    def retry(self, job: Job, delay: float) -> None:
+        pass
+
+    @abstractmethod
+    def fail(self, job: Job) -> None:
+        pass
+
+
+class SQLiteJobQueue(JobQueue):
+    def __init__(
+        self, path: str = DEFAULT_QUEUE_PATH, lease_timeout: int = DEFAULT_LEASE_TIMEOUT
+    ):
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.lease_timeout = lease_timeout
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, task TEXT NOT NULL, payload TEXT NOT NULL, "
+                "repo TEXT NOT NULL, dedup_key TEXT NOT NULL, status TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL, available_at REAL NOT NULL)"
+            )
+            # Failed jobs are kept for inspection but must not block a new
+            # delivery of the same work.
+            self._conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS jobs_dedup ON jobs(dedup_key) "
+                "WHERE status IN ('pending', 'running')"
+            )
+
+    def enqueue(self, task, payload, repo, dedup_key, delay=0):
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO jobs VALUES (?, ?, ?, ?, ?, 'pending', 0, ?)",
+                (
+                    uuid.uuid4().hex,
+                    task,
+                    json.dumps(payload),
+                    repo,
+                    dedup_key,
+                    time.time() + delay,
+                ),
+            )
+        return cursor.rowcount == 1
+
+    def claim(self, exclude_repos=()):
+        exclude_repos = list(exclude_repos)
+        now = time.time()
+        with self._lock, self._conn:
+            # Take the database write lock before reading, so a worker in
+            # another process cannot claim the same row between the SELECT
+            # and the UPDATE below.
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "UPDATE jobs SET status = 'pending' "
+                "WHERE status = 'running' AND available_at <= ?",
+                (now,),
+            )
+            placeholders = ",".join("?" * len(exclude_repos))
+            row = self._conn.execute(
+                "SELECT id, task, payload, repo, dedup_key, attempts FROM jobs "
+                "WHERE status = 'pending' AND available_at <= ? "
+                f"AND repo NOT IN ({placeholders}) "
+                "ORDER BY available_at LIMIT 1",
+                (now, *exclude_repos),
+            ).fetchone()
+            if row is None:
+                return None
+            # While running, available_at holds the lease deadline.
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', available_at = ? WHERE id = ?",
+                (now + self.lease_timeout, row[0]),
+            )
+        job_id, task, payload, repo, dedup_key, attempts = row
+        return Job(job_id, task, json.loads(payload), repo, dedup_key, attempts)
+
+    def complete(self, job):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job.id,))
+
+    def retry(self, job, delay):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'pending', attempts = ?, available_at = ? "
+                "WHERE id = ?",
+                (job.attempts, time.time() + delay, job.id),
+            )
+
+    def fail(self, job):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', attempts = ? WHERE id = ?",
+                (job.attempts, job.id),
+            )
+
+
+class RedisJobQueue(JobQueue):
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        port: Optional[str] = None,
+        lease_timeout: int = DEFAULT_LEASE_TIMEOUT,
+        key_prefix: str = "kaizen:jobs:",
+    ):
+        import redis
+
+        host = host or os.environ.get("REDIS_HOST")
+        port = port or os.environ.get("REDIS_PORT")
+        if not host or not port:
+            raise ValueError(
+                "Redis job queue is enabled but REDIS_HOST or REDIS_PORT environment variables are missing"
+            )
+        self._client = redis.Redis(host=host, port=int(port))
+        self.lease_timeout = lease_timeout
+        self.key_prefix = key_prefix
+        # Sorted sets scored by the time a job becomes available / its lease ends.
+        self._pending = key_prefix + "pending"
+        self._running = key_prefix + "running"
+
+    def _job_key(self, job_id):
+        return self.key_prefix + "job:" + job_id
+
+    def _dedup_key(self, dedup_key):
+        return self.key_prefix + "dedup:" + dedup_key
+
+    def enqueue(self, task, payload, repo, dedup_key, delay=0):
+        job = Job(uuid.uuid4().hex, task, payload, repo, dedup_key)
+        if not self._client.set(self._dedup_key(dedup_key), job.id, nx=True):
+            return False
+        pipe = self._client.pipeline()
+        pipe.set(self._job_key(job.id), json.dumps(job.__dict__))
+        pipe.zadd(self._pending, {job.id: time.time() + delay})
+        pipe.execute()
+        return True
+
+    def _requeue_expired(self, now):
+        for job_id in self._client.zrangebyscore(self._running, "-inf", now):
+            if self._client.zrem(self._running, job_id):
+                self._client.zadd(self._pending, {job_id: now})
+
+    def claim(self, exclude_repos=()):
+        exclude_repos = set(exclude_repos)
+        now = time.time()
+        self._requeue_expired(now)
+        for job_id in self._client.zrangebyscore(self._pending, "-inf", now):
+            job_id = job_id.decode() if isinstance(job_id, bytes) else job_id
+            data = self._client.get(self._job_key(job_id))
+            if data is None:
+                self._client.zrem(self._pending, job_id)
+                continue
+            job = Job(**json.loads(data))
+            if job.repo in exclude_repos:
+                continue
+            # Only the worker whose ZREM succeeds owns the job.
+            if self._client.zrem(self._pending, job_id):
+                self._client.zadd(self._running, {job_id: now + self.lease_timeout})
+                return job
+        return None
+
+    def complete(self, job):
+        pipe = self._client.pipeline()
+        pipe.zrem(self._running, job.id)
+        pipe.delete(self._job_key(job.id), self._dedup_key(job.dedup_key))
+        pipe.execute()
+
+    def retry(self, job, delay):
+        pipe = self._client.pipeline()
+        pipe.set(self._job_key(job.id), json.dumps(job.__dict__))
+        pipe.zrem(self._running, job.id)
+        pipe.zadd(self._pending, {job.id: time.time() + delay})
+        pipe.execute()
+
+    def fail(self, job):
+        pipe = self._client.pipeline()
+        pipe.zrem(self._running, job.id)
+        pipe.delete(self._job_key(job.id), self._dedup_key(job.dedup_key))
+        pipe.execute()
+
+
+class WorkerPool:
+    """
+    Run queued jobs on a fixed number of threads.
+
+    At most `per_repo_concurrency` jobs of one repository run at a time in
+    this pool. Failing jobs are retried with exponential backoff until
+    `max_attempts` is reached, unless the handler raises JobNotRetryable.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handlers: Dict[str, Callable[[Dict[str, Any]], Any]],
+        workers: int = DEFAULT_WORKERS,
+        per_repo_concurrency: int = DEFAULT_PER_REPO_CONCURRENCY,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        retry_backoff: float = DEFAULT_RETRY_BACKOFF,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+    ):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = workers
+        self.per_repo_concurrency = per_repo_concurrency
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.poll_interval = poll_interval
+        self._running = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._threads = []
+
+    def submit(
+        self,
+        task: str,
+        payload: Dict[str, Any],
+        repo: str,
+        dedup_key: str,
+        delay: float = 0,
+    ):
+        queued = self.queue.enqueue(task, payload, repo, dedup_key, delay=delay)
+        if queued:
+            self._wakeup.set()
+        else:
+            logger.info(f"Skipping duplicate job: {dedup_key}")
+        return queued
+
+    def start(self):
+        self._stopped.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._work, name=f"kaizen-worker-{index}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stopped.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _claim(self) -> Optional[Job]:
+        with self._lock:
+            busy = [
+                repo
+                for repo, count in self._running.items()
+                if count >= self.per_repo_concurrency
+            ]
+            job = self.queue.claim(exclude_repos=busy)
+            if job is not None:
+                self._running[job.repo] = self._running.get(job.repo, 0) + 1
+            return job
+
+    def _release(self, job: Job):
+        with self._lock:
+            self._running[job.repo] -= 1
+            if not self._running[job.repo]:
+                del self._running[job.repo]
+        # A slot for this repo opened up; let idle workers look again.
+        self._wakeup.set()
+
+    def _work(self):
+        while not self._stopped.is_set():
+            try:
+                job = self._claim()
+            except Exception:
+                logger.exception("Unable to claim job from queue")
+                job = None
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            try:
+                self.run_job(job)
+            finally:
+                self._release(job)
+
+    def run_job(self, job: Job):
+        job.attempts += 1
+        try:
+            self.handlers[job.task](job.payload)
+        except JobNotRetryable:
+            logger.exception(f"Job {job.dedup_key} failed and will not be retried")
+            self.queue.fail(job)
+            return
+        except Exception:
+            if job.attempts < self.max_attempts:
+                delay = self.retry_backoff * 2 ** (job.attempts - 1)
+                logger.exception(
+                    f"Job {job.dedup_key} failed (attempt {job.attempts}), retrying in {delay}s"
+                )
+                self.queue.retry(job, delay)
+            else:
+                logger.exception(
+                    f"Job {job.dedup_key} failed after {job.attempts} attempts"
+                )
+                self.queue.fail(job)
+            return
+        self.queue.complete(job)
+
+
+def create_job_queue(config: Dict[str, Any]) -> JobQueue:
+    queue_config = config.get("github_app", {}).get("job_queue", {})
+    if config.get("language_model", {}).get("redis_enabled", False):
+        return RedisJobQueue()
+    return SQLiteJobQueue(path=queue_config.get("path", DEFAULT_QUEUE_PATH))
+
+
+def create_worker_pool(
+    config: Dict[str, Any], handlers: Dict[str, Callable[[Dict[str, Any]], Any]]
+) -> WorkerPool:
+    queue_config = config.get("github_app", {}).get("job_queue", {})
+    return WorkerPool(
+        create_job_queue(config),
+        handlers,
+        workers=queue_config.get("workers", DEFAULT_WORKERS),
+        per_repo_concurrency=queue_config.get(
+            "per_repo_concurrency", DEFAULT_PER_REPO_CONCURRENCY
+        ),
+        max_attempts=queue_config.get("max_attempts", DEFAULT_MAX_ATTEMPTS),
+        retry_backoff=queue_config.get("retry_backoff", DEFAULT_RETRY_BACKOFF),
+    )
@@ -0,0 +1,63 @@
+import os
+import threading
+from typing import Any, Dict, Optional
+
+
+def pull_request_key(payload: Dict[str, Any]) -> str:
+    repo_name = payload["repository"]["full_name"]
+    pull_number = payload["pull_request"]["number"]
+    return f"{repo_name}#{pull_number}"
+
+
+class PullRequestHeads:
+    """
+    Track the newest head sha queued for review on each PR, so a running
+    review of an older push can notice it was superseded.
+    """
+
+    def __init__(self):
+        self._heads = {}
+        self._lock = threading.Lock()
+
+    def set_head(self, pr_key: str, head_sha: str) -> None:
+        with self._lock:
+            self._heads[pr_key] = head_sha
+
+    def get_head(self, pr_key: str) -> Optional[str]:
+        with self._lock:
+            return self._heads.get(pr_key)
+
+    def is_superseded(self, payload: Dict[str, Any]) -> bool:
+        latest = self.get_head(pull_request_key(payload))
+        return latest is not None and latest != payload["pull_request"]["head"]["sha"]
+
+
+class RedisPullRequestHeads(PullRequestHeads):
+    # Heads of PRs that saw no push for a week are forgotten.
+    TTL = 7 * 24 * 60 * 60
+
+    def __init__(self, key_prefix: str = "kaizen:pr_head:"):
+        super().__init__()
+        import redis
+
+        host = os.environ.get("REDIS_HOST")
+        port = os.environ.get("REDIS_PORT")
+        if not host or not port:
+            raise ValueError(
+                "Redis is enabled but REDIS_HOST or REDIS_PORT environment variables are missing"
+            )
+        self._client = redis.Redis(host=host, port=int(port))
+        self.key_prefix = key_prefix
+
+    def set_head(self, pr_key: str, head_sha: str) -> None:
+        self._client.set(self.key_prefix + pr_key, head_sha, ex=self.TTL)
+
+    def get_head(self, pr_key: str) -> Optional[str]:
+        head = self._client.get(self.key_prefix + pr_key)
+        return head.decode() if isinstance(head, bytes) else head
+
+
+def create_pull_request_heads(config: Dict[str, Any]) -> PullRequestHeads:
+    if config.get("language_model", {}).get("redis_enabled", False):
+        return RedisPullRequestHeads()
+    return PullRequestHeads()
@@ -1,13 +1,17 @@
-import requests
+from github_app.github_helper import http_client
 import logging
 import os
-from github_app.github_helper.utils import get_diff_text, get_pr_files
+import threading
+from github_app.github_helper.utils import get_pr_diff, get_pr_files
+from github_app.github_helper.job_queue import JobNotRetryable
 from github_app.github_helper.installation import get_installation_access_token
 from github_app.github_helper.permissions import PULL_REQUEST_PERMISSION
-from kaizen.reviewer.code_review import CodeReviewer
+from kaizen.reviewer.code_review import CodeReviewer, ReviewCancelled
+from kaizen.reviewer import incremental
 from kaizen.generator.pr_description import PRDescriptionGenerator
 from kaizen.formatters.code_review_formatter import create_pr_review_text
 from kaizen.llms.provider import LLMProvider
+from kaizen.utils.config import ConfigData
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +19,34 @@ GITHUB_API_BASE_URL = os.environ["GITHUB_API_BASE_URL"]
 
 ACTIONS_TO_PROCESS_PR = ["opened", "reopened", "review_requested", "ready_for_review"]
 ACTIONS_TO_UPDATE_DESC = ["opened", "reopened"]
+ACTIONS_TO_PROCESS_PUSH = ["synchronize"]
+MAX_COMMENTS_PER_REVIEW = 50
+
+_review_store = None
+_providers = {}
+# Worker threads pick up their first jobs at the same time.
+_shared_lock = threading.Lock()
+
+
+def get_review_store():
+    global _review_store
+    with _shared_lock:
+        if _review_store is None:
+            _review_store = incremental.create_hunk_review_store(
+                ConfigData().get_config_data()
+            )
+        return _review_store
+
+
+def get_llm_provider(default_temperature=0.3):
+    # Providers keep no per-call state, so review and description jobs on
+    # different worker threads share one instance per temperature.
+    with _shared_lock:
+        if default_temperature not in _providers:
+            _providers[default_temperature] = LLMProvider(
+                default_temperature=default_temperature
+            )
+        return _providers[default_temperature]
 
 
 confidence_mapping = {
@@ -26,13 +58,16 @@ confidence_mapping = {
 }
 
 
-def process_pull_request(payload):
+def process_pull_request(payload, is_cancelled=None):
+    """
+    :param is_cancelled: Optional callable returning True once a newer push
+        superseded this review; the review then stops between LLM calls and
+        nothing is posted.
+    """
     comment_url = payload["pull_request"]["comments_url"]
     repo_name = payload["repository"]["full_name"]
     pull_number = payload["pull_request"]["number"]
-    diff_url = GITHUB_API_BASE_URL + f"/repos/{repo_name}/pulls/{pull_number}.diff"
     review_url = GITHUB_API_BASE_URL + f"/repos/{repo_name}/pulls/{pull_number}/reviews"
-    pr_files_url = GITHUB_API_BASE_URL + f"/repos/{repo_name}/pulls/{pull_number}/files"
     installation_id = payload["installation"]["id"]
     pr_title = payload["pull_request"]["title"]
     pr_description = payload["pull_request"]["body"]
@@ -40,26 +75,71 @@ def process_pull_request(payload):
     access_token = get_installation_access_token(
         installation_id, PULL_REQUEST_PERMISSION
     )
-    diff_text = get_diff_text(diff_url, access_token)
+    diff_text, pr_files = get_pull_request_diff(payload, access_token)
 
-    # Get PR Files
-    pr_files = get_pr_files(pr_files_url, access_token)
-
-    reviewer = CodeReviewer(llm_provider=LLMProvider(default_temperature=0.1))
-    review_data = reviewer.review_pull_request(
-        diff_text=diff_text,
-        pull_request_title=pr_title,
-        pull_request_desc=pr_description,
-        pull_request_files=pr_files,
-        user=repo_name,
-    )
+    reviewer = CodeReviewer(llm_provider=get_llm_provider(default_temperature=0.1))
+    review_store = get_review_store()
+    review_key = f"{repo_name}#{pull_number}"
+    try:
+        if payload["action"] in ACTIONS_TO_PROCESS_PUSH:
+            # Hunks already reviewed on an earlier run of this PR are not
+            # re-sent to the LLM; their stored issues are re-attached instead.
+            review_data = reviewer.review_pull_request_incremental(
+                pull_request_title=pr_title,
+                pull_request_desc=pr_description,
+                pull_request_files=pr_files,
+                review_store=review_store,
+                review_key=review_key,
+                user=repo_name,
+                parallel=True,
+                is_cancelled=is_cancelled,
+            )
+        else:
+            # Opening a PR or explicitly requesting a review covers the
+            # whole diff, whatever was reviewed before.
+            review_data = reviewer.review_pull_request(
+                diff_text=diff_text,
+                pull_request_title=pr_title,
+                pull_request_desc=pr_description,
+                pull_request_files=pr_files,
+                user=repo_name,
+                parallel=True,
+                is_cancelled=is_cancelled,
+            )
+    except ReviewCancelled:
+        logger.info(f"Review of {repo_name}#{pull_number} superseded by a newer push")
+        return
+    if is_cancelled is not None and is_cancelled():
+        logger.info(f"Review of {repo_name}#{pull_number} superseded by a newer push")
+        return
     topics = clean_keys(review_data.topics, "important")
     review_desc = create_pr_review_text(topics)
     comments, topics = create_review_comments(topics)
+    # Line comments for re-attached issues were posted on the earlier run.
+    comments = [review for review in comments if not review.get("cached")]
 
-    post_pull_request(comment_url, review_desc, installation_id)
-    for review in comments:
-        post_pull_request_comments(review_url, review, installation_id)
+    try:
+        post_pull_request(comment_url, review_desc, installation_id)
+        post_pull_request_reviews(review_url, comments, installation_id)
+    except Exception as e:
+        # Part of the review may already be on the PR; a retry would post it
+        # twice. The hunks stay unsaved, so the next push reviews them again.
+        raise JobNotRetryable(
+            f"Posting the review of {repo_name}#{pull_number} failed"
+        ) from e
+    # Only hunks whose comments reached GitHub count as reviewed; a run that
+    # failed or was superseded before this point reviews them again.
+    if is_cancelled is not None and is_cancelled():
+        return
+    hunk_issues = review_data.hunk_issues
+    if hunk_issues is None:
+        # Seed the store from the full review so the next push is incremental.
+        hunks = incremental.collect_hunks(pr_files or [])
+        hunk_issues = incremental.assign_issues(review_data.issues, hunks)
+    try:
+        review_store.save(review_key, hunk_issues, review_data.code_quality)
+    except Exception:
+        logger.exception(f"Unable to save reviewed hunks of {repo_name}#{pull_number}")
 
 
 def create_review_comments(topics, confidence_level=4):
@@ -75,12 +155,30 @@ def create_review_comments(topics, confidence_level=4):
     return comments, topics
 
 
+def get_pull_request_diff(payload, access_token):
+    """
+    Fetch the PR diff once and derive the per-file patches from it. The
+    result is shared by the review and description tasks of the same push.
+    """
+    repo_name = payload["repository"]["full_name"]
+    pull_number = payload["pull_request"]["number"]
+    diff_text, pr_files = get_pr_diff(
+        payload["pull_request"]["url"],
+        payload["pull_request"]["head"]["sha"],
+        access_token,
+    )
+    if pr_files is None:
+        # GitHub refuses to render very large diffs; fall back to /files.
+        pr_files_url = (
+            GITHUB_API_BASE_URL + f"/repos/{repo_name}/pulls/{pull_number}/files"
+        )
+        pr_files = get_pr_files(pr_files_url, access_token)
+    return diff_text, pr_files
+
+
 def process_pr_desc(payload):
     pr_url = payload["pull_request"]["url"]
     repo_name = payload["repository"]["full_name"]
-    pull_number = payload["pull_request"]["number"]
-    diff_url = GITHUB_API_BASE_URL + f"/repos/{repo_name}/pulls/{pull_number}.diff"
-    pr_files_url = GITHUB_API_BASE_URL + f"/repos/{repo_name}/pulls/{pull_number}/files"
     installation_id = payload["installation"]["id"]
     pr_title = payload["pull_request"]["title"]
     pr_description = payload["pull_request"]["body"]
@@ -89,11 +187,8 @@ def process_pr_desc(payload):
         installation_id, PULL_REQUEST_PERMISSION
     )
 
-    # Get PR Files
-    pr_files = get_pr_files(pr_files_url, installation_id)
-
-    diff_text = get_diff_text(diff_url, access_token)
-    desc_generator = PRDescriptionGenerator(llm_provider=LLMProvider())
+    diff_text, pr_files = get_pull_request_diff(payload, access_token)
+    desc_generator = PRDescriptionGenerator(llm_provider=get_llm_provider())
     description = desc_generator.generate_pull_request_desc(
         diff_text=diff_text,
         pull_request_title=pr_title,
@@ -115,8 +210,9 @@ def post_pull_request(url, data, installation_id):
         "Authorization": f"Bearer {access_token}",
         "Accept": "application/vnd.github.v3+json",
     }
-    response = requests.post(url, headers=headers, json=data)
+    response = http_client.get_session().post(url, headers=headers, json=data)
     logger.debug(f"Post Pull request response: {response.text}")
+    response.raise_for_status()
 
 
 def patch_pr_body(url, data, installation_id):
@@ -128,8 +224,9 @@ def patch_pr_body(url, data, installation_id):
         "Authorization": f"Bearer {access_token}",
         "Accept": "application/vnd.github.v3+json",
     }
-    response = requests.patch(url, headers=headers, json=data)
+    response = http_client.get_session().patch(url, headers=headers, json=data)
     logger.debug(f"Patch Pull request response: {response.text}")
+    response.raise_for_status()
 
 
 def clean_keys(topics, min_confidence=None):
@@ -154,24 +251,79 @@ def clean_keys(topics, min_confidence=None):
     return new_topics
 
 
-def post_pull_request_comments(url, review, installation_id):
-    access_token = get_installation_access_token(
-        installation_id, PULL_REQUEST_PERMISSION
-    )
+def create_review_comment(review):
+    comment = {
+        "path": review["file_path"],
+        "line": review["end_line"],
+        "body": review["description"],
+    }
+    # GitHub rejects multi-line comments whose start_line is not before line.
+    try:
+        if int(review["start_line"]) < int(review["end_line"]):
+            comment["start_line"] = review["start_line"]
+    except (TypeError, ValueError):
+        pass
+    return comment
+
+
+def post_review(url, comments, access_token):
     data = {
         "event": "REQUEST_CHANGES",
-        "comments": [
-            {
-                "path": review["file_path"],
-                "start_line": review["start_line"],
-                "line": review["end_line"],
-                "body": review["description"],
-            }
-        ],
+        "comments": comments,
     }
     headers = {
         "Authorization": f"Bearer {access_token}",
         "Accept": "application/vnd.github.v3+json",
     }
-    response = requests.post(url, headers=headers, json=data)
+    response = http_client.get_session().post(url, headers=headers, json=data)
     logger.debug(f"Post Review comment response: {response.text}")
+    return response
+
+
+def post_pull_request_comments(url, review, installation_id):
+    access_token = get_installation_access_token(
+        installation_id, PULL_REQUEST_PERMISSION
+    )
+    return post_review(url, [create_review_comment(review)], access_token)
+
+
+def post_pull_request_reviews(url, reviews, installation_id):
+    """
+    Submit all line comments of a run as one review, split into batches of
+    MAX_COMMENTS_PER_REVIEW. GitHub rejects a whole review if any comment
+    in it cannot be anchored to the diff, so a rejected batch is retried
+    one comment per review to keep the valid comments.
+
+    Raises `requests.HTTPError` for any other failed post, so the caller
+    never treats undelivered comments as posted.
+    """
+    if not reviews:
+        return
+    access_token = get_installation_access_token(
+        installation_id, PULL_REQUEST_PERMISSION
+    )
+    for start in range(0, len(reviews), MAX_COMMENTS_PER_REVIEW):
+        batch = reviews[start : start + MAX_COMMENTS_PER_REVIEW]
+        response = post_review(
+            url, [create_review_comment(review) for review in batch], access_token
+        )
+        if response.status_code != 422:
+            response.raise_for_status()
+            continue
+        if len(batch) > 1:
+            logger.warning(
+                f"Review with {len(batch)} comments was rejected, posting them individually"
+            )
+            responses = [
+                post_review(url, [create_review_comment(review)], access_token)
+                for review in batch
+            ]
+        else:
+            responses = [response]
+        for response in responses:
+            if response.status_code == 422:
+                # The comment cannot be anchored to the diff; posting it
+                # again on a later run would be rejected the same way.
+                logger.warning(f"Review comment was rejected: {response.text}")
+            else:
+                response.raise_for_status()
@@ -1,10 +1,15 @@
 import os
 import jwt
+import functools
 import time
-import requests
+from github_app.github_helper import http_client
 import logging
+import requests
 import hmac
 import hashlib
+import threading
+from cryptography.hazmat.primitives import serialization
+from kaizen.helpers import parser
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +18,15 @@ GITHUB_APP_ID = os.environ.get("GITHUB_APP_ID")
 GITHUB_APP_WEBHOOK_SECRET = os.environ.get("GITHUB_APP_WEBHOOK_SECRET")
 
 
+PR_DIFF_CACHE_TTL = 300
+PR_FILES_PAGE_SIZE = 100
+PATCH_MEDIA_TYPE = "application/vnd.github.v3.patch"
+DIFF_MEDIA_TYPE = "application/vnd.github.v3.diff"
+
+_pr_diff_cache = {}
+_pr_diff_locks = {}
+_pr_diff_cache_lock = threading.Lock()
+
 HEADERS = {
     "Authorization": None,
     "Accept": "application/vnd.github.v3+json",
@@ -24,55 +38,152 @@ def is_successful_status(status_code):
     return 200 <= status_code < 300
 
 
+JWT_LIFETIME = 7 * 60
+# Refresh cached credentials this many seconds before they expire.
+CREDENTIAL_EXPIRY_MARGIN = 60
+
+_jwt_cache = {"token": None, "expires_at": 0}
+_jwt_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=None)
+def load_private_key(file_path):
+    """
+    Read and parse the GitHub App private key once per path.
+    """
+    logger.info(f"Loading GitHub App private key from: {file_path}")
+    with open(file_path, "rb") as f:
+        return serialization.load_pem_private_key(f.read(), password=None)
+
+
 def generate_jwt():
-    # Define the time the JWT was issued and its expiration time
-    issued_at_time = int(time.time())
-    expiration_time = issued_at_time + (7 * 60)  # JWT expires in 15 minutes
-
-    # Define the JWT payload
-    payload = {"iat": issued_at_time, "exp": expiration_time, "iss": GITHUB_APP_ID}
-    file_path = os.environ.get("GITHUB_APP_PEM_PATH", "GITHUB_APP_KEY.pem")
-    logger.info(f"filepath: {file_path}")
-    with open(file_path, "r") as f:
+    """
+    Return an app JWT, reusing the previous one until it is about to expire.
+    """
+    with _jwt_lock:
+        if _jwt_cache["expires_at"] - CREDENTIAL_EXPIRY_MARGIN > time.time():
+            return _jwt_cache["token"]
+
+        # Define the time the JWT was issued and its expiration time
+        issued_at_time = int(time.time())
+        expiration_time = issued_at_time + JWT_LIFETIME
+
+        # Define the JWT payload
+        payload = {"iat": issued_at_time, "exp": expiration_time, "iss": GITHUB_APP_ID}
+        file_path = os.environ.get("GITHUB_APP_PEM_PATH", "GITHUB_APP_KEY.pem")
         # Encode the JWT using the RS256 algorithm
-        encoded_jwt = jwt.encode(payload, f.read(), algorithm="RS256")
-        logger.info(f"f.read(): {f.read()}")
+        encoded_jwt = jwt.encode(
+            payload, load_private_key(file_path), algorithm="RS256"
+        )
+        _jwt_cache["token"] = encoded_jwt
+        _jwt_cache["expires_at"] = expiration_time
     return encoded_jwt
 
 
-def get_diff_text(url, access_token):
+def get_diff_text(url, access_token, media_type=PATCH_MEDIA_TYPE):
     headers = {
-        "Accept": "application/vnd.github.v3.patch",
+        "Accept": media_type,
         "X-GitHub-Api-Version": "2022-11-28",
     }
     if access_token:
         headers["Authorization"] = f"Bearer {access_token}"
 
-    response = requests.get(url, headers=headers)
+    response = http_client.cached_get(url, headers=headers)
     if not is_successful_status(response.status_code):
         logger.error(
-            f"Unable to fetch PR diff with error: {response.status_code} url: {url}"
+            f"Unable to fetch PR diff with error: {response.status_code} "
+            f"url: {url} response: {response.text}"
         )
-        print(response.text)
         return None
     return response.text
 
 
-def get_pr_files(url, access_token):
+def iter_pr_file_pages(url, access_token):
+    """
+    Yield the pages of a `/pulls/{number}/files` listing as they arrive,
+    following the `Link` header. GitHub lists at most 3000 files per PR.
+    Raises `requests.HTTPError` if any page fails, so a listing is never
+    silently cut short.
+    """
     headers = {
         "Accept": "application/vnd.github.v3+json",
     }
     if access_token:
         headers["Authorization"] = f"Bearer {access_token}"
 
-    response = requests.get(url, headers=headers)
-    if not is_successful_status(response.status_code):
-        logger.error(
-            f"Unable to fetch PR files with error: {response.status_code} url: {url}"
-        )
-        print(response.text)
+    params = {"per_page": PR_FILES_PAGE_SIZE}
+    while url:
+        response = http_client.cached_get(url, headers=headers, params=params)
+        if not is_successful_status(response.status_code):
+            logger.error(
+                f"Unable to fetch PR files with error: {response.status_code} "
+                f"url: {url} response: {response.text}"
+            )
+            raise requests.HTTPError(
+                f"Unable to fetch PR files: {response.status_code}", response=response
+            )
+        yield response.json()
+        # The next link already carries the query parameters.
+        url = response.links.get("next", {}).get("url")
+        params = None
+
+
+def get_pr_files(url, access_token):
+    try:
+        return [file for page in iter_pr_file_pages(url, access_token) for file in page]
+    except requests.HTTPError:
         return None
-    return response.json()
+
+
+def split_diff_into_files(diff_text):
+    """
+    Split a unified PR diff into the per-file records returned by the
+    `/pulls/{number}/files` endpoint.
+    """
+    return [
+        {
+            "filename": file_diff.path,
+            # GitHub omits the patch for binary files; mirror that.
+            "patch": file_diff.patch or None,
+            "status": file_diff.status,
+        }
+        for file_diff in parser.iter_file_diffs(diff_text)
+    ]
+
+
+def get_pr_diff(pr_url, head_sha, access_token):
+    """
+    Download the diff of a pull request once per head commit.
+
+    Concurrent callers for the same PR and head sha wait for a single
+    download and share its result for PR_DIFF_CACHE_TTL seconds.
+
+    :return: Tuple of (diff_text, files), or (None, None) if the diff could
+        not be fetched (e.g. it is too large for GitHub to render)
+    """
+    key = (pr_url, head_sha)
+    with _pr_diff_cache_lock:
+        now = time.time()
+        for expired in [k for k, v in _pr_diff_cache.items() if v[0] <= now]:
+            del _pr_diff_cache[expired]
+            _pr_diff_locks.pop(expired, None)
+        lock = _pr_diff_locks.setdefault(key, threading.Lock())
+
+    with lock:
+        cached = _pr_diff_cache.get(key)
+        if cached and cached[0] > time.time():
+            return cached[1]
+        diff_text = get_diff_text(pr_url, access_token, media_type=DIFF_MEDIA_TYPE)
+        if diff_text is None:
+            # Nothing is cached for this key, so its lock would never expire.
+            with _pr_diff_cache_lock:
+                if _pr_diff_locks.get(key) is lock:
+                    del _pr_diff_locks[key]
+            return None, None
+        result = (diff_text, split_diff_into_files(diff_text))
+        with _pr_diff_cache_lock:
+            _pr_diff_cache[key] = (time.time() + PR_DIFF_CACHE_TTL, result)
+    return result
 
 
 def is_github_signature_valid(headers, body):
@@ -1,12 +1,23 @@
-from fastapi import FastAPI, Request, BackgroundTasks, HTTPException
+from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import JSONResponse
 from github_app.github_helper.pull_requests import (
     process_pull_request,
     ACTIONS_TO_PROCESS_PR,
     ACTIONS_TO_UPDATE_DESC,
+    ACTIONS_TO_PROCESS_PUSH,
     process_pr_desc,
 )
 from github_app.github_helper.utils import is_github_signature_valid
+from github_app.github_helper.deliveries import create_delivery_tracker
+from github_app.github_helper.pr_heads import (
+    create_pull_request_heads,
+    pull_request_key,
+)
+from github_app.github_helper.http_client import close_clients
+from github_app.github_helper.job_queue import (
+    create_worker_pool,
+    pull_request_job_key,
+)
 from kaizen.utils.config import ConfigData
 import logging
 
@@ -19,9 +30,64 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
+DEFAULT_DEBOUNCE_SECONDS = 10
+
+pull_request_heads = create_pull_request_heads(ConfigData().get_config_data())
+
+
+def run_pull_request_review(payload):
+    # A job for an older push is dropped before it fetches the diff, and a
+    # running one stops between LLM calls once a newer push was queued.
+    if pull_request_heads.is_superseded(payload):
+        logger.info(
+            f"Skipping review of {pull_request_key(payload)}: superseded by a newer push"
+        )
+        return
+    process_pull_request(
+        payload, is_cancelled=lambda: pull_request_heads.is_superseded(payload)
+    )
+
+
+JOB_HANDLERS = {
+    "process_pull_request": run_pull_request_review,
+    "process_pr_desc": process_pr_desc,
+}
+
+worker_pool = create_worker_pool(ConfigData().get_config_data(), JOB_HANDLERS)
+delivery_tracker = create_delivery_tracker(ConfigData().get_config_data())
+
+
+@app.on_event("startup")
+def start_workers():
+    worker_pool.start()
+
+
+@app.on_event("shutdown")
+def stop_workers():
+    worker_pool.stop(timeout=5)
+    close_clients()
+
+
+def enqueue_job(task, payload, debounce=DEFAULT_DEBOUNCE_SECONDS):
+    if task == "process_pull_request":
+        pull_request_heads.set_head(
+            pull_request_key(payload), payload["pull_request"]["head"]["sha"]
+        )
+    # Jobs are keyed by (repo, PR, head sha, task), so a duplicate event for
+    # the same commit collapses into the job that is already queued. Only
+    # pushes are held back for the debounce window, since a burst of pushes
+    # should be reviewed once at its last commit; explicit events run at once.
+    worker_pool.submit(
+        task,
+        payload,
+        repo=payload["repository"]["full_name"],
+        dedup_key=pull_request_job_key(task, payload),
+        delay=debounce if payload["action"] in ACTIONS_TO_PROCESS_PUSH else 0,
+    )
+
 
 @app.post("/github-webhook")
-async def handle_webhook(request: Request, background_tasks: BackgroundTasks):
+async def handle_webhook(request: Request):
     payload = await request.json()
     body = await request.body()
     event = request.headers.get("X-GitHub-Event")
@@ -32,17 +98,30 @@ async def handle_webhook(request: Request, background_tasks: BackgroundTasks):
     ):
         return HTTPException(status_code=404, detail="Invalid Signature")
 
+    delivery_id = request.headers.get("X-GitHub-Delivery")
+    if delivery_id and delivery_tracker.is_duplicate(delivery_id):
+        logger.info(f"Ignored duplicate delivery: {delivery_id}")
+        return JSONResponse(content={"message": "Duplicate delivery ignored"})
+
+    debounce = CONFIG_DATA["github_app"].get(
+        "debounce_seconds", DEFAULT_DEBOUNCE_SECONDS
+    )
     if event == "pull_request":
         if (
             CONFIG_DATA["github_app"]["auto_pr_review"]
             and payload["action"] in ACTIONS_TO_PROCESS_PR
         ):
-            background_tasks.add_task(process_pull_request, payload)
+            enqueue_job("process_pull_request", payload, debounce)
+        if (
+            CONFIG_DATA["github_app"].get("process_on_push", False)
+            and payload["action"] in ACTIONS_TO_PROCESS_PUSH
+        ):
+            enqueue_job("process_pull_request", payload, debounce)
         if (
             CONFIG_DATA["github_app"]["edit_pr_desc"]
             and payload["action"] in ACTIONS_TO_UPDATE_DESC
         ):
-            background_tasks.add_task(process_pr_desc, payload)
+            enqueue_job("process_pr_desc", payload, debounce)
     else:
         logger.info(f"Ignored event: {event}")
     return JSONResponse(content={"message": "Webhook received"})
@@ -19,9 +19,7 @@ class CodeFixer:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
         self.provider = LLMProvider()
-        self.provider.system_prompt = (
-            CODE_FIX_SYSTEM_PROMPT  # You'll need to define this
-        )
+        self.system_prompt = CODE_FIX_SYSTEM_PROMPT  # You'll need to define this
         self.total_usage = {
             "prompt_tokens": 0,
             "completion_tokens": 0,
@@ -37,12 +35,14 @@ class CodeFixer:
             file_content=original_code, issue_json=json.dumps(issues, indent=2)
         )
 
-        if not self.provider.is_inside_token_limit(PROMPT=fix_prompt):
+        if not self.provider.is_inside_token_limit(
+            PROMPT=fix_prompt, system_prompt=self.system_prompt
+        ):
             self.logger.warning(f"Fix prompt for issue exceeds token limit. Skipping.")
             raise Exception("File Size too big!")
 
         resp, usage = self.provider.chat_completion_with_json(
-            fix_prompt, user=user, model="best"
+            fix_prompt, user=user, model="best", system_prompt=self.system_prompt
         )
         self.total_usage = self.provider.update_usage(self.total_usage, usage)
 
@@ -31,7 +31,7 @@ class IssueAnalysisGenerator:
     def __init__(self, llm_provider: LLMProvider):
         self.logger = logging.getLogger(__name__)
         self.provider = llm_provider
-        self.provider.system_prompt = ISSUE_LABEL_SYSTEM_PROMPT
+        self.system_prompt = ISSUE_LABEL_SYSTEM_PROMPT
         self.total_usage = {
             "prompt_tokens": 0,
             "completion_tokens": 0,
@@ -58,7 +58,9 @@ class IssueAnalysisGenerator:
         if (
             issue_label_list
             and issue_desc
-            and self.provider.is_inside_token_limit(PROMPT=prompt)
+            and self.provider.is_inside_token_limit(
+                PROMPT=prompt, system_prompt=self.system_prompt
+            )
         ):
             labels = self._process_issue_for_labels(
                 issue_title,
@@ -73,7 +75,7 @@ class IssueAnalysisGenerator:
         return IssueLabelOutput(
             labels=labels,
             usage=self.total_usage,
-            model_name=self.provider.model,
+            model_name=self.provider.get_usage_model(self.total_usage),
             cost={"prompt_cost": prompt_cost, "completion_cost": completion_cost},
         )
 
@@ -89,7 +91,9 @@ class IssueAnalysisGenerator:
         if not issue_desc:
             raise Exception("Original issue description is empty!")
 
-        if issue_desc and self.provider.is_inside_token_limit(PROMPT=prompt):
+        if issue_desc and self.provider.is_inside_token_limit(
+            PROMPT=prompt, system_prompt=self.system_prompt
+        ):
             desc = self._process_issue_for_desc(
                 issue_title,
                 issue_desc,
@@ -104,7 +108,7 @@ class IssueAnalysisGenerator:
         return IssueDescOutput(
             desc=body,
             usage=self.total_usage,
-            model_name=self.provider.model,
+            model_name=self.provider.get_usage_model(self.total_usage),
             cost={"prompt_cost": prompt_cost, "completion_cost": completion_cost},
         )
 
@@ -116,8 +120,7 @@ class IssueAnalysisGenerator:
     ) -> List[str]:
         self.logger.debug("Processing Issue for labels")
         resp, usage = self.provider.chat_completion(
-            prompt=prompt,
-            user=user,
+            prompt=prompt, user=user, system_prompt=self.system_prompt
         )
         labels = parser.extract_code_from_markdown(resp)
         self.total_usage = self.provider.update_usage(self.total_usage, usage)
@@ -127,8 +130,7 @@ class IssueAnalysisGenerator:
     def _process_issue_for_desc(self, prompt: str, user: Optional[str]) -> str:
         self.logger.debug("Processing issue for description")
         resp, usage = self.provider.chat_completion(
-            prompt=prompt,
-            user=user,
+            prompt=prompt, user=user, system_prompt=self.system_prompt
         )
         desc = parser.extract_code_from_markdown(resp)
         self.total_usage = self.provider.update_usage(self.total_usage, usage)
@@ -3,7 +3,7 @@ import logging
 from dataclasses import dataclass
 import json
 
-from kaizen.helpers import output, parser
+from kaizen.helpers import chunker, output, parser
 from kaizen.llms.provider import LLMProvider
 from kaizen.llms.prompts.pr_desc_prompts import (
     PR_DESCRIPTION_PROMPT,
@@ -25,7 +25,7 @@ class PRDescriptionGenerator:
     def __init__(self, llm_provider: LLMProvider):
         self.logger = logging.getLogger(__name__)
         self.provider = llm_provider
-        self.provider.system_prompt = PR_DESCRIPTION_SYSTEM_PROMPT
+        self.system_prompt = PR_DESCRIPTION_SYSTEM_PROMPT
         self.total_usage = {
             "prompt_tokens": 0,
             "completion_tokens": 0,
@@ -46,7 +46,9 @@ class PRDescriptionGenerator:
         if not diff_text and not pull_request_files:
             raise Exception("Both diff_text and pull_request_files are empty!")
 
-        if diff_text and self.provider.is_inside_token_limit(PROMPT=prompt):
+        if diff_text and self.provider.is_inside_token_limit(
+            PROMPT=prompt, system_prompt=self.system_prompt
+        ):
             desc = self._process_full_diff(prompt, user)
         else:
             desc = self._process_files(
@@ -64,7 +66,7 @@ class PRDescriptionGenerator:
         return DescOutput(
             desc=body,
             usage=self.total_usage,
-            model_name=self.provider.model,
+            model_name=self.provider.get_usage_model(self.total_usage),
             cost={"prompt_cost": prompt_cost, "completion_cost": completion_cost},
         )
 
@@ -74,7 +76,9 @@ class PRDescriptionGenerator:
         user: Optional[str],
     ) -> str:
         self.logger.debug("Processing directly from diff")
-        resp, usage = self.provider.chat_completion(prompt, user=user)
+        resp, usage = self.provider.chat_completion(
+            prompt, user=user, system_prompt=self.system_prompt
+        )
         desc = parser.extract_code_from_markdown(resp)
         self.total_usage = self.provider.update_usage(self.total_usage, usage)
 
@@ -99,7 +103,9 @@ class PRDescriptionGenerator:
 
         if len(file_descs) > 1:
             prompt = MERGE_PR_DESCRIPTION_PROMPT.format(DESCS=json.dumps(file_descs))
-            resp, usage = self.provider.chat_completion(prompt, user=user)
+            resp, usage = self.provider.chat_completion(
+                prompt, user=user, system_prompt=self.system_prompt
+            )
             self.total_usage = self.provider.update_usage(self.total_usage, usage)
             desc = parser.extract_code_from_markdown(resp)
         else:
@@ -114,46 +120,22 @@ class PRDescriptionGenerator:
         pull_request_desc: str,
         user: Optional[str],
     ) -> Generator[List[Dict], None, None]:
-        combined_diff_data = ""
         available_tokens = self.provider.available_tokens(
             PR_DESCRIPTION_PROMPT.format(
                 CODE_DIFF="",
             )
         )
-        diff_parts = []
-        for file in pull_request_files:
-            patch_details = file.get("patch")
-            filename = file.get("filename", "")
-
-            if (
-                filename.split(".")[-1] not in parser.EXCLUDED_FILETYPES
-                and patch_details is not None
-            ):
-                diff_parts.append(
-                    f"\n---->\nFile Name: {filename}\nPatch Details: \n{patch_details}"
-                )
-
-                if (
-                    available_tokens
-                    - self.provider.get_token_count("".join(diff_parts))
-                    > 0
-                ):
-                    combined_diff_data = "".join(diff_parts)
-                    continue
-
-                yield self._process_file_chunk(
-                    combined_diff_data,
-                    pull_request_title,
-                    pull_request_desc,
-                    user,
-                )
-                diff_parts = [
-                    f"\n---->\nFile Name: {filename}\nPatch Details: {patch_details}"
-                ]
-
-        if diff_parts:
+        diff_parts = (
+            f"\n---->\nFile Name: {file.get('filename', '')}\nPatch Details: \n{file['patch']}"
+            for file in pull_request_files
+            if file.get("filename", "").split(".")[-1] not in parser.EXCLUDED_FILETYPES
+            and file.get("patch") is not None
+        )
+        for diff_data in chunker.chunk_by_token_budget(
+            diff_parts, available_tokens, self.provider.get_token_count
+        ):
             yield self._process_file_chunk(
-                "".join(diff_parts),
+                diff_data,
                 pull_request_title,
                 pull_request_desc,
                 user,
@@ -169,7 +151,9 @@ class PRDescriptionGenerator:
         prompt = PR_DESCRIPTION_PROMPT.format(
             CODE_DIFF=diff_data,
         )
-        resp, usage = self.provider.chat_completion(prompt, user=user)
+        resp, usage = self.provider.chat_completion(
+            prompt, user=user, system_prompt=self.system_prompt
+        )
         desc = parser.extract_code_from_markdown(resp)
         self.total_usage = self.provider.update_usage(self.total_usage, usage)
 
@@ -183,5 +167,7 @@ class PRDescriptionGenerator:
         prompt = PR_COMMIT_MESSAGE_PROMPT.format(
             DESC=desc,
         )
-        resp, usage = self.provider.chat_completion_with_json(prompt, user=user)
-        return resp, usage, self.provider.model
+        resp, usage = self.provider.chat_completion_with_json(
+            prompt, user=user, system_prompt=self.system_prompt
+        )
+        return resp, usage, self.provider.get_usage_model(usage)
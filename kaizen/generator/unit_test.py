@@ -115,7 +115,7 @@ class UnitTestGenerator:
             files=files,
             failed=failed,
             usage=self.total_usage,
-            model_name=self.provider.model,
+            model_name=self.provider.get_usage_model(self.total_usage),
             cost={"prompt_cost": prompt_cost, "completion_cost": completion_cost},
             scenarios=self.test_scenarios,
         )
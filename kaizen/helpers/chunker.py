@@ -0,0 +1,73 @@
+from typing import Callable, Generator, Iterable, List, Tuple
+
+
+def _count_parts(
+    parts: Iterable[str], count_tokens: Callable[[str], int]
+) -> Generator[Tuple[str, int], None, None]:
+    for part in parts:
+        if part:
+            yield part, count_tokens(part)
+
+
+def chunk_by_token_budget(
+    parts: Iterable[str],
+    budget: int,
+    count_tokens: Callable[[str], int],
+    bin_pack: bool = False,
+) -> Generator[str, None, None]:
+    """
+    Pack text parts into chunks whose token count stays within a budget.
+
+    Every part is tokenized exactly once and chunk sizes are tracked as
+    running totals, so packing is linear in the size of the input instead of
+    re-counting the accumulated text after each append. A part that is larger
+    than the budget on its own is emitted as a single chunk.
+
+    :param parts: Text parts (e.g. one per file) in their original order
+    :param budget: Maximum number of tokens per chunk
+    :param count_tokens: Callable returning the token count of a string
+    :param bin_pack: Use first-fit-decreasing bin packing to minimise the
+        number of chunks. Parts keep their original relative order inside
+        each chunk, but the input is consumed fully before the first chunk
+        is yielded.
+    :return: Generator of joined chunk strings
+    """
+    counted = _count_parts(parts, count_tokens)
+    if bin_pack:
+        yield from _first_fit_decreasing(list(counted), budget)
+        return
+
+    current = []
+    current_tokens = 0
+    for part, tokens in counted:
+        if current and current_tokens + tokens > budget:
+            yield "".join(current)
+            current = []
+            current_tokens = 0
+        current.append(part)
+        current_tokens += tokens
+
+    if current:
+        yield "".join(current)
+
+
+def _first_fit_decreasing(
+    counted: List[Tuple[str, int]], budget: int
+) -> Generator[str, None, None]:
+    order = sorted(range(len(counted)), key=lambda i: counted[i][1], reverse=True)
+    bins = []
+    bin_tokens = []
+    for index in order:
+        tokens = counted[index][1]
+        for bin_index, used in enumerate(bin_tokens):
+            if used + tokens <= budget:
+                bins[bin_index].append(index)
+                bin_tokens[bin_index] += tokens
+                break
+        else:
+            bins.append([index])
+            bin_tokens.append(tokens)
+
+    # Emit bins in the order of their earliest part so output stays stable.
+    for indexes in sorted(bins, key=min):
+        yield "".join(counted[i][0] for i in sorted(indexes))
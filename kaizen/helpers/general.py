@@ -1,7 +1,17 @@
+import asyncio
+import logging
+import random
 import re
 import time
+from email.utils import parsedate_to_datetime
 from functools import wraps
 from pathlib import Path
+from typing import Callable, Optional
+
+import litellm
+import requests
+
+logger = logging.getLogger(__name__)
 
 
 def safe_path_join(base_path, *paths):
@@ -27,26 +37,149 @@ def safe_path_join(base_path, *paths):
     return full_path
 
 
-def retry(max_attempts=3, delay=1):
-    def decorator(func):
+# Status codes worth retrying: timeouts, rate limits and server-side errors.
+TRANSIENT_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+# litellm wraps transport errors of its HTTP client in APIConnectionError and
+# Timeout; other failures are classified by their status code.
+TRANSIENT_EXCEPTIONS = (
+    ConnectionError,
+    TimeoutError,
+    asyncio.TimeoutError,
+    litellm.Timeout,
+    litellm.APIConnectionError,
+    requests.ConnectionError,
+    requests.Timeout,
+)
+
+
+def _error_status_code(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    True for transport failures, timeouts, rate limits and 5xx responses,
+    which may succeed when retried. Anything else (bad requests, auth
+    errors, programming errors) fails the same way every time.
+    """
+    if isinstance(error, TRANSIENT_EXCEPTIONS):
+        return True
+    return _error_status_code(error) in TRANSIENT_STATUS_CODES
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Delay requested by the server through `Retry-After`, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if headers is None:
+        headers = getattr(error, "litellm_response_headers", None)
+    if not headers:
+        return None
+    try:
+        value = headers.get("retry-after-ms")
+        if value is not None:
+            return max(0.0, float(value) / 1000)
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            retry_at = parsedate_to_datetime(value)
+            return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Retry transient failures with capped exponential backoff and full
+    jitter, so workers that fail together do not retry in lockstep. A
+    `Retry-After` from the server is honoured (up to `max_delay`).
+
+    Use it as a decorator on plain or async functions, or through `call` /
+    `acall`. Errors for which `retry_on` returns False are raised at once.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        retry_on: Callable[[BaseException], bool] = is_transient_error,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on = retry_on
+
+    def delay(self, attempt: int, error: Optional[BaseException] = None) -> float:
+        """Seconds to wait after failed attempt number `attempt` (from 1)."""
+        backoff = random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        )
+        retry_after = retry_after_seconds(error) if error is not None else None
+        if retry_after is not None:
+            return min(self.max_delay, max(retry_after, backoff))
+        return backoff
+
+    def _next_delay(self, attempt: int, error: Exception) -> Optional[float]:
+        if attempt >= self.max_attempts or not self.retry_on(error):
+            return None
+        delay = self.delay(attempt, error)
+        logger.warning(
+            f"Attempt {attempt} failed: error |{error}|. Retrying in {delay:.2f} seconds..."
+        )
+        return delay
+
+    def call(self, func, *args, **kwargs):
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                delay = self._next_delay(attempt, e)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    async def acall(self, func, *args, **kwargs):
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                delay = self._next_delay(attempt, e)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    def __call__(self, func):
+        if asyncio.iscoroutinefunction(func):
+
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await self.acall(func, *args, **kwargs)
+
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            attempts = 0
-            while attempts < max_attempts:
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    attempts += 1
-                    if attempts == max_attempts:
-                        raise
-                    print(
-                        f"Attempt {attempts} failed: error |{e}|. Retrying in {delay} seconds..."
-                    )
-                    time.sleep(delay)
+            return self.call(func, *args, **kwargs)
 
         return wrapper
 
-    return decorator
+
+def retry(max_attempts=3, delay=1, max_delay=30.0, retry_on=is_transient_error):
+    return RetryPolicy(max_attempts, delay, max_delay, retry_on)
+
+
+def async_retry(max_attempts=3, delay=1, max_delay=30.0, retry_on=is_transient_error):
+    return RetryPolicy(max_attempts, delay, max_delay, retry_on)
 
 
 def clean_python_code(code):
@@ -104,24 +104,65 @@ def should_ignore_file(filepath):
     return False
 
 
+_JSON_SPECIAL_CHARS = re.compile(r'["\\\x00-\x1f]')
+_CONTROL_CHAR_ESCAPES = {"\n": "n", "\r": "r", "\t": "t"}
+
+
+def _escape_control_char(ch):
+    return _CONTROL_CHAR_ESCAPES.get(ch) or f"u{ord(ch):04x}"
+
+
+def _normalize_json_text(text):
+    """
+    Single pass over `text` that escapes raw newlines and other control
+    characters inside strings and drops stray backslashes between tokens.
+    Only the special characters are visited, and unchanged runs are copied
+    once into the result.
+    """
+    parts = []
+    last = 0
+    in_string = False
+    escaped_at = -2
+    for match in _JSON_SPECIAL_CHARS.finditer(text):
+        i = match.start()
+        ch = text[i]
+        if i == escaped_at + 1:
+            # Character following a backslash inside a string.
+            if ch < " ":
+                parts.append(text[last:i])
+                parts.append(_escape_control_char(ch))
+                last = i + 1
+            continue
+        if ch == '"':
+            in_string = not in_string
+        elif ch == "\\":
+            if in_string:
+                escaped_at = i
+            else:
+                parts.append(text[last:i])
+                last = i + 1
+        elif in_string:
+            parts.append(text[last:i])
+            parts.append("\\" + _escape_control_char(ch))
+            last = i + 1
+    if not parts:
+        return text
+    parts.append(text[last:])
+    return "".join(parts)
+
+
 def extract_json(text):
     # Find the start and end positions of the JSON data
     start_index = text.find("{")
     end_index = text.rfind("}") + 1
-
-    # Extract the JSON data from the text
     json_data = text[start_index:end_index]
-    json_data = re.sub(r"\s*\\*\n*\s*{\s*\n*\s*", "{", json_data)
-    json_data = re.sub(r"\s*\\*\n*\s*\[\s*\n*\s*", "[", json_data)
-    json_data = re.sub(r"\s*\\*\n*\s*}\s*\n*\s*", "}", json_data)
-    json_data = re.sub(r"\s*\\*\n\s*\]\s*\n\s*", "]", json_data)
-    json_data = re.sub(r",\s*\\*\n\s*", ",", json_data)
-    json_data = re.sub(r'"\s*\\*\n\s*', '"', json_data)
-    json_data = json_data.replace("\n", "\\n")
-
-    # Parse the JSON data
-    parsed_data = json.loads(json_data)
-    return parsed_data
+
+    # Most responses are valid JSON, possibly wrapped in prose or a fence.
+    try:
+        return json.loads(json_data)
+    except ValueError:
+        pass
+    return json.loads(_normalize_json_text(json_data))
 
 
 def extract_multi_json(text):
@@ -132,6 +173,202 @@ def extract_multi_json(text):
     return parsed_data
 
 
+_STRING_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _close_json(chars, stack, in_string=False):
+    text = "".join(chars)
+    if in_string:
+        text += '"'
+    text = text.rstrip()
+    if text.endswith(","):
+        text = text[:-1]
+    return text + "".join(_CLOSERS[opener] for opener in reversed(stack))
+
+
+def repair_json(text):
+    """
+    Tolerant local repair of a malformed or truncated JSON object in `text`.
+
+    Escapes raw control characters inside strings, drops trailing commas and
+    closes whatever strings and brackets a cut-off response left open,
+    ending at the last complete element when the output was truncated.
+    Returns the parsed data, or None if the text cannot be repaired.
+    """
+    start = text.find("{")
+    if start == -1:
+        return None
+    chars = []
+    stack = []
+    in_string = escape = False
+    checkpoint = None
+    for ch in text[start:]:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            elif ch in _STRING_ESCAPES:
+                ch = _STRING_ESCAPES[ch]
+            chars.append(ch)
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append(ch)
+        elif ch in "}]":
+            if not stack:
+                break
+            # Drop a trailing comma before the closing bracket.
+            while chars and chars[-1].isspace():
+                chars.pop()
+            if chars and chars[-1] == ",":
+                chars.pop()
+            stack.pop()
+            chars.append(ch)
+            if not stack:
+                break
+            if stack[-1] == "[" or len(stack) == 1:
+                checkpoint = (len(chars), list(stack))
+            continue
+        elif ch == "," and (stack[-1:] == ["["] or len(stack) == 1):
+            # Boundary between array elements or top-level members.
+            checkpoint = (len(chars), list(stack))
+        chars.append(ch)
+
+    candidates = [_close_json(chars, stack, in_string)]
+    tail = "".join(chars).rstrip()[-1:]
+    if (in_string or tail not in '"}],') and stack and checkpoint is not None:
+        # The response was cut off inside a value (e.g. a number or string
+        # that may be incomplete); prefer ending at the last complete element.
+        length, checkpoint_stack = checkpoint
+        candidates.insert(0, _close_json(chars[:length], checkpoint_stack))
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            continue
+    return None
+
+
+STREAM_ARRAY_KEYS = ("review", "issues")
+
+
+class JSONArrayStream:
+    """
+    Incrementally scan a streamed JSON completion and return each element of
+    the top-level `review`/`issues` array as soon as it is complete, so
+    callers can act on the first issues while the model is still writing.
+
+    Each chunk is scanned once and only complete elements are parsed, one at
+    a time; the full text is kept in `text` so the final response can still
+    go through `extract_json`.
+    """
+
+    def __init__(self, keys=STREAM_ARRAY_KEYS):
+        self.keys = set(keys)
+        self._chunks = []
+        self._stack = []
+        self._done = False
+        self._in_string = False
+        self._escape = False
+        # Text of the open top-level key / array element seen in earlier chunks.
+        self._key_parts = None
+        self._item_parts = None
+        self._last_key = None
+        self._array_depth = None
+        self._item_count = 0
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+    def feed(self, chunk: str, with_index: bool = False) -> list:
+        """
+        Add `chunk` to the stream and return the newly completed elements.
+
+        :param with_index: Return `(index, element)` pairs, where `index` is
+            the element's position in the array
+        """
+        self._chunks.append(chunk)
+        items = []
+        key_start = 0 if self._key_parts is not None else None
+        item_start = 0 if self._item_parts is not None else None
+        for i, ch in enumerate(chunk):
+            if self._done:
+                break
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._key_parts is not None:
+                        self._last_key = "".join(self._key_parts) + chunk[key_start:i]
+                        self._key_parts = key_start = None
+                continue
+            if ch == '"':
+                if self._stack:
+                    self._in_string = True
+                    if len(self._stack) == 1:
+                        self._key_parts, key_start = [], i + 1
+            elif ch in "{[":
+                # Prose or a code fence before the top-level object is skipped.
+                if not self._stack and ch != "{":
+                    continue
+                if (
+                    ch == "["
+                    and len(self._stack) == 1
+                    and self._array_depth is None
+                    and self._last_key in self.keys
+                ):
+                    self._array_depth = 2
+                elif self._array_depth == len(self._stack) and item_start is None:
+                    self._item_parts, item_start = [], i
+                self._stack.append(ch)
+            elif ch in "}]":
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                depth = len(self._stack)
+                if self._array_depth is not None:
+                    if depth == self._array_depth and item_start is not None:
+                        item_text = (
+                            "".join(self._item_parts) + chunk[item_start : i + 1]
+                        )
+                        self._item_parts = item_start = None
+                        item = self._parse_item(item_text)
+                        if item is not None:
+                            items.append((self._item_count, item))
+                        self._item_count += 1
+                    elif depth < self._array_depth:
+                        self._array_depth = None
+                if not depth:
+                    self._done = True
+            elif ch == "," and len(self._stack) == 1:
+                self._last_key = None
+        if not self._done:
+            if key_start is not None:
+                self._key_parts.append(chunk[key_start:])
+            if item_start is not None:
+                self._item_parts.append(chunk[item_start:])
+        if with_index:
+            return items
+        return [item for _, item in items]
+
+    @staticmethod
+    def _parse_item(item_text: str):
+        try:
+            # Models often put raw newlines inside strings; allow them.
+            return json.loads(item_text, strict=False)
+        except ValueError:
+            return None
+
+
 def extract_markdown_content(text: str) -> str:
     match = re.search(r"```([\s\S]*?)```", text)
     if match:
@@ -147,54 +384,282 @@ def extract_code_from_markdown(text: str) -> str:
     return text
 
 
-def patch_to_numbered_lines(patch_text):
-    lines = patch_text.split("\n")
-    additions = []
-    metadata = []
-    addition_line_num = 0
-    unedited_count = 0
+DEV_NULL = "/dev/null"
+HUNK_HEADER_PATTERN = re.compile(r"@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@ ?(.*)")
+
+LINE_CONTEXT = " "
+LINE_ADDED = "+"
+LINE_REMOVED = "-"
+
+
+class Line:
+    """A single line of a hunk, stored as offsets into the parsed buffer."""
+
+    __slots__ = ("kind", "old_lineno", "new_lineno", "start", "end", "_buffer")
+
+    def __init__(self, kind, old_lineno, new_lineno, start, end, buffer):
+        self.kind = kind
+        self.old_lineno = old_lineno
+        self.new_lineno = new_lineno
+        self.start = start
+        self.end = end
+        self._buffer = buffer
+
+    @property
+    def content(self):
+        # Skip the one-character +/-/space prefix.
+        return self._buffer[self.start + 1 : self.end]
+
+    @property
+    def text(self):
+        return self._buffer[self.start : self.end]
+
+    def __repr__(self):
+        return f"Line({self.kind!r}, {self.old_lineno}, {self.new_lineno}, {self.content!r})"
+
+
+class Hunk:
+    __slots__ = (
+        "old_start",
+        "old_count",
+        "new_start",
+        "new_count",
+        "section",
+        "lines",
+        "start",
+        "end",
+        "_buffer",
+    )
+
+    def __init__(
+        self, old_start, old_count, new_start, new_count, section, start, buffer
+    ):
+        self.old_start = old_start
+        self.old_count = old_count
+        self.new_start = new_start
+        self.new_count = new_count
+        self.section = section
+        self.lines = []
+        self.start = start
+        self.end = start
+        self._buffer = buffer
+
+    @property
+    def text(self):
+        """The hunk exactly as it appears in the patch, header included."""
+        return self._buffer[self.start : self.end]
+
+    def __repr__(self):
+        return f"Hunk(-{self.old_start},{self.old_count} +{self.new_start},{self.new_count}, {len(self.lines)} lines)"
+
+
+class FileDiff:
+    __slots__ = (
+        "old_path",
+        "new_path",
+        "has_git_header",
+        "hunks",
+        "start",
+        "end",
+        "_buffer",
+    )
+
+    def __init__(self, start, buffer, has_git_header=False):
+        self.old_path = None
+        self.new_path = None
+        self.has_git_header = has_git_header
+        self.hunks = []
+        self.start = start
+        self.end = start
+        self._buffer = buffer
+
+    @property
+    def path(self):
+        if self.new_path and self.new_path != DEV_NULL:
+            return self.new_path
+        return self.old_path
+
+    @property
+    def status(self):
+        if self.old_path == DEV_NULL:
+            return "added"
+        if self.new_path == DEV_NULL:
+            return "removed"
+        if self.old_path and self.new_path and self.old_path != self.new_path:
+            return "renamed"
+        return "modified"
+
+    @property
+    def patch(self):
+        """The hunks of this file, in the shape of GitHub's per-file `patch`."""
+        if not self.hunks:
+            return ""
+        return self._buffer[self.hunks[0].start : self.hunks[-1].end]
+
+    def __repr__(self):
+        return f"FileDiff({self.path!r}, {self.status}, {len(self.hunks)} hunks)"
+
+
+def _strip_path_prefix(path, prefix):
+    # Drop the trailing timestamp some diff tools append after a tab.
+    path = path.split("\t", 1)[0]
+    if path != DEV_NULL and path.startswith(prefix):
+        return path[len(prefix) :]
+    return path
+
+
+def iter_file_diffs(patch_text):
+    """
+    Parse a unified diff in a single pass, yielding one FileDiff per file.
+
+    Works on full `git diff`/`format-patch` output as well as on the
+    header-less per-file patches returned by the GitHub API. Hunk lines are
+    delimited using the counts from their `@@` header, so e-mail preambles,
+    `index` lines and trailers are skipped without being mistaken for
+    changes.
+
+    :param patch_text: The diff text
+    :return: Generator of FileDiff records referencing `patch_text`
+    """
+    if not patch_text:
+        return
+    buffer = patch_text
+    length = len(buffer)
+    current_file = None
     current_hunk = None
-    is_diff = False
-    first_transition = True
-    current_file_name = ""
-    for line in lines:
-        if "diff --git" in line:
-            is_diff = True
-            if first_transition:
-                additions = []
-                first_transition = False
+    old_left = new_left = 0
+    old_lineno = new_lineno = 0
+    pos = 0
+
+    while pos < length:
+        newline = buffer.find("\n", pos)
+        if newline == -1:
+            newline = length
+        end = newline
+        if end > pos and buffer[end - 1] == "\r":
+            end -= 1
+        next_pos = newline + 1
+
+        if old_left > 0 or new_left > 0:
+            marker = buffer[pos] if end > pos else LINE_CONTEXT
+            if marker == LINE_CONTEXT:
+                current_hunk.lines.append(
+                    Line(LINE_CONTEXT, old_lineno, new_lineno, pos, end, buffer)
+                )
+                old_lineno += 1
+                new_lineno += 1
+                old_left -= 1
+                new_left -= 1
+            elif marker == LINE_ADDED:
+                current_hunk.lines.append(
+                    Line(LINE_ADDED, None, new_lineno, pos, end, buffer)
+                )
+                new_lineno += 1
+                new_left -= 1
+            elif marker == LINE_REMOVED:
+                current_hunk.lines.append(
+                    Line(LINE_REMOVED, old_lineno, None, pos, end, buffer)
+                )
+                old_lineno += 1
+                old_left -= 1
+            elif marker != "\\":
+                # Truncated hunk: treat this line as a header line instead.
+                old_left = new_left = 0
+            if old_left > 0 or new_left > 0 or marker in "+- \\":
+                current_hunk.end = end
+                current_file.end = end
+                pos = next_pos
                 continue
-            additions.append("\n</change_block>\n\n")
+        elif current_hunk is not None and buffer.startswith("\\", pos):
+            # "\ No newline at end of file" after the last line of a hunk.
+            current_hunk.end = end
+            current_file.end = end
+            pos = next_pos
+            continue
 
-        elif is_diff:
-            is_diff = False
-        elif line.startswith("@"):
-            if current_hunk:
-                metadata.append(current_hunk)
-            current_hunk = line
-            match = re.match(r"@@ -(\d+),\d+ \+(\d+),\d+ @@", line)
+        if buffer.startswith("diff --git ", pos):
+            if current_file is not None:
+                yield current_file
+            current_file = FileDiff(pos, buffer, has_git_header=True)
+            current_hunk = None
+            old_path, _, new_path = buffer[pos + 11 : end].rpartition(" b/")
+            current_file.old_path = _strip_path_prefix(old_path, "a/")
+            current_file.new_path = new_path
+            current_file.end = end
+        elif (
+            buffer.startswith("--- ", pos)
+            and current_hunk is None
+            or (
+                buffer.startswith("--- ", pos)
+                and current_file is not None
+                and not current_file.has_git_header
+            )
+        ):
+            if current_file is not None and current_file.hunks:
+                yield current_file
+                current_file = None
+            if current_file is None:
+                current_file = FileDiff(pos, buffer)
+            current_hunk = None
+            current_file.old_path = _strip_path_prefix(buffer[pos + 4 : end], "a/")
+            current_file.end = end
+        elif buffer.startswith("+++ ", pos) and current_file is not None:
+            current_file.new_path = _strip_path_prefix(buffer[pos + 4 : end], "b/")
+            current_file.end = end
+        elif buffer.startswith("rename from ", pos) and current_file is not None:
+            current_file.old_path = buffer[pos + 12 : end]
+        elif buffer.startswith("rename to ", pos) and current_file is not None:
+            current_file.new_path = buffer[pos + 10 : end]
+        elif buffer.startswith("@@", pos):
+            match = HUNK_HEADER_PATTERN.match(buffer, pos, end)
             if match:
-                addition_line_num = int(match.group(2))
-                additions.append("\n<change_block>\n")
-                additions.append(f"Filename: {current_file_name}\n")
-        elif line.startswith("---"):
-            line = line.replace("a/", "").replace("b/", "").replace("--- ", "")
-            current_file_name = line
-        elif line.startswith("+++"):
-            line = line.replace("a/", "").replace("b/", "").replace("+++ ", "")
-            current_file_name = line
-        elif line.startswith("-"):
-            line = "<-> " + line[1:]
-        elif line.startswith("+"):
-            line = line[1:]
-            additions.append(f"{addition_line_num:<5} {line}")
-            addition_line_num += 1
-        else:
-            addition_line_num += 1
-            unedited_count += 1
-
-    if current_hunk:
-        metadata.append(current_hunk)
+                if current_file is None:
+                    current_file = FileDiff(pos, buffer)
+                old_start, old_count, new_start, new_count, section = match.groups()
+                old_left = int(old_count) if old_count is not None else 1
+                new_left = int(new_count) if new_count is not None else 1
+                old_lineno = int(old_start)
+                new_lineno = int(new_start)
+                current_hunk = Hunk(
+                    old_lineno, old_left, new_lineno, new_left, section, pos, buffer
+                )
+                current_hunk.end = end
+                current_file.hunks.append(current_hunk)
+                current_file.end = end
+        pos = next_pos
+
+    if current_file is not None:
+        yield current_file
+
+
+def parse_patch(patch_text):
+    return list(iter_file_diffs(patch_text))
+
+
+def _as_file_diffs(patch):
+    if isinstance(patch, str):
+        return iter_file_diffs(patch)
+    return patch
+
+
+def patch_to_numbered_lines(patch_text):
+    additions = []
+    unedited_count = 0
+    has_hunks = False
+    for index, file_diff in enumerate(_as_file_diffs(patch_text)):
+        if index:
+            additions.append("\n</change_block>\n\n")
+        for hunk in file_diff.hunks:
+            has_hunks = True
+            additions.append("\n<change_block>\n")
+            additions.append(f"Filename: {file_diff.path or ''}\n")
+            for line in hunk.lines:
+                if line.kind == LINE_ADDED:
+                    additions.append(f"{line.new_lineno:<5} {line.content}")
+                elif line.kind == LINE_CONTEXT:
+                    unedited_count += 1
+
+    if has_hunks:
         additions.append("\n</change_block>")
 
     output = []
@@ -210,95 +675,44 @@ def format_change(old_num, new_num, change_type, content, ignore_deletions=False
 
 
 def patch_to_combined_chunks(patch_text, ignore_deletions=False):
+    """
+    Render a patch in the line-numbered format used by the review prompts.
+
+    :param patch_text: The diff text, or FileDiff records already parsed
+        from it with `parse_patch`
+    :param ignore_deletions: Leave removed lines out of the output
+    """
     if not patch_text:
         return ""
-    patch_text = patch_text.replace("\r\n", "\n")
-    lines = patch_text.splitlines(keepends=True)
     changes = []
-    removal_line_num = 1
-    addition_line_num = 1
-    is_diff = False
-    removed_hunk = False
-    current_file_name = ""
-
-    for line in lines:
-        line = line.rstrip("\n")
-        if "diff --git" in line:
-            is_diff = True
-            if not removed_hunk:
-                changes = []
-                removed_hunk = True
+    for file_diff in _as_file_diffs(patch_text):
+        if file_diff.has_git_header:
             changes.append("\n")
-        elif is_diff:
-            is_diff = False
-        elif line.startswith("@@"):
-            match = re.match(r"@@ -(\d+),\d+ \+(\d+),\d+ @@ (.*)", line)
-            if match:
-                removal_line_num = int(match.group(1))
-                addition_line_num = int(match.group(2))
-                content = match.group(3)
-                changes.append("\n")
-                changes.append(
-                    format_change(
-                        None, addition_line_num, "CONTEXT", content, ignore_deletions
+        if file_diff.path and file_diff.path != DEV_NULL and changes:
+            changes.append("\n[FILE_END]\n")
+            changes.append(f"\n[FILE_START] {file_diff.path}\n")
+        for hunk in file_diff.hunks:
+            changes.append("\n")
+            changes.append(format_change(None, hunk.new_start, "CONTEXT", hunk.section))
+            for line in hunk.lines:
+                if line.kind == LINE_ADDED:
+                    changes.append(
+                        format_change(None, line.new_lineno, "UPDATED", line.content)
                     )
-                )
-        elif line.startswith("index "):
-            continue
-        elif line.startswith("--- a"):
-            line = line.replace("--- a/", "")
-            current_file_name = line
-            if (
-                current_file_name != "/dev/null"
-                and changes
-                and "[FILE_START]" not in changes[-1]
-            ):
-                changes.append("\n[FILE_END]\n")
-                changes.append(f"\n[FILE_START] {current_file_name}\n")
-        elif line.startswith("+++ b"):
-            line = line.replace("+++ b/", "")
-            current_file_name = line
-            if (
-                current_file_name != "/dev/null"
-                and changes
-                and "[FILE_START]" not in changes[-1]
-            ):
-                changes.append("\n[FILE_END]\n")
-                changes.append(f"\n[FILE_START] {current_file_name}\n")
-        elif line.startswith("-"):
-            content = line[1:]
-            if not ignore_deletions:
-                changes.append(
-                    format_change(
-                        None, removal_line_num, "REMOVED", content, ignore_deletions
+                elif line.kind == LINE_REMOVED:
+                    if not ignore_deletions:
+                        changes.append(
+                            format_change(
+                                None, line.old_lineno, "REMOVED", line.content
+                            )
+                        )
+                else:
+                    # Context lines keep their leading space, as they always have.
+                    changes.append(
+                        format_change(None, line.new_lineno, "CONTEXT", line.text)
                     )
-                )
-            removal_line_num += 1
-        elif line.startswith("+"):
-            content = line[1:]
-            changes.append(
-                format_change(
-                    None, addition_line_num, "UPDATED", content, ignore_deletions
-                )
-            )
-            addition_line_num += 1
-        else:
-            content = line
-            changes.append(
-                format_change(
-                    None,
-                    addition_line_num,
-                    "CONTEXT",
-                    content,
-                    ignore_deletions,
-                )
-            )
-            removal_line_num += 1
-            addition_line_num += 1
 
-    output = changes
-
-    return "\n".join(output)
+    return "\n".join(changes)
 
 
 def format_add_linenum(new_num, content, ignore_deletions=False):
@@ -0,0 +1,235 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_TTL = 7 * 24 * 60 * 60
+DEFAULT_CACHE_MAX_ENTRIES = 1000
+DEFAULT_CACHE_PATH = ".kaizen/cache/llm_responses.db"
+
+
+def make_cache_key(
+    model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]
+) -> str:
+    """
+    Build a content-addressed key for a completion request.
+
+    :param model: Model group the request is routed to (e.g. "default")
+    :param messages: Chat messages sent to the model
+    :param params: Remaining completion params, including temperature
+    :return: Hex digest identifying the request
+    """
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache(ABC):
+    def __init__(
+        self,
+        ttl: Optional[int] = DEFAULT_CACHE_TTL,
+        max_entries: int = DEFAULT_CACHE_MAX_ENTRIES,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        pass
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        pass
+
+    @abstractmethod
+    def clear(self) -> None:
+        pass
+
+    def _is_expired(self, created_at: float) -> bool:
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+
+class InMemoryCache(ResponseCache):
+    def __init__(
+        self,
+        ttl: Optional[int] = DEFAULT_CACHE_TTL,
+        max_entries: int = DEFAULT_CACHE_MAX_ENTRIES,
+    ):
+        super().__init__(ttl=ttl, max_entries=max_entries)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created_at, value = entry
+            if self._is_expired(created_at):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache(ResponseCache):
+    def __init__(
+        self,
+        path: str = DEFAULT_CACHE_PATH,
+        ttl: Optional[int] = DEFAULT_CACHE_TTL,
+        max_entries: int = DEFAULT_CACHE_MAX_ENTRIES,
+    ):
+        super().__init__(ttl=ttl, max_entries=max_entries)
+        if path != ":memory:":
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self._is_expired(created_at):
+                self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute(
+                "UPDATE llm_responses SET accessed_at = ? WHERE key = ?",
+                (time.time(), key),
+            )
+        return json.loads(value)
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            if self.ttl is not None:
+                self._conn.execute(
+                    "DELETE FROM llm_responses WHERE created_at < ?", (now - self.ttl,)
+                )
+            self._conn.execute(
+                "DELETE FROM llm_responses WHERE key NOT IN ("
+                "SELECT key FROM llm_responses ORDER BY accessed_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def delete(self, key: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM llm_responses")
+
+
+class RedisCache(ResponseCache):
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        port: Optional[str] = None,
+        ttl: Optional[int] = DEFAULT_CACHE_TTL,
+        max_entries: int = DEFAULT_CACHE_MAX_ENTRIES,
+        key_prefix: str = "kaizen:llm_response:",
+    ):
+        # Size-based eviction is delegated to the Redis maxmemory policy.
+        super().__init__(ttl=ttl, max_entries=max_entries)
+        import redis
+
+        self.key_prefix = key_prefix
+
+        host = host or os.environ.get("REDIS_HOST")
+        port = port or os.environ.get("REDIS_PORT")
+        if not host or not port:
+            raise ValueError(
+                "Redis cache is enabled but REDIS_HOST or REDIS_PORT environment variables are missing"
+            )
+        self._client = redis.Redis(host=host, port=int(port))
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self._client.get(self.key_prefix + key)
+        if value is None:
+            return None
+        return json.loads(value)
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        self._client.set(self.key_prefix + key, json.dumps(value), ex=self.ttl)
+
+    def delete(self, key: str) -> None:
+        self._client.delete(self.key_prefix + key)
+
+    def clear(self) -> None:
+        for key in self._client.scan_iter(match=self.key_prefix + "*"):
+            self._client.delete(key)
+
+
+def create_response_cache(
+    language_model_config: Dict[str, Any]
+) -> Optional[ResponseCache]:
+    """
+    Build the response cache described by the `language_model.cache` config.
+
+    :param language_model_config: The `language_model` section of the config
+    :return: A cache instance, or None if caching is disabled
+    """
+    cache_config = language_model_config.get("cache", {})
+    if not cache_config.get("enabled", False):
+        return None
+
+    default_backend = (
+        "redis" if language_model_config.get("redis_enabled", False) else "memory"
+    )
+    backend = cache_config.get("backend", default_backend)
+    kwargs = {
+        "ttl": cache_config.get("ttl", DEFAULT_CACHE_TTL),
+        "max_entries": cache_config.get("max_entries", DEFAULT_CACHE_MAX_ENTRIES),
+    }
+    if backend == "memory":
+        return InMemoryCache(**kwargs)
+    if backend == "sqlite":
+        return SQLiteCache(path=cache_config.get("path", DEFAULT_CACHE_PATH), **kwargs)
+    if backend == "redis":
+        return RedisCache(**kwargs)
+    raise ValueError(f"Unknown LLM cache backend: {backend}")
@@ -0,0 +1,189 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+import litellm
+
+# How often a waiting coroutine re-checks for a free slot; the slot may be
+# released by another thread or event loop, so it cannot simply be awaited.
+CONCURRENCY_POLL_INTERVAL = 0.05
+# Concurrent failures from one overload only halve the limit once.
+DECREASE_INTERVAL = 1.0
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """True for errors that mean the provider wants us to slow down."""
+    if isinstance(error, (litellm.RateLimitError, litellm.Timeout)):
+        return True
+    return getattr(error, "status_code", None) == 429
+
+
+class TokenBucket:
+    """
+    Refill `per_minute` units per minute, up to `capacity`.
+
+    Callers reserve units up front and sleep for the returned delay, so
+    waiters are served in order and the same bucket works for threads and
+    event loops alike.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self._available = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._available = min(
+            self.capacity, self._available + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` units and return how long to wait before using them."""
+        with self._lock:
+            self._refill()
+            # A single request larger than the bucket would otherwise wait forever.
+            self._available -= min(amount, self.capacity)
+            if self._available >= 0:
+                return 0.0
+            return -self._available / self.rate
+
+    def adjust(self, amount: float) -> None:
+        """Correct an earlier reservation once the real usage is known."""
+        with self._lock:
+            self._refill()
+            self._available = min(self.capacity, self._available - amount)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit: grows by one slot per window of successful
+    requests and halves when the provider reports overload.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1):
+        self.max_limit = max_limit
+        self.min_limit = min(min_limit, max_limit)
+        self.limit = float(max_limit)
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def try_acquire(self) -> bool:
+        with self._condition:
+            if self._in_flight >= int(self.limit):
+                return False
+            self._in_flight += 1
+            return True
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self._in_flight >= int(self.limit):
+                self._condition.wait()
+            self._in_flight += 1
+
+    async def aacquire(self) -> None:
+        while not self.try_acquire():
+            await asyncio.sleep(CONCURRENCY_POLL_INTERVAL)
+
+    def release(self, succeeded: bool = True, overloaded: bool = False) -> None:
+        """
+        Free a slot. Successes grow the limit and overload halves it; other
+        failures leave it unchanged.
+        """
+        with self._condition:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if overloaded:
+                if now - self._last_decrease >= DECREASE_INTERVAL:
+                    self.limit = max(self.min_limit, self.limit / 2)
+                    self._last_decrease = now
+            elif succeeded:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class ModelGroupQuota:
+    """
+    Tokens-per-minute and requests-per-minute buckets of one model group.
+    One quota is shared by every provider in the process.
+    """
+
+    def __init__(self, tpm: Optional[int] = None, rpm: Optional[int] = None):
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.requests = TokenBucket(rpm) if rpm else None
+
+    def reserve(self, estimated_tokens: int) -> float:
+        """Take room for one request and return how long to wait before sending it."""
+        delay = 0.0
+        if self.tokens:
+            delay = max(delay, self.tokens.reserve(estimated_tokens))
+        if self.requests:
+            delay = max(delay, self.requests.reserve(1))
+        return delay
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Charge the difference between the estimate and the real usage."""
+        if self.tokens and actual_tokens:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+
+
+class ModelGroupLimiter:
+    """
+    Client-side limits for one model group: requests wait for a concurrency
+    slot and for room in the group's tokens-per-minute and
+    requests-per-minute buckets before they are sent.
+
+    :param quota: Buckets to draw from, e.g. the process-wide quota of the
+        group; a private one is built from `tpm` and `rpm` when omitted
+    """
+
+    def __init__(
+        self,
+        tpm: Optional[int] = None,
+        rpm: Optional[int] = None,
+        max_concurrency: int = 8,
+        quota: Optional[ModelGroupQuota] = None,
+    ):
+        self.quota = quota or ModelGroupQuota(tpm=tpm, rpm=rpm)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+
+    @property
+    def tokens(self) -> Optional[TokenBucket]:
+        return self.quota.tokens
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int) -> None:
+        self.quota.record_usage(estimated_tokens, actual_tokens)
+
+    @contextmanager
+    def limit(self, estimated_tokens: int):
+        self.concurrency.acquire()
+        try:
+            delay = self.quota.reserve(estimated_tokens)
+            if delay:
+                time.sleep(delay)
+            yield
+        except BaseException as e:
+            self.concurrency.release(succeeded=False, overloaded=is_overload_error(e))
+            raise
+        else:
+            self.concurrency.release()
+
+    @asynccontextmanager
+    async def alimit(self, estimated_tokens: int):
+        await self.concurrency.aacquire()
+        try:
+            delay = self.quota.reserve(estimated_tokens)
+            if delay:
+                await asyncio.sleep(delay)
+            yield
+        except BaseException as e:
+            self.concurrency.release(succeeded=False, overloaded=is_overload_error(e))
+            raise
+        else:
+            self.concurrency.release()
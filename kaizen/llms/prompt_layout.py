@@ -0,0 +1,53 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+@dataclass
+class PromptLayout:
+    """
+    A prompt split into a stable prefix and a variable suffix.
+
+    Providers that cache prompt prefixes only get a hit when every request
+    starts with the same text, so the system prompt, static instructions,
+    custom rules and repository context go first and the part that changes
+    on every call (e.g. the diff of one chunk) goes last.
+    """
+
+    system: str
+    prefix: List[str] = field(default_factory=list)
+    suffix: str = ""
+
+    @property
+    def prefix_text(self) -> str:
+        return "\n".join(block for block in self.prefix if block)
+
+    @property
+    def text(self) -> str:
+        """The user prompt as a single string, e.g. for token counting."""
+        return "\n".join(block for block in (self.prefix_text, self.suffix) if block)
+
+    def messages(self, cache_control: bool = False) -> List[Dict[str, Any]]:
+        """
+        Chat messages for this layout. With `cache_control`, the end of the
+        stable prefix is marked as a cache breakpoint.
+        """
+        if not cache_control or not self.prefix_text:
+            return [
+                {"role": "system", "content": self.system},
+                {"role": "user", "content": self.text},
+            ]
+        content = [
+            {
+                "type": "text",
+                "text": self.prefix_text,
+                "cache_control": dict(CACHE_CONTROL),
+            }
+        ]
+        if self.suffix:
+            content.append({"type": "text", "text": self.suffix})
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": content},
+        ]
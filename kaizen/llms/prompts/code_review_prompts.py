@@ -19,15 +19,15 @@ Provide specific feedback with accurate file paths and line numbers.
 Be thorough and strict, but don't ask clarifying questions.
 """
 
-CODE_REVIEW_PROMPT = """
+CODE_REVIEW_INSTRUCTIONS = """
 Provide a concise, actionable code review for the given pull request. Generate a JSON object with the following structure:
-{{
+{
   "code_quality_percentage": <0_TO_100>,
   "security_score": <0_TO_100>,
   "compliance_score": <0_TO_100>,
   "performance_score": <0_TO_100>,
   "review": [
-    {{
+    {
       "category": "<ISSUE_CATEGORY>",
       "description": "<CONCISE_ISSUE_DESCRIPTION>",
       "impact": "critical|high|medium|low|trivial",
@@ -45,9 +45,9 @@ Provide a concise, actionable code review for the given pull request. Generate a
       "type": "general|performance|security|refactoring|best_practices|duplication|maintainability|scalability|error_handling|resource_management|concurrency|dependencies|compatibility|accessibility|localization|efficiency|readability|naming",
       "technical_debt": "<POTENTIAL_FUTURE_ISSUES>|empty",
       "alternatives": "<ALTERNATIVE_SOLUTIONS>|empty"
-    }}
+    }
   ]
-}}
+}
 
 ## Code Quality Parameters:
 When reviewing code and calculating the code quality percentage, consider:
@@ -76,7 +76,7 @@ Score each parameter 1-10, then calculate the overall percentage.
 - Merge duplicate feedback
 - Check for OWASP Top 10 vulnerabilities.
 - Examine: syntax/logic errors, resource leaks, race conditions, security vulnerabilities, performance issues, scalability concerns, refactoring opportunities, and code duplication
-- If no issues found: {{"review": []}}
+- If no issues found: {"review": []}
 
 ## Patch Data Format:
 - First column: Line number in the context
@@ -100,11 +100,9 @@ Example:
 6. Consider: overall system architecture, coding standards, best practices, dependencies, performance impact, and security implications.
 7. Identify code duplication and suggest refactoring.
 8. Prioritize issues based on impact. Be strict; don't let issues slide.
-9. If no issues found: {{"review": []}}
+9. If no issues found: {"review": []}
 10. Make sure suggested_code and current_code return full functional block of code. We will use that to overwrite the current_code.
 
-{CUSTOM_RULES}
-
 ## Additional Considerations:
 - Language-specific best practices and common pitfalls
 - Impact of changes on project dependencies
@@ -117,10 +115,23 @@ Example:
 
 Provide concrete examples or code snippets when suggesting improvements.
 
+"""
+
+CODE_REVIEW_RULES_PROMPT = "Always mark issues that violate the following rules with a severity of 8 or higher (high and above):{CUSTOM_RULES}"
+
+CODE_REVIEW_DIFF_PROMPT = """
 ## PATCH DATA:
 ```{CODE_DIFF}```
 """
 
+# The whole review prompt in one template, with the custom rules placed
+# between the instructions and the diff.
+CODE_REVIEW_PROMPT = (
+    CODE_REVIEW_INSTRUCTIONS.replace("{", "{{").replace("}", "}}")
+    + "\n{CUSTOM_RULES}\n"
+    + CODE_REVIEW_DIFF_PROMPT
+)
+
 
 PR_REVIEW_EVALUATION_PROMPT = """
 
@@ -1 +1,12 @@
 BASIC_SYSTEM_PROMPT = "You are an helpful AI Assistant"
+
+JSON_REPAIR_SYSTEM_PROMPT = "You fix malformed JSON. Reply with the corrected JSON only, without any explanation or markdown."
+
+JSON_REPAIR_PROMPT = """
+The following output was meant to be a single valid JSON object, but it could not be parsed ({ERROR}). It may also have been cut off before the end.
+
+Return the same JSON object with the syntax fixed. Keep every key and value that is already there, and if the output was cut off, complete the last element and close the object. Do not add any new content.
+
+Output:
+{MALFORMED_JSON}
+"""
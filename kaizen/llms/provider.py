@@ -1,11 +1,28 @@
+import asyncio
 import litellm
 import os
-from typing import Dict, Optional, Any, Tuple
-from kaizen.llms.prompts.general_prompts import BASIC_SYSTEM_PROMPT
+import threading
+import weakref
+from typing import Callable, Dict, List, Optional, Any, Tuple
+from kaizen.llms.prompts.general_prompts import (
+    BASIC_SYSTEM_PROMPT,
+    JSON_REPAIR_PROMPT,
+    JSON_REPAIR_SYSTEM_PROMPT,
+)
 from kaizen.utils.config import ConfigData
-from kaizen.helpers.general import retry
-from kaizen.helpers.parser import extract_json
-from litellm import Router, embedding
+from kaizen.helpers.general import RetryPolicy, is_transient_error
+from kaizen.helpers.parser import (
+    STREAM_ARRAY_KEYS,
+    JSONArrayStream,
+    extract_json,
+    repair_json,
+)
+from kaizen.llms import registry
+from kaizen.llms.cache import ResponseCache, make_cache_key
+from kaizen.llms.limits import ModelGroupLimiter
+from kaizen.llms.prompt_layout import PromptLayout
+from litellm import embedding
+import json
 import logging
 from collections import defaultdict
 
@@ -36,6 +53,36 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def _is_retryable_json_error(error: BaseException) -> bool:
+    # JSON that neither local repair nor a correction turn could fix is worth
+    # one more full request (the cached response is dropped first); other
+    # deterministic errors are not.
+    return is_transient_error(error) or isinstance(error, json.JSONDecodeError)
+
+
+LLM_RETRY_POLICY = RetryPolicy(max_attempts=3, base_delay=0.5, max_delay=30)
+JSON_RETRY_POLICY = RetryPolicy(
+    max_attempts=3, base_delay=0.5, max_delay=30, retry_on=_is_retryable_json_error
+)
+
+
+def _report_once(on_item: Optional[Callable[[Any], None]]) -> Callable[[Any], None]:
+    """
+    Wrap `on_item` so a retried completion does not report the elements an
+    earlier attempt already reported. Elements are identified by their
+    position in the array, so identical issues are still reported each.
+    """
+    reported = set()
+
+    def report(index, item):
+        if on_item is None or index in reported:
+            return
+        reported.add(index)
+        on_item(item)
+
+    return report
+
+
 class LLMProvider:
     DEFAULT_MODEL = "gpt-4o-mini"
     DEFAULT_MAX_TOKENS = 4000
@@ -43,6 +90,7 @@ class LLMProvider:
     DEFAULT_MODEL_CONFIG = {"model": DEFAULT_MODEL}
     DEFAULT_MODEL_NAME = "default"
     DEFAULT_USAGE = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    DEFAULT_MAX_CONCURRENCY = 8
 
     def __init__(
         self,
@@ -50,6 +98,8 @@ class LLMProvider:
         model_config: Dict[str, Any] = DEFAULT_MODEL_CONFIG,
         default_temperature: float = 0.3,
         callback_obj="supabase",
+        max_concurrency: Optional[int] = None,
+        cache: Optional[ResponseCache] = None,
     ):
         self.config = ConfigData().get_config_data()
         self.system_prompt = system_prompt
@@ -61,6 +111,16 @@ class LLMProvider:
         )
 
         self._validate_config()
+        self.max_concurrency = max_concurrency or self.config["language_model"].get(
+            "max_concurrent_requests", self.DEFAULT_MAX_CONCURRENCY
+        )
+        self._semaphores = weakref.WeakKeyDictionary()
+        self._semaphores_lock = threading.Lock()
+        self._limiters = {}
+        self._limiters_lock = threading.Lock()
+        self.cache = cache or registry.get_response_cache(self.config["language_model"])
+        self.token_counter = registry.get_token_counter()
+        self._feature_support = {}
         self._setup_provider()
         self._setup_observability()
         self._register_unkown_models()
@@ -92,7 +152,9 @@ class LLMProvider:
         if self.config["language_model"].get("redis_enabled", False):
             self._setup_redis(provider_kwargs)
 
-        self.provider = Router(**provider_kwargs)
+        # Routers are shared per config, so constructing a provider per job
+        # does not rebuild the router or reconnect to Redis.
+        self.provider = registry.get_router(provider_kwargs)
         self.model = self.models[0]["litellm_params"]["model"]
         self.model_group_to_name = dict(
             defaultdict(
@@ -136,12 +198,218 @@ class LLMProvider:
                 # Register this model
                 litellm.register_model({model_data["model_name"]: model_info})
 
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # asyncio primitives are bound to the loop they are first used on, so
+        # keep one semaphore per loop; threads running their own loops can
+        # then share this provider.
+        loop = asyncio.get_running_loop()
+        with self._semaphores_lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._semaphores[loop] = semaphore
+        return semaphore
+
+    def _prepare_request(
+        self,
+        prompt,
+        model: str = "default",
+        custom_model: Optional[Dict[str, Any]] = None,
+        messages=None,
+        system_prompt: Optional[str] = None,
+    ) -> Tuple[list, Dict[str, Any]]:
+        if not messages:
+            messages = [
+                {"role": "system", "content": system_prompt or self.system_prompt},
+                {"role": "user", "content": prompt},
+            ]
+        custom_model = dict(custom_model) if custom_model else {"model": model}
+        if "temperature" not in custom_model:
+            custom_model["temperature"] = self.default_temperature
+        return messages, custom_model
+
+    def _cache_key(self, messages, custom_model: Dict[str, Any]) -> Optional[str]:
+        if not self.cache:
+            return None
+        params = {k: v for k, v in custom_model.items() if k != "model"}
+        return make_cache_key(custom_model["model"], messages, params)
+
+    def _get_cached_response(self, cache_key: Optional[str]) -> Optional[Dict]:
+        if not cache_key:
+            return None
+        try:
+            return self.cache.get(cache_key)
+        except Exception as e:
+            self.logger.warning(f"LLM cache lookup failed: {e}")
+            return None
+
+    def _set_cached_response(
+        self, cache_key: Optional[str], model: str, content: str
+    ) -> None:
+        if not cache_key:
+            return
+        try:
+            self.cache.set(cache_key, {"model": model, "content": content})
+        except Exception as e:
+            self.logger.warning(f"LLM cache write failed: {e}")
+
+    def _invalidate_cached_response(
+        self,
+        prompt,
+        model="default",
+        custom_model=None,
+        messages=None,
+        system_prompt=None,
+    ) -> None:
+        messages, custom_model = self._prepare_request(
+            prompt,
+            model=model,
+            custom_model=custom_model,
+            messages=messages,
+            system_prompt=system_prompt,
+        )
+        cache_key = self._cache_key(messages, custom_model)
+        if cache_key:
+            try:
+                self.cache.delete(cache_key)
+            except Exception as e:
+                self.logger.warning(f"LLM cache invalidation failed: {e}")
+
+    @staticmethod
+    def _response_usage(response) -> Dict[str, Any]:
+        # The model that served the request is returned with the usage rather
+        # than stored on the provider, so one provider can serve concurrent
+        # callers without cross-talk.
+        usage = response["usage"]
+        return {
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0),
+            "total_tokens": usage.get("total_tokens", 0),
+            "model": response.get("model"),
+        }
+
+    def _rate_limit_settings(self, model_group: str) -> Dict[str, Any]:
+        settings = (
+            self.config["language_model"].get("rate_limits", {}).get(model_group, {})
+        )
+        settings = {
+            key: settings[key]
+            for key in ("tpm", "rpm", "max_concurrency")
+            if key in settings
+        }
+        # Fall back to the litellm-style tpm/rpm quotas of the group's
+        # deployments, which add up across the group.
+        for key in ("tpm", "rpm"):
+            if key not in settings:
+                total = sum(
+                    item.get(key) or item["litellm_params"].get(key) or 0
+                    for item in self.models
+                    if item["model_name"] == model_group
+                )
+                if total:
+                    settings[key] = total
+        settings.setdefault("max_concurrency", self.max_concurrency)
+        return settings
+
+    def _get_limiter(self, messages, custom_model) -> Tuple[ModelGroupLimiter, int]:
+        model_group = custom_model["model"]
+        with self._limiters_lock:
+            limiter = self._limiters.get(model_group)
+            if limiter is None:
+                # The tpm/rpm quota is shared process-wide; the concurrency
+                # limit applies to the callers of this provider.
+                settings = self._rate_limit_settings(model_group)
+                limiter = ModelGroupLimiter(
+                    max_concurrency=settings["max_concurrency"],
+                    quota=registry.get_quota(
+                        model_group, settings.get("tpm"), settings.get("rpm")
+                    ),
+                )
+                self._limiters[model_group] = limiter
+        estimated_tokens = 0
+        if limiter.tokens:
+            model = (self.model_group_to_name.get(model_group) or [model_group])[0]
+            estimated_tokens = self.token_counter.count_messages(model, messages) or 0
+        return limiter, estimated_tokens
+
+    def router_completion(self, messages, user, custom_model):
+        limiter, estimated_tokens = self._get_limiter(messages, custom_model)
+        with limiter.limit(estimated_tokens):
+            response = self.provider.completion(
+                messages=messages, user=user, **custom_model
+            )
+        limiter.record_usage(
+            estimated_tokens, self._response_usage(response)["total_tokens"]
+        )
+        return response
+
     async def router_acompletion(self, messages, user, custom_model):
-        response = await self.provider.acompletion(
-            messages=messages, user=user, **custom_model
+        limiter, estimated_tokens = self._get_limiter(messages, custom_model)
+        async with self._get_semaphore(), limiter.alimit(estimated_tokens):
+            response = await self.provider.acompletion(
+                messages=messages, user=user, **custom_model
+            )
+        limiter.record_usage(
+            estimated_tokens, self._response_usage(response)["total_tokens"]
         )
         return response
 
+    def router_stream(self, messages, user, custom_model):
+        limiter, estimated_tokens = self._get_limiter(messages, custom_model)
+        usage = None
+        with limiter.limit(estimated_tokens):
+            response = self.provider.completion(
+                messages=messages,
+                user=user,
+                stream=True,
+                stream_options={"include_usage": True},
+                **custom_model,
+            )
+            for chunk in response:
+                usage = getattr(chunk, "usage", None) or usage
+                yield chunk
+        limiter.record_usage(estimated_tokens, getattr(usage, "total_tokens", 0))
+
+    async def router_astream(self, messages, user, custom_model):
+        limiter, estimated_tokens = self._get_limiter(messages, custom_model)
+        usage = None
+        # The slot is held until the stream is drained, not just until the
+        # first chunk arrives.
+        async with self._get_semaphore(), limiter.alimit(estimated_tokens):
+            response = await self.provider.acompletion(
+                messages=messages,
+                user=user,
+                stream=True,
+                stream_options={"include_usage": True},
+                **custom_model,
+            )
+            async for chunk in response:
+                usage = getattr(chunk, "usage", None) or usage
+                yield chunk
+        limiter.record_usage(estimated_tokens, getattr(usage, "total_tokens", 0))
+
+    @staticmethod
+    def _stream_chunk_content(chunk) -> str:
+        choices = getattr(chunk, "choices", None)
+        if not choices:
+            return ""
+        return getattr(choices[0].delta, "content", None) or ""
+
+    def _stream_usage(self, usage, model: str, messages, content: str):
+        if usage is None:
+            # Not every backend reports usage on streams; count it locally.
+            prompt_tokens = self.token_counter.count_messages(model, messages) or 0
+            completion_tokens = self.token_counter.count_text(model, content) or 0
+        else:
+            prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+            completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "model": model,
+        }
+
     def chat_completion(
         self,
         prompt,
@@ -149,21 +417,50 @@ class LLMProvider:
         model="default",
         custom_model=None,
         messages=None,
+        system_prompt: Optional[str] = None,
     ) -> Tuple[str, Dict[str, int]]:
-        if not messages:
-            messages = [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": prompt},
-            ]
-        if not custom_model:
-            custom_model = {"model": model}
-        if "temperature" not in custom_model:
-            custom_model["temperature"] = self.default_temperature
-        response = self.provider.completion(
-            messages=messages, user=user, **custom_model
+        messages, custom_model = self._prepare_request(
+            prompt,
+            model=model,
+            custom_model=custom_model,
+            messages=messages,
+            system_prompt=system_prompt,
+        )
+        cache_key = self._cache_key(messages, custom_model)
+        cached = self._get_cached_response(cache_key)
+        if cached:
+            return cached["content"], dict(self.DEFAULT_USAGE, model=cached["model"])
+
+        response = self.router_completion(messages, user, custom_model)
+        content = response["choices"][0]["message"]["content"]
+        self._set_cached_response(cache_key, response["model"], content)
+        return content, self._response_usage(response)
+
+    async def achat_completion(
+        self,
+        prompt,
+        user: str = None,
+        model="default",
+        custom_model=None,
+        messages=None,
+        system_prompt: Optional[str] = None,
+    ) -> Tuple[str, Dict[str, int]]:
+        messages, custom_model = self._prepare_request(
+            prompt,
+            model=model,
+            custom_model=custom_model,
+            messages=messages,
+            system_prompt=system_prompt,
         )
-        self.model = response["model"]
-        return response["choices"][0]["message"]["content"], response["usage"]
+        cache_key = self._cache_key(messages, custom_model)
+        cached = self._get_cached_response(cache_key)
+        if cached:
+            return cached["content"], dict(self.DEFAULT_USAGE, model=cached["model"])
+
+        response = await self.router_acompletion(messages, user, custom_model)
+        content = response["choices"][0]["message"]["content"]
+        self._set_cached_response(cache_key, response["model"], content)
+        return content, self._response_usage(response)
 
     def raw_chat_completion(
         self,
@@ -173,11 +470,12 @@ class LLMProvider:
         custom_model=None,
         messages=None,
         n_choices=1,
+        system_prompt: Optional[str] = None,
     ) -> Tuple[Dict, Dict[str, int]]:
         custom_model["n"] = n_choices
         if not messages:
             messages = [
-                {"role": "system", "content": self.system_prompt},
+                {"role": "system", "content": system_prompt or self.system_prompt},
                 {"role": "user", "content": prompt},
             ]
         if not custom_model:
@@ -185,13 +483,110 @@ class LLMProvider:
         if "temperature" not in custom_model:
             custom_model["temperature"] = self.default_temperature
 
-        response = self.provider.completion(
-            messages=messages, user=user, **custom_model
+        response = self.router_completion(messages, user, custom_model)
+        return response, self._response_usage(response)
+
+    def _model_group_supports(self, feature: str, model_group: str, check) -> bool:
+        # The router may pick any deployment of the group, so all of them
+        # must support the feature.
+        key = (feature, model_group)
+        if key not in self._feature_support:
+            supported = True
+            for model in self.model_group_to_name.get(model_group) or [model_group]:
+                try:
+                    supported = bool(check(model))
+                except Exception:
+                    supported = False
+                if not supported:
+                    break
+            self._feature_support[key] = supported
+        return self._feature_support[key]
+
+    def _supports_json_mode(self, model_group: str) -> bool:
+        return self._model_group_supports(
+            "json_mode",
+            model_group,
+            lambda model: "response_format"
+            in (litellm.get_supported_openai_params(model=model) or []),
+        )
+
+    def supports_prompt_caching(self, model_group: str = "default") -> bool:
+        return self._model_group_supports(
+            "prompt_caching",
+            model_group,
+            lambda model: litellm.utils.supports_prompt_caching(model=model),
         )
-        self.model = response["model"]
-        return response, response["usage"]
 
-    @retry(max_attempts=3, delay=0.1)
+    def layout_messages(
+        self, layout: PromptLayout, model: str = "default"
+    ) -> List[Dict[str, Any]]:
+        """
+        Messages for `layout`, with a cache-control marker after the stable
+        prefix when every deployment of the model group supports it.
+        """
+        return layout.messages(cache_control=self.supports_prompt_caching(model))
+
+    def _json_custom_model(self, model, custom_model) -> Dict[str, Any]:
+        custom_model = dict(custom_model) if custom_model else {"model": model}
+        if (
+            self.config["language_model"].get("json_mode", False)
+            and "response_format" not in custom_model
+            and self._supports_json_mode(custom_model["model"])
+        ):
+            custom_model["response_format"] = {"type": "json_object"}
+        return custom_model
+
+    @staticmethod
+    def _parse_repaired_json(text: str):
+        try:
+            return extract_json(text)
+        except ValueError:
+            repaired = repair_json(text)
+            if repaired is None:
+                raise
+            return repaired
+
+    def _parse_json_response(self, response: str, user, custom_model):
+        """
+        Parse a JSON completion, repairing it locally if needed. Only when
+        that fails is the model asked to fix its own output, in a short turn
+        that carries the malformed output but not the original prompt.
+        Returns the data and the usage of the correction turn, if any.
+        """
+        try:
+            return extract_json(response), None
+        except ValueError as e:
+            error = e
+        repaired = repair_json(response)
+        if repaired is not None:
+            return repaired, None
+        self.logger.info(f"Asking the model to fix malformed JSON: {error}")
+        fixed, usage = self.chat_completion(
+            JSON_REPAIR_PROMPT.format(ERROR=error, MALFORMED_JSON=response),
+            user=user,
+            custom_model=custom_model,
+            system_prompt=JSON_REPAIR_SYSTEM_PROMPT,
+        )
+        return self._parse_repaired_json(fixed), usage
+
+    async def _aparse_json_response(self, response: str, user, custom_model):
+        try:
+            return extract_json(response), None
+        except ValueError as e:
+            error = e
+        repaired = repair_json(response)
+        if repaired is not None:
+            return repaired, None
+        self.logger.info(f"Asking the model to fix malformed JSON: {error}")
+        fixed, usage = await self.achat_completion(
+            JSON_REPAIR_PROMPT.format(ERROR=error, MALFORMED_JSON=response),
+            user=user,
+            custom_model=custom_model,
+            system_prompt=JSON_REPAIR_SYSTEM_PROMPT,
+        )
+        return self._parse_repaired_json(fixed), usage
+
+    @JSON_RETRY_POLICY
     def chat_completion_with_json(
         self,
         prompt,
@@ -199,19 +594,32 @@ class LLMProvider:
         model="default",
         custom_model=None,
         messages=None,
+        system_prompt: Optional[str] = None,
     ):
+        custom_model = self._json_custom_model(model, custom_model)
         response, usage = self.chat_completion(
             prompt=prompt,
             user=user,
             model=model,
             custom_model=custom_model,
             messages=messages,
+            system_prompt=system_prompt,
         )
-        # logger.info(f"completiong response: {response}")
-        response = extract_json(response)
+        try:
+            response, repair_usage = self._parse_json_response(
+                response, user, custom_model
+            )
+        except Exception:
+            # Don't let a malformed cached response poison every retry.
+            self._invalidate_cached_response(
+                prompt, model, custom_model, messages, system_prompt
+            )
+            raise
+        if repair_usage:
+            usage = self.update_usage(usage, repair_usage)
         return response, usage
 
-    @retry(max_attempts=3, delay=0.1)
+    @LLM_RETRY_POLICY
     def chat_completion_with_retry(
         self,
         prompt,
@@ -219,6 +627,7 @@ class LLMProvider:
         model="default",
         custom_model=None,
         messages=None,
+        system_prompt: Optional[str] = None,
     ):
         response, usage = self.chat_completion(
             prompt=prompt,
@@ -226,24 +635,268 @@ class LLMProvider:
             model=model,
             custom_model=custom_model,
             messages=messages,
+            system_prompt=system_prompt,
+        )
+        return response, usage
+
+    @JSON_RETRY_POLICY
+    async def achat_completion_with_json(
+        self,
+        prompt,
+        user: str = None,
+        model="default",
+        custom_model=None,
+        messages=None,
+        system_prompt: Optional[str] = None,
+    ):
+        custom_model = self._json_custom_model(model, custom_model)
+        response, usage = await self.achat_completion(
+            prompt=prompt,
+            user=user,
+            model=model,
+            custom_model=custom_model,
+            messages=messages,
+            system_prompt=system_prompt,
+        )
+        try:
+            response, repair_usage = await self._aparse_json_response(
+                response, user, custom_model
+            )
+        except Exception:
+            self._invalidate_cached_response(
+                prompt, model, custom_model, messages, system_prompt
+            )
+            raise
+        if repair_usage:
+            usage = self.update_usage(usage, repair_usage)
+        return response, usage
+
+    @LLM_RETRY_POLICY
+    async def achat_completion_with_retry(
+        self,
+        prompt,
+        user: str = None,
+        model="default",
+        custom_model=None,
+        messages=None,
+        system_prompt: Optional[str] = None,
+    ):
+        response, usage = await self.achat_completion(
+            prompt=prompt,
+            user=user,
+            model=model,
+            custom_model=custom_model,
+            messages=messages,
+            system_prompt=system_prompt,
+        )
+        return response, usage
+
+    def chat_completion_stream(
+        self,
+        prompt,
+        user: str = None,
+        model="default",
+        custom_model=None,
+        messages=None,
+        system_prompt: Optional[str] = None,
+        on_delta: Optional[Callable[[str], None]] = None,
+    ) -> Tuple[str, Dict[str, int]]:
+        """
+        Same as `chat_completion`, but the completion is streamed and
+        `on_delta` is called with each piece of text as it arrives.
+        """
+        messages, custom_model = self._prepare_request(
+            prompt,
+            model=model,
+            custom_model=custom_model,
+            messages=messages,
+            system_prompt=system_prompt,
+        )
+        cache_key = self._cache_key(messages, custom_model)
+        cached = self._get_cached_response(cache_key)
+        if cached:
+            if on_delta:
+                on_delta(cached["content"])
+            return cached["content"], dict(self.DEFAULT_USAGE, model=cached["model"])
+
+        parts, usage, served_model = [], None, custom_model["model"]
+        for chunk in self.router_stream(messages, user, custom_model):
+            served_model = getattr(chunk, "model", None) or served_model
+            usage = getattr(chunk, "usage", None) or usage
+            delta = self._stream_chunk_content(chunk)
+            if delta:
+                parts.append(delta)
+                if on_delta:
+                    on_delta(delta)
+        content = "".join(parts)
+        self._set_cached_response(cache_key, served_model, content)
+        return content, self._stream_usage(usage, served_model, messages, content)
+
+    async def achat_completion_stream(
+        self,
+        prompt,
+        user: str = None,
+        model="default",
+        custom_model=None,
+        messages=None,
+        system_prompt: Optional[str] = None,
+        on_delta: Optional[Callable[[str], None]] = None,
+    ) -> Tuple[str, Dict[str, int]]:
+        messages, custom_model = self._prepare_request(
+            prompt,
+            model=model,
+            custom_model=custom_model,
+            messages=messages,
+            system_prompt=system_prompt,
+        )
+        cache_key = self._cache_key(messages, custom_model)
+        cached = self._get_cached_response(cache_key)
+        if cached:
+            if on_delta:
+                on_delta(cached["content"])
+            return cached["content"], dict(self.DEFAULT_USAGE, model=cached["model"])
+
+        parts, usage, served_model = [], None, custom_model["model"]
+        async for chunk in self.router_astream(messages, user, custom_model):
+            served_model = getattr(chunk, "model", None) or served_model
+            usage = getattr(chunk, "usage", None) or usage
+            delta = self._stream_chunk_content(chunk)
+            if delta:
+                parts.append(delta)
+                if on_delta:
+                    on_delta(delta)
+        content = "".join(parts)
+        self._set_cached_response(cache_key, served_model, content)
+        return content, self._stream_usage(usage, served_model, messages, content)
+
+    def chat_completion_with_json_stream(
+        self,
+        prompt,
+        user: str = None,
+        model="default",
+        custom_model=None,
+        messages=None,
+        system_prompt: Optional[str] = None,
+        on_item: Optional[Callable[[Any], None]] = None,
+        item_keys=STREAM_ARRAY_KEYS,
+    ):
+        """
+        Same as `chat_completion_with_json`, but `on_item` is called with each
+        element of the `review`/`issues` array as soon as the model finishes
+        writing it. When a malformed response is retried, elements already
+        reported are not reported again.
+        """
+        return self._chat_completion_with_json_stream(
+            prompt,
+            user,
+            model,
+            custom_model,
+            messages,
+            system_prompt,
+            _report_once(on_item),
+            item_keys,
+        )
+
+    @JSON_RETRY_POLICY
+    def _chat_completion_with_json_stream(
+        self, prompt, user, model, custom_model, messages, system_prompt, on_item, keys
+    ):
+        stream = JSONArrayStream(keys)
+
+        def on_delta(delta):
+            for index, item in stream.feed(delta, with_index=True):
+                on_item(index, item)
+
+        custom_model = self._json_custom_model(model, custom_model)
+        response, usage = self.chat_completion_stream(
+            prompt=prompt,
+            user=user,
+            model=model,
+            custom_model=custom_model,
+            messages=messages,
+            system_prompt=system_prompt,
+            on_delta=on_delta,
         )
+        try:
+            response, repair_usage = self._parse_json_response(
+                response, user, custom_model
+            )
+        except Exception:
+            self._invalidate_cached_response(
+                prompt, model, custom_model, messages, system_prompt
+            )
+            raise
+        if repair_usage:
+            usage = self.update_usage(usage, repair_usage)
         return response, usage
 
-    def is_inside_token_limit(self, PROMPT: str, percentage: float = 0.8) -> bool:
+    async def achat_completion_with_json_stream(
+        self,
+        prompt,
+        user: str = None,
+        model="default",
+        custom_model=None,
+        messages=None,
+        system_prompt: Optional[str] = None,
+        on_item: Optional[Callable[[Any], None]] = None,
+        item_keys=STREAM_ARRAY_KEYS,
+    ):
+        return await self._achat_completion_with_json_stream(
+            prompt,
+            user,
+            model,
+            custom_model,
+            messages,
+            system_prompt,
+            _report_once(on_item),
+            item_keys,
+        )
+
+    @JSON_RETRY_POLICY
+    async def _achat_completion_with_json_stream(
+        self, prompt, user, model, custom_model, messages, system_prompt, on_item, keys
+    ):
+        stream = JSONArrayStream(keys)
+
+        def on_delta(delta):
+            for index, item in stream.feed(delta, with_index=True):
+                on_item(index, item)
+
+        custom_model = self._json_custom_model(model, custom_model)
+        response, usage = await self.achat_completion_stream(
+            prompt=prompt,
+            user=user,
+            model=model,
+            custom_model=custom_model,
+            messages=messages,
+            system_prompt=system_prompt,
+            on_delta=on_delta,
+        )
+        try:
+            response, repair_usage = await self._aparse_json_response(
+                response, user, custom_model
+            )
+        except Exception:
+            self._invalidate_cached_response(
+                prompt, model, custom_model, messages, system_prompt
+            )
+            raise
+        if repair_usage:
+            usage = self.update_usage(usage, repair_usage)
+        return response, usage
+
+    def is_inside_token_limit(
+        self, PROMPT: str, percentage: float = 0.8, system_prompt: Optional[str] = None
+    ) -> bool:
         # Include system prompt in token calculation
         messages = [
-            {"role": "system", "content": self.system_prompt},
+            {"role": "system", "content": system_prompt or self.system_prompt},
             {"role": "user", "content": PROMPT},
         ]
-        token_count = litellm.token_counter(model=self.model, messages=messages)
+        token_count = self.token_counter.count_messages(self.model, messages)
         if token_count is None:
-            token_count = litellm.token_counter(model=self.DEFAULT_MODEL, text=PROMPT)
-        try:
-            max_tokens = litellm.get_max_tokens(self.model)
-        except Exception:
-            max_tokens = DEFAULT_MAX_TOKENS
-        if not max_tokens:
-            max_tokens = DEFAULT_MAX_TOKENS
+            token_count = self.token_counter.count_text(self.DEFAULT_MODEL, PROMPT)
+        max_tokens = self.token_counter.max_tokens(self.model) or DEFAULT_MAX_TOKENS
         return token_count <= max_tokens * percentage
 
     def available_tokens(
@@ -251,33 +904,43 @@ class LLMProvider:
     ) -> int:
         if not model:
             model = self.model
-        try:
-            max_tokens = litellm.get_max_tokens(model)
-        except Exception:
-            max_tokens = DEFAULT_MAX_TOKENS
-        used_tokens = litellm.token_counter(model=model, text=message)
-        if max_tokens:
-            return int(max_tokens * percentage) - used_tokens
-        else:
-            return DEFAULT_MAX_TOKENS - used_tokens
+        max_tokens = self.token_counter.max_tokens(model) or DEFAULT_MAX_TOKENS
+        used_tokens = self.token_counter.count_text(model, message)
+        return int(max_tokens * percentage) - used_tokens
 
     def get_token_count(self, message: str, model: str = None) -> int:
         if not model:
             model = self.model
-        return litellm.token_counter(model=model, text=message)
+        return self.token_counter.count_text(model, message)
 
     def update_usage(
-        self, total_usage: Optional[Dict[str, int]], current_usage: Dict[str, int]
-    ) -> Dict[str, int]:
-        if total_usage is not None:
-            return {key: total_usage[key] + current_usage[key] for key in total_usage}
-        return {key: current_usage[key] for key in current_usage}
+        self, total_usage: Optional[Dict[str, Any]], current_usage: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Add `current_usage` to `total_usage`. Token counts are summed and the
+        "model" entry tracks the model of the latest call.
+        """
+        if total_usage is None:
+            return dict(current_usage)
+        updated = {
+            key: total_usage[key] + current_usage.get(key, 0)
+            for key in total_usage
+            if key != "model"
+        }
+        model = current_usage.get("model") or total_usage.get("model")
+        if model:
+            updated["model"] = model
+        return updated
+
+    def get_usage_model(self, usage: Optional[Dict[str, Any]]) -> str:
+        """Model that served the calls in `usage`, or the default model."""
+        return (usage or {}).get("model") or self.model
 
     def get_usage_cost(
-        self, total_usage: Dict[str, int], model: str = None
+        self, total_usage: Dict[str, Any], model: str = None
     ) -> Tuple[float, float]:
         if not model:
-            model = self.model
+            model = self.get_usage_model(total_usage)
         try:
             return litellm.cost_per_token(
                 model, total_usage["prompt_tokens"], total_usage["completion_tokens"]
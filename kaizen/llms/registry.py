@@ -0,0 +1,97 @@
+import json
+import threading
+from typing import Any, Dict, Optional
+
+from litellm import Router
+
+from kaizen.llms.cache import ResponseCache, create_response_cache
+from kaizen.llms.limits import ModelGroupQuota
+from kaizen.llms.tokens import TokenCounter
+
+_routers: Dict[str, Router] = {}
+_caches: Dict[str, Optional[ResponseCache]] = {}
+_quotas: Dict[str, ModelGroupQuota] = {}
+_token_counter: Optional[TokenCounter] = None
+_lock = threading.Lock()
+
+
+def _registry_key(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+def get_router(router_kwargs: Dict[str, Any]) -> Router:
+    """
+    Return the process-wide litellm Router for `router_kwargs`.
+
+    Building a Router (and its Redis connection when enabled) is expensive,
+    so providers created with the same model list and routing settings
+    share one instance.
+    """
+    key = _registry_key(router_kwargs)
+    with _lock:
+        router = _routers.get(key)
+        if router is None:
+            router = Router(**router_kwargs)
+            _routers[key] = router
+    return router
+
+
+def get_response_cache(
+    language_model_config: Dict[str, Any]
+) -> Optional[ResponseCache]:
+    """
+    Return the process-wide response cache for the `language_model` config,
+    so an in-memory cache is shared by every provider instead of starting
+    empty for each one.
+    """
+    key = _registry_key(
+        {
+            "cache": language_model_config.get("cache", {}),
+            "redis_enabled": language_model_config.get("redis_enabled", False),
+        }
+    )
+    with _lock:
+        if key not in _caches:
+            _caches[key] = create_response_cache(language_model_config)
+        return _caches[key]
+
+
+def get_quota(
+    model_group: str, tpm: Optional[int] = None, rpm: Optional[int] = None
+) -> ModelGroupQuota:
+    """
+    Return the process-wide tpm/rpm quota of `model_group`, so every provider
+    and job in the process draws from the same buckets.
+    """
+    key = _registry_key({"model_group": model_group, "tpm": tpm, "rpm": rpm})
+    with _lock:
+        quota = _quotas.get(key)
+        if quota is None:
+            quota = ModelGroupQuota(tpm=tpm, rpm=rpm)
+            _quotas[key] = quota
+    return quota
+
+
+def get_token_counter() -> TokenCounter:
+    """
+    Return the process-wide token counter, so a diff counted by one provider
+    is not tokenized again by the next one.
+    """
+    global _token_counter
+    with _lock:
+        if _token_counter is None:
+            _token_counter = TokenCounter()
+        return _token_counter
+
+
+def clear() -> None:
+    """
+    Forget shared routers, caches, quotas and token counts, e.g. after the
+    config changed.
+    """
+    global _token_counter
+    with _lock:
+        _routers.clear()
+        _caches.clear()
+        _quotas.clear()
+        _token_counter = None
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import litellm
+
+DEFAULT_COUNT_CACHE_SIZE = 4096
+
+
+class TokenCounter:
+    """
+    Count tokens with litellm, caching results for repeated strings.
+
+    Entries are keyed by a digest of the model and text, so memory stays
+    bounded by `max_entries` regardless of how large the counted diffs are.
+    litellm already keeps its tokenizers loaded per model; this avoids
+    re-tokenizing the same prompt or diff.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_COUNT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._counts = OrderedDict()
+        self._max_tokens = {}
+        self._lock = threading.Lock()
+
+    def max_tokens(self, model: str) -> Optional[int]:
+        """
+        Memoized `litellm.get_max_tokens`. Unknown models return None instead
+        of raising, so the slow failure path is only taken once per model.
+        """
+        if model not in self._max_tokens:
+            try:
+                self._max_tokens[model] = litellm.get_max_tokens(model)
+            except Exception:
+                self._max_tokens[model] = None
+        return self._max_tokens[model]
+
+    @staticmethod
+    def _key(model: str, kind: str, payload: str) -> bytes:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{model}\0{kind}\0".encode("utf-8"))
+        digest.update(payload.encode("utf-8", "surrogatepass"))
+        return digest.digest()
+
+    def _cached(self, key: bytes, count) -> int:
+        with self._lock:
+            if key in self._counts:
+                self._counts.move_to_end(key)
+                return self._counts[key]
+        # Count outside the lock; a concurrent duplicate count is harmless.
+        tokens = count()
+        with self._lock:
+            self._counts[key] = tokens
+            self._counts.move_to_end(key)
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+        return tokens
+
+    def count_text(self, model: str, text: str) -> int:
+        return self._cached(
+            self._key(model, "text", text),
+            lambda: litellm.token_counter(model=model, text=text),
+        )
+
+    def count_messages(self, model: str, messages: List[Dict[str, str]]) -> int:
+        payload = json.dumps(messages, sort_keys=True, default=str)
+        return self._cached(
+            self._key(model, "messages", payload),
+            lambda: litellm.token_counter(model=model, messages=messages),
+        )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counts.clear()
+            self._max_tokens.clear()
@@ -1,7 +1,7 @@
 from typing import Optional, List, Dict, Generator
 from dataclasses import dataclass
 import logging
-from kaizen.helpers import parser
+from kaizen.helpers import chunker, parser
 from kaizen.llms.provider import LLMProvider
 from kaizen.llms.prompts.ask_question_prompts import (
     ANSWER_QUESTION_SYSTEM_PROMPT,
@@ -23,7 +23,7 @@ class QuestionAnswer:
     def __init__(self, llm_provider: LLMProvider):
         self.logger = logging.getLogger(__name__)
         self.provider = llm_provider
-        self.provider.system_prompt = ANSWER_QUESTION_SYSTEM_PROMPT
+        self.system_prompt = ANSWER_QUESTION_SYSTEM_PROMPT
         self.total_usage = {
             "prompt_tokens": 0,
             "completion_tokens": 0,
@@ -43,7 +43,9 @@ class QuestionAnswer:
             CODE_DIFF=parser.patch_to_combined_chunks(diff_text),
             QUESTION=question,
         )
-        return self.provider.is_inside_token_limit(PROMPT=prompt)
+        return self.provider.is_inside_token_limit(
+            PROMPT=prompt, system_prompt=self.system_prompt
+        )
 
     def ask_pull_request(
         self,
@@ -68,7 +70,9 @@ class QuestionAnswer:
         if not diff_text and not pull_request_files:
             raise Exception("Both diff_text and pull_request_files are empty!")
 
-        if diff_text and self.provider.is_inside_token_limit(PROMPT=prompt):
+        if diff_text and self.provider.is_inside_token_limit(
+            PROMPT=prompt, system_prompt=self.system_prompt
+        ):
             resp = self._process_full_diff_qa(prompt, user)
 
         else:
@@ -87,7 +91,7 @@ class QuestionAnswer:
         return AnswerOutput(
             answer=resp,
             usage=self.total_usage,
-            model_name=self.provider.model,
+            model_name=self.provider.get_usage_model(self.total_usage),
             cost={"prompt_cost": prompt_cost, "completion_cost": completion_cost},
         )
 
@@ -97,7 +101,9 @@ class QuestionAnswer:
         user: Optional[str],
     ) -> str:
         self.logger.debug("Processing directly from diff")
-        resp, usage = self.provider.chat_completion(prompt, user=user)
+        resp, usage = self.provider.chat_completion(
+            prompt, user=user, system_prompt=self.system_prompt
+        )
         self.total_usage = self.provider.update_usage(self.total_usage, usage)
         return resp
 
@@ -130,40 +136,18 @@ class QuestionAnswer:
         question: str,
         user: Optional[str],
     ) -> Generator[str, None, None]:
-        combined_diff_data = ""
         available_tokens = self.provider.available_tokens(FILE_ANSWER_QUESTION_PROMPT)
-
-        for file in pull_request_files:
-            patch_details = file.get("patch")
-            filename = file.get("filename", "")
-
-            if (
-                filename.split(".")[-1] not in parser.EXCLUDED_FILETYPES
-                and patch_details is not None
-            ):
-                temp_prompt = (
-                    combined_diff_data
-                    + f"\n---->\nFile Name: {filename}\nPatch Details: {parser.patch_to_combined_chunks(patch_details)}"
-                )
-
-                if available_tokens - self.provider.get_token_count(temp_prompt) > 0:
-                    combined_diff_data = temp_prompt
-                    continue
-
-                yield self._process_file_chunk_qa(
-                    combined_diff_data,
-                    pull_request_title,
-                    pull_request_desc,
-                    question,
-                    user,
-                )
-                combined_diff_data = (
-                    f"\n---->\nFile Name: {filename}\nPatch Details: {patch_details}"
-                )
-
-        if combined_diff_data:
+        diff_parts = (
+            f"\n---->\nFile Name: {file.get('filename', '')}\nPatch Details: {parser.patch_to_combined_chunks(file['patch'])}"
+            for file in pull_request_files
+            if file.get("filename", "").split(".")[-1] not in parser.EXCLUDED_FILETYPES
+            and file.get("patch") is not None
+        )
+        for diff_data in chunker.chunk_by_token_budget(
+            diff_parts, available_tokens, self.provider.get_token_count
+        ):
             yield self._process_file_chunk_qa(
-                combined_diff_data,
+                diff_data,
                 pull_request_title,
                 pull_request_desc,
                 question,
@@ -186,7 +170,9 @@ class QuestionAnswer:
             FILE_PATCH=diff_data,
             QUESTION=question,
         )
-        resp, usage = self.provider.chat_completion(prompt, user=user)
+        resp, usage = self.provider.chat_completion(
+            prompt, user=user, system_prompt=self.system_prompt
+        )
         self.total_usage = self.provider.update_usage(self.total_usage, usage)
         return resp
 
@@ -202,7 +188,9 @@ class QuestionAnswer:
             QUESTION=question, RESPONSES=formatted_responses
         )
 
-        summarized_answer, usage = self.provider.chat_completion(summary_prompt)
+        summarized_answer, usage = self.provider.chat_completion(
+            summary_prompt, system_prompt=self.system_prompt
+        )
         self.total_usage = self.provider.update_usage(self.total_usage, usage)
 
         return summarized_answer
@@ -1,10 +1,16 @@
-from typing import Optional, List, Dict, Generator, Tuple
+from typing import Callable, Optional, List, Dict, Generator, Tuple
 from dataclasses import dataclass
+import asyncio
 import logging
-from kaizen.helpers import parser
+from kaizen.helpers import chunker, parser
+from kaizen.reviewer import incremental
 from kaizen.llms.provider import LLMProvider
+from kaizen.llms.prompt_layout import PromptLayout
 from kaizen.llms.prompts.code_review_prompts import (
+    CODE_REVIEW_DIFF_PROMPT,
+    CODE_REVIEW_INSTRUCTIONS,
     CODE_REVIEW_PROMPT,
+    CODE_REVIEW_RULES_PROMPT,
     PR_REVIEW_EVALUATION_PROMPT,
     CODE_REVIEW_SYSTEM_PROMPT,
 )
@@ -92,13 +98,28 @@ class ReviewOutput:
     model_name: str
     cost: Dict[str, float]
     file_count: int
+    # Issues per hunk fingerprint, set by incremental reviews for the caller
+    # to persist once the issues have been delivered.
+    hunk_issues: Optional[Dict[str, List[Dict]]] = None
+
+
+class ReviewCancelled(Exception):
+    """Raised between LLM calls when the caller cancels an in-flight review."""
+
+
+def _in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
 
 
 class CodeReviewer:
     def __init__(self, llm_provider: LLMProvider, default_model="default"):
         self.logger = logging.getLogger(__name__)
         self.provider = llm_provider
-        self.provider.set_system_prompt(CODE_REVIEW_SYSTEM_PROMPT)
+        self.system_prompt = CODE_REVIEW_SYSTEM_PROMPT
         self.default_model = default_model
         self.total_usage = {
             "prompt_tokens": 0,
@@ -106,6 +127,57 @@ class CodeReviewer:
             "total_tokens": 0,
         }
         self.ignore_deletions = False
+        self.bin_pack = False
+        self.is_cancelled = None
+        self.on_issue = None
+
+    def _raise_if_cancelled(self):
+        if self.is_cancelled is not None and self.is_cancelled():
+            raise ReviewCancelled("Review was cancelled")
+
+    def _review_completion(
+        self, layout: PromptLayout, user: Optional[str], stream: bool
+    ):
+        custom_model = {"model": self.default_model}
+        messages = self.provider.layout_messages(layout, self.default_model)
+        if stream and self.on_issue is not None:
+            return self.provider.chat_completion_with_json_stream(
+                layout.text,
+                user=user,
+                custom_model=custom_model,
+                messages=messages,
+                system_prompt=self.system_prompt,
+                on_item=self.on_issue,
+            )
+        return self.provider.chat_completion_with_json(
+            layout.text,
+            user=user,
+            custom_model=custom_model,
+            messages=messages,
+            system_prompt=self.system_prompt,
+        )
+
+    async def _areview_completion(
+        self, layout: PromptLayout, user: Optional[str], stream: bool
+    ):
+        custom_model = {"model": self.default_model}
+        messages = self.provider.layout_messages(layout, self.default_model)
+        if stream and self.on_issue is not None:
+            return await self.provider.achat_completion_with_json_stream(
+                layout.text,
+                user=user,
+                custom_model=custom_model,
+                messages=messages,
+                system_prompt=self.system_prompt,
+                on_item=self.on_issue,
+            )
+        return await self.provider.achat_completion_with_json(
+            layout.text,
+            user=user,
+            custom_model=custom_model,
+            messages=messages,
+            system_prompt=self.system_prompt,
+        )
 
     def is_code_review_prompt_within_limit(
         self,
@@ -113,15 +185,15 @@ class CodeReviewer:
         pull_request_title: str,
         pull_request_desc: str,
     ) -> bool:
-        prompt = CODE_REVIEW_PROMPT.format(
-            PULL_REQUEST_TITLE=pull_request_title,
-            PULL_REQUEST_DESC=pull_request_desc,
-            CODE_DIFF=parser.patch_to_combined_chunks(
+        layout = self._build_review_layout(
+            parser.patch_to_combined_chunks(
                 diff_text, ignore_deletions=self.ignore_deletions
             ),
-            CODE_REVIEW_PROMPT=self.custom_rules,
+            "",
+        )
+        return self.provider.is_inside_token_limit(
+            PROMPT=layout.text, system_prompt=self.system_prompt
         )
-        return self.provider.is_inside_token_limit(PROMPT=prompt)
 
     def review_pull_request(
         self,
@@ -136,19 +208,32 @@ class CodeReviewer:
         custom_context: str = "",
         check_sensetive: bool = False,
         custom_rules: str = "",
+        parallel: bool = False,
+        max_concurrency: Optional[int] = None,
+        bin_pack: bool = False,
+        is_cancelled: Optional[Callable[[], bool]] = None,
+        on_issue: Optional[Callable[[Dict], None]] = None,
     ) -> ReviewOutput:
+        """
+        :param parallel: Review file chunks concurrently. Falls back to one
+            chunk at a time when called from a running event loop; use
+            `areview_pull_request` there instead.
+        :param is_cancelled: Optional callable polled before every LLM call;
+            when it returns True the review stops with ReviewCancelled
+        :param on_issue: Optional callable that receives each issue as soon as
+            the model has written it, while the completion is still streaming.
+            Ignored with `reeval_response`, since re-evaluation rewrites the
+            issues. The returned ReviewOutput still holds every issue.
+        """
         self.ignore_deletions = ignore_deletions
+        self.is_cancelled = is_cancelled
+        self.on_issue = on_issue
+        self.bin_pack = bin_pack
         self.files_processed = 0
         self.custom_rules = custom_rules
-        prompt = (
-            CODE_REVIEW_PROMPT.format(
-                CODE_DIFF=parser.patch_to_combined_chunks(
-                    diff_text, self.ignore_deletions
-                ),
-                CUSTOM_RULES="Always mark issues that violate the following rules with a severity of 8 or higher (high and above):"
-                + self.custom_rules,
-            )
-            + custom_context
+        layout = self._build_review_layout(
+            parser.patch_to_combined_chunks(diff_text, self.ignore_deletions),
+            custom_context,
         )
         self.total_usage = {
             "prompt_tokens": 0,
@@ -158,9 +243,23 @@ class CodeReviewer:
         if not diff_text and not pull_request_files:
             raise Exception("Both diff_text and pull_request_files are empty!")
 
-        if diff_text and self.provider.is_inside_token_limit(PROMPT=prompt):
+        if diff_text and self.provider.is_inside_token_limit(
+            PROMPT=layout.text, system_prompt=self.system_prompt
+        ):
             reviews, code_quality = self._process_full_diff(
-                prompt, user, reeval_response
+                layout, user, reeval_response
+            )
+        elif parallel and not _in_event_loop():
+            reviews, code_quality = asyncio.run(
+                self._aprocess_files(
+                    pull_request_files,
+                    pull_request_title,
+                    pull_request_desc,
+                    user,
+                    reeval_response,
+                    custom_context,
+                    max_concurrency,
+                )
             )
         else:
             reviews, code_quality = self._process_files(
@@ -174,35 +273,210 @@ class CodeReviewer:
         if check_sensetive:
             reviews.extend(self.check_sensitive_files(pull_request_files))
 
-        categories = self._merge_categories(reviews)
+        return self._review_output(reviews, code_quality)
+
+    async def areview_pull_request(
+        self,
+        diff_text: str,
+        pull_request_title: str,
+        pull_request_desc: str,
+        pull_request_files: List[Dict],
+        user: Optional[str] = None,
+        reeval_response: bool = False,
+        model="default",
+        ignore_deletions=False,
+        custom_context: str = "",
+        check_sensetive: bool = False,
+        custom_rules: str = "",
+        max_concurrency: Optional[int] = None,
+        bin_pack: bool = False,
+        is_cancelled: Optional[Callable[[], bool]] = None,
+        on_issue: Optional[Callable[[Dict], None]] = None,
+    ) -> ReviewOutput:
+        """
+        Async counterpart of `review_pull_request` for callers that already
+        run an event loop. File chunks are always reviewed concurrently.
+        """
+        self.ignore_deletions = ignore_deletions
+        self.is_cancelled = is_cancelled
+        self.on_issue = on_issue
+        self.bin_pack = bin_pack
+        self.files_processed = 0
+        self.custom_rules = custom_rules
+        layout = self._build_review_layout(
+            parser.patch_to_combined_chunks(diff_text, self.ignore_deletions),
+            custom_context,
+        )
+        self.total_usage = {
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+        }
+        if not diff_text and not pull_request_files:
+            raise Exception("Both diff_text and pull_request_files are empty!")
+
+        if diff_text and self.provider.is_inside_token_limit(
+            PROMPT=layout.text, system_prompt=self.system_prompt
+        ):
+            reviews, code_quality = await self._aprocess_full_diff(
+                layout, user, reeval_response
+            )
+        else:
+            reviews, code_quality = await self._aprocess_files(
+                pull_request_files,
+                pull_request_title,
+                pull_request_desc,
+                user,
+                reeval_response,
+                custom_context,
+                max_concurrency,
+            )
+        if check_sensetive:
+            reviews.extend(self.check_sensitive_files(pull_request_files))
+
+        return self._review_output(reviews, code_quality)
+
+    def review_pull_request_incremental(
+        self,
+        pull_request_title: str,
+        pull_request_desc: str,
+        pull_request_files: List[Dict],
+        review_store: incremental.HunkReviewStore,
+        review_key: str,
+        user: Optional[str] = None,
+        reeval_response: bool = False,
+        ignore_deletions=False,
+        custom_context: str = "",
+        check_sensetive: bool = False,
+        custom_rules: str = "",
+        parallel: bool = False,
+        max_concurrency: Optional[int] = None,
+        is_cancelled: Optional[Callable[[], bool]] = None,
+    ) -> ReviewOutput:
+        """
+        Review only the hunks that changed since the last review of `review_key`.
+
+        Issues found on hunks that were already reviewed are re-attached from
+        `review_store` (marked with `"cached": True`) instead of being sent to
+        the LLM again. The store is only read here: once the issues have been
+        delivered, persist them with
+        `review_store.save(review_key, output.hunk_issues, output.code_quality)`
+        so that a failed or cancelled run is reviewed again in full. As with
+        `review_pull_request`, `parallel` has no effect inside a running
+        event loop.
+        """
+        self.ignore_deletions = ignore_deletions
+        self.is_cancelled = is_cancelled
+        self.on_issue = None
+        self.files_processed = 0
+        self.custom_rules = custom_rules
+        self.bin_pack = False
+        self.total_usage = {
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+        }
+        if not pull_request_files:
+            raise Exception("pull_request_files is empty!")
+
+        previous = review_store.load(review_key)
+        hunks = incremental.collect_hunks(pull_request_files)
+        changed_hunks = [h for h in hunks if h.fingerprint not in previous["hunks"]]
+        self.logger.debug(
+            f"Incremental review: {len(changed_hunks)}/{len(hunks)} hunks changed"
+        )
+
+        new_reviews, code_quality = [], None
+        if changed_hunks:
+            changed_files = incremental.hunks_to_files(changed_hunks)
+            if parallel and not _in_event_loop():
+                new_reviews, code_quality = asyncio.run(
+                    self._aprocess_files(
+                        changed_files,
+                        pull_request_title,
+                        pull_request_desc,
+                        user,
+                        reeval_response,
+                        custom_context,
+                        max_concurrency,
+                    )
+                )
+            else:
+                new_reviews, code_quality = self._process_files(
+                    changed_files,
+                    pull_request_title,
+                    pull_request_desc,
+                    user,
+                    reeval_response,
+                    custom_context,
+                )
+        if code_quality is None:
+            code_quality = previous["code_quality"]
+
+        hunk_issues = incremental.assign_issues(new_reviews, changed_hunks)
+        reviews = list(new_reviews)
+        for hunk in hunks:
+            if hunk.fingerprint in hunk_issues:
+                continue
+            hunk_issues[hunk.fingerprint] = previous["hunks"][hunk.fingerprint]
+            reviews.extend(
+                incremental.reattach_issues(hunk_issues[hunk.fingerprint], hunk)
+            )
+        self.files_processed = len({hunk.filename for hunk in hunks})
+
+        if check_sensetive:
+            reviews.extend(self.check_sensitive_files(pull_request_files))
+
+        return self._review_output(reviews, code_quality, hunk_issues=hunk_issues)
+
+    def _review_output(
+        self,
+        reviews: List[Dict],
+        code_quality: Optional[float],
+        hunk_issues: Optional[Dict[str, List[Dict]]] = None,
+    ) -> ReviewOutput:
         prompt_cost, completion_cost = self.provider.get_usage_cost(
             total_usage=self.total_usage
         )
-
         return ReviewOutput(
             usage=self.total_usage,
-            model_name=self.provider.model,
-            topics=categories,
+            model_name=self.provider.get_usage_model(self.total_usage),
+            topics=self._merge_categories(reviews),
             issues=reviews,
             code_quality=code_quality,
             cost={"prompt_cost": prompt_cost, "completion_cost": completion_cost},
             file_count=self.files_processed,
+            hunk_issues=hunk_issues,
         )
 
     def _process_full_diff(
         self,
-        prompt: str,
+        layout: PromptLayout,
         user: Optional[str],
         reeval_response: bool,
     ) -> List[Dict]:
         self.logger.debug("Processing directly from diff")
-        custom_model = {"model": self.default_model}
-        resp, usage = self.provider.chat_completion_with_json(
-            prompt, user=user, custom_model=custom_model
+        self._raise_if_cancelled()
+        resp, usage = self._review_completion(layout, user, stream=not reeval_response)
+        self.total_usage = self.provider.update_usage(self.total_usage, usage)
+        if reeval_response:
+            resp = self._reevaluate_response(layout.text, resp, "", user)
+        return resp["review"], resp.get("code_quality_percentage", None)
+
+    async def _aprocess_full_diff(
+        self,
+        layout: PromptLayout,
+        user: Optional[str],
+        reeval_response: bool,
+    ) -> List[Dict]:
+        self.logger.debug("Processing directly from diff")
+        self._raise_if_cancelled()
+        resp, usage = await self._areview_completion(
+            layout, user, stream=not reeval_response
         )
         self.total_usage = self.provider.update_usage(self.total_usage, usage)
         if reeval_response:
-            resp = self._reevaluate_response(prompt, resp, user)
+            resp = await self._areevaluate_response(layout.text, resp, "", user)
         return resp["review"], resp.get("code_quality_percentage", None)
 
     def _process_files(
@@ -215,8 +489,6 @@ class CodeReviewer:
         custom_context: str,
     ) -> Tuple[List[Dict], Optional[float]]:
         self.logger.debug("Processing based on files")
-        reviews = []
-        code_quality = None
         file_chunks_generator = self._process_files_generator(
             pull_request_files,
             pull_request_title,
@@ -225,7 +497,52 @@ class CodeReviewer:
             reeval_response,
             custom_context,
         )
-        for result in file_chunks_generator:
+        return self._merge_chunk_results(file_chunks_generator)
+
+    async def _aprocess_files(
+        self,
+        pull_request_files: List[Dict],
+        pull_request_title: str,
+        pull_request_desc: str,
+        user: Optional[str],
+        reeval_response: bool,
+        custom_context: str,
+        max_concurrency: Optional[int] = None,
+    ) -> Tuple[List[Dict], Optional[float]]:
+        self.logger.debug("Processing based on files in parallel")
+        semaphore = asyncio.Semaphore(max_concurrency or self.provider.max_concurrency)
+
+        async def review_chunk(diff_data):
+            async with semaphore:
+                return await self._aprocess_file_chunk(
+                    diff_data,
+                    pull_request_title,
+                    pull_request_desc,
+                    user,
+                    reeval_response,
+                    custom_context,
+                )
+
+        tasks = [
+            asyncio.ensure_future(review_chunk(diff_data))
+            for diff_data in self._chunk_files_generator(pull_request_files)
+        ]
+        try:
+            # gather keeps the results in chunk order, so the merged review is
+            # identical to the sequential one regardless of completion order.
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            # Stop the remaining chunks once one fails or is cancelled.
+            for task in tasks:
+                task.cancel()
+            raise
+        return self._merge_chunk_results(results)
+
+    @staticmethod
+    def _merge_chunk_results(results) -> Tuple[List[Dict], Optional[float]]:
+        reviews = []
+        code_quality = None
+        for result in results:
             if result:  # Check if the result is not None
                 file_review, quality = result
                 reviews.extend(file_review)
@@ -234,6 +551,28 @@ class CodeReviewer:
                         code_quality = quality
         return reviews, code_quality
 
+    def _chunk_files_generator(
+        self, pull_request_files: List[Dict]
+    ) -> Generator[str, None, None]:
+        available_tokens = self.provider.available_tokens(CODE_REVIEW_PROMPT)
+        yield from chunker.chunk_by_token_budget(
+            self._file_diff_parts(pull_request_files),
+            available_tokens,
+            self.provider.get_token_count,
+            bin_pack=self.bin_pack,
+        )
+
+    def _file_diff_parts(
+        self, pull_request_files: List[Dict]
+    ) -> Generator[str, None, None]:
+        for file in pull_request_files:
+            patch_details = file.get("patch")
+            filename = file.get("filename", "").replace(" ", "")
+
+            if not parser.should_ignore_file(filename) and patch_details is not None:
+                self.files_processed += 1
+                yield f"\n---->\nFile Name: {filename}\nPatch Details:\n{parser.patch_to_combined_chunks(patch_details, self.ignore_deletions)}"
+
     def _process_files_generator(
         self,
         pull_request_files: List[Dict],
@@ -243,51 +582,34 @@ class CodeReviewer:
         reeval_response: bool,
         custom_context: str,
     ) -> Generator[Optional[Tuple[List[Dict], Optional[float]]], None, None]:
-        combined_diff_data = ""
-        available_tokens = self.provider.available_tokens(CODE_REVIEW_PROMPT)
-        diff_parts = []
-        for file in pull_request_files:
-            patch_details = file.get("patch")
-            filename = file.get("filename", "").replace(" ", "")
-
-            if not parser.should_ignore_file(filename) and patch_details is not None:
-                self.files_processed += 1
-                diff_parts.append(
-                    f"\n---->\nFile Name: {filename}\nPatch Details:\n{parser.patch_to_combined_chunks(patch_details, self.ignore_deletions)}"
-                )
-
-                if (
-                    available_tokens
-                    - self.provider.get_token_count("".join(diff_parts))
-                    > 0
-                ):
-                    combined_diff_data = "".join(diff_parts)
-                    continue
-
-                yield self._process_file_chunk(
-                    combined_diff_data,
-                    pull_request_title,
-                    pull_request_desc,
-                    user,
-                    reeval_response,
-                    custom_context,
-                )
-                diff_parts = [
-                    f"\n---->\nFile Name: {filename}\nPatch Details: {parser.patch_to_combined_chunks(patch_details,  self.ignore_deletions)}"
-                ]
-
-        if diff_parts:
+        has_chunks = False
+        for diff_data in self._chunk_files_generator(pull_request_files):
+            has_chunks = True
             yield self._process_file_chunk(
-                "".join(diff_parts),
+                diff_data,
                 pull_request_title,
                 pull_request_desc,
                 user,
                 reeval_response,
                 custom_context,
             )
-        else:
+
+        if not has_chunks:
             yield None  # Yield None if there's no data to process
 
+    def _build_review_layout(self, diff_data: str, custom_context: str) -> PromptLayout:
+        # Everything but the diff is the same for every chunk of a review, so
+        # it goes first where providers can cache it as a prompt prefix.
+        return PromptLayout(
+            system=self.system_prompt,
+            prefix=[
+                CODE_REVIEW_INSTRUCTIONS,
+                CODE_REVIEW_RULES_PROMPT.format(CUSTOM_RULES=self.custom_rules),
+                custom_context,
+            ],
+            suffix=CODE_REVIEW_DIFF_PROMPT.format(CODE_DIFF=diff_data),
+        )
+
     def _process_file_chunk(
         self,
         diff_data: str,
@@ -299,33 +621,50 @@ class CodeReviewer:
     ) -> Optional[Tuple[List[Dict], Optional[float]]]:
         if not diff_data:
             return None
-        prompt = (
-            CODE_REVIEW_PROMPT.format(
-                CODE_DIFF=diff_data,
-                CUSTOM_RULES="Always mark issues that violate the following rules with a severity of 8 or higher (high and above):"
-                + self.custom_rules,
-            )
-            + custom_context
-        )
-        custom_model = {"model": self.default_model}
-        resp, usage = self.provider.chat_completion_with_json(
-            prompt, user=user, custom_model=custom_model
+        self._raise_if_cancelled()
+        layout = self._build_review_layout(diff_data, custom_context)
+        resp, usage = self._review_completion(layout, user, stream=not reeval_response)
+        self.total_usage = self.provider.update_usage(self.total_usage, usage)
+
+        if reeval_response:
+            resp = self._reevaluate_response(layout.text, resp, custom_context, user)
+
+        return resp.get("review", []), resp.get("code_quality_percentage", None)
+
+    async def _aprocess_file_chunk(
+        self,
+        diff_data: str,
+        pull_request_title: str,
+        pull_request_desc: str,
+        user: Optional[str],
+        reeval_response: bool,
+        custom_context: str,
+    ) -> Optional[Tuple[List[Dict], Optional[float]]]:
+        if not diff_data:
+            return None
+        self._raise_if_cancelled()
+        layout = self._build_review_layout(diff_data, custom_context)
+        resp, usage = await self._areview_completion(
+            layout, user, stream=not reeval_response
         )
         self.total_usage = self.provider.update_usage(self.total_usage, usage)
 
         if reeval_response:
-            resp = self._reevaluate_response(prompt, resp, custom_context, user)
+            resp = await self._areevaluate_response(
+                layout.text, resp, custom_context, user
+            )
 
         return resp.get("review", []), resp.get("code_quality_percentage", None)
 
     def _reevaluate_response(
         self, prompt: str, resp: str, custom_context: str, user: Optional[str]
     ) -> str:
+        self._raise_if_cancelled()
         new_prompt = PR_REVIEW_EVALUATION_PROMPT.format(
             ACTUAL_PROMPT=prompt, LLM_OUTPUT=json.dumps(resp)
         )
         messages = [
-            {"role": "system", "content": self.provider.system_prompt},
+            {"role": "system", "content": self.system_prompt},
             {"role": "user", "content": new_prompt},
         ]
         custom_model = {"model": self.default_model}
@@ -335,6 +674,24 @@ class CodeReviewer:
         self.total_usage = self.provider.update_usage(self.total_usage, usage)
         return resp
 
+    async def _areevaluate_response(
+        self, prompt: str, resp: str, custom_context: str, user: Optional[str]
+    ) -> str:
+        self._raise_if_cancelled()
+        new_prompt = PR_REVIEW_EVALUATION_PROMPT.format(
+            ACTUAL_PROMPT=prompt, LLM_OUTPUT=json.dumps(resp)
+        )
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": new_prompt},
+        ]
+        custom_model = {"model": self.default_model}
+        resp, usage = await self.provider.achat_completion_with_json(
+            new_prompt, user=user, messages=messages, custom_model=custom_model
+        )
+        self.total_usage = self.provider.update_usage(self.total_usage, usage)
+        return resp
+
     @staticmethod
     def _merge_categories(reviews: List[Dict]) -> Dict[str, List[Dict]]:
         categories = {}
@@ -350,10 +707,13 @@ class CodeReviewer:
                 file_name = patch_data.get("filename", "").replace(" ", "")
                 for pattern in patterns:
                     if fnmatch.fnmatch(file_name, pattern):
-                        patch = patch_data.get("patch", "")
                         line = 1
-                        if patch:
-                            line = patch.split(" ")[2].split(",")[0][1:]
+                        for file_diff in parser.iter_file_diffs(
+                            patch_data.get("patch", "")
+                        ):
+                            if file_diff.hunks:
+                                line = file_diff.hunks[0].new_start
+                                break
                         reviews.append(
                             {
                                 "category": category,
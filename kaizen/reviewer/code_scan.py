@@ -30,7 +30,7 @@ class CodeScanner:
         self.logger = logging.getLogger(__name__)
         self.provider = llm_provider
         # self.provider.model = self.provider.model_group_to_name["best"][0]
-        self.provider.system_prompt = CODE_SCAN_SYSTEM_PROMPT
+        self.system_prompt = CODE_SCAN_SYSTEM_PROMPT
         self.reevaluate = False
         self.total_usage = {
             "prompt_tokens": 0,
@@ -41,7 +41,9 @@ class CodeScanner:
 
     def is_code_review_prompt_within_limit(self, file_data: str) -> bool:
         prompt = CODE_SCAN_PROMPT.format(FILE_DATA=file_data)
-        result = self.provider.is_inside_token_limit(PROMPT=prompt)
+        result = self.provider.is_inside_token_limit(
+            PROMPT=prompt, system_prompt=self.system_prompt
+        )
         self.logger.debug(f"Prompt within token limit: {result}")
         return result
 
@@ -91,7 +93,7 @@ class CodeScanner:
         self.logger.info(f"Completed code review for directory: {dir_path}")
         return CodeScanOutput(
             usage=self.total_usage,
-            model_name=self.provider.model,
+            model_name=self.provider.get_usage_model(self.total_usage),
             issues=issues,
             total_files=files_processed,
             files_processed=files_processed,
@@ -104,7 +106,9 @@ class CodeScanner:
             self.logger.error("file_data is empty!")
             raise Exception("file_data is empty!")
 
-        if not self.provider.is_inside_token_limit(PROMPT=prompt):
+        if not self.provider.is_inside_token_limit(
+            PROMPT=prompt, system_prompt=self.system_prompt
+        ):
             self.logger.error("file_data bigger than model token limit")
             raise Exception("file_data bigger than model token limit")
 
@@ -116,7 +120,7 @@ class CodeScanner:
 
         return CodeScanOutput(
             usage=self.total_usage,
-            model_name=self.provider.model,
+            model_name=self.provider.get_usage_model(self.total_usage),
             issues=issues,
             total_files=1,
             files_processed=1,
@@ -125,7 +129,7 @@ class CodeScanner:
     def _process_file_data(self, prompt: str, user: Optional[str]) -> List[Dict]:
         self.logger.debug("Processing file data with LLM")
         resp, usage = self.provider.chat_completion_with_json(
-            prompt, user=user, model="default"
+            prompt, user=user, model="default", system_prompt=self.system_prompt
         )
         self.total_usage = self.provider.update_usage(self.total_usage, usage)
         self.logger.info(f"LLM usage for this file: {usage}")
@@ -139,14 +143,19 @@ class CodeScanner:
             FILE_DATA=file_data, ISSUES=json.dumps({"issues": issues}, indent=2)
         )
 
-        if not self.provider.is_inside_token_limit(PROMPT=reevaluation_prompt):
+        if not self.provider.is_inside_token_limit(
+            PROMPT=reevaluation_prompt, system_prompt=self.system_prompt
+        ):
             self.logger.warning(
                 "Reevaluation prompt exceeds token limit. Skipping reevaluation."
             )
             return issues
 
         resp, usage = self.provider.chat_completion_with_json(
-            reevaluation_prompt, user=user, model="default"
+            reevaluation_prompt,
+            user=user,
+            model="default",
+            system_prompt=self.system_prompt,
         )
         self.total_usage = self.provider.update_usage(self.total_usage, usage)
         self.logger.info(f"LLM usage for reevaluation: {usage}")
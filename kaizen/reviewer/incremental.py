@@ -0,0 +1,144 @@
+import hashlib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from kaizen.helpers import parser
+from kaizen.llms.cache import ResponseCache, RedisCache, SQLiteCache
+
+DEFAULT_STORE_PATH = ".kaizen/cache/hunk_reviews.db"
+DEFAULT_STORE_TTL = 30 * 24 * 60 * 60
+DEFAULT_STORE_MAX_ENTRIES = 10000
+
+
+@dataclass
+class FileHunk:
+    filename: str
+    fingerprint: str
+    new_start: int
+    new_end: int
+    text: str
+
+
+def fingerprint_hunk(filename: str, hunk: parser.Hunk) -> str:
+    # Line numbers are left out on purpose: a hunk that only moved because
+    # an earlier hunk grew or shrank is still the same change.
+    normalized = "\n".join(line.text.rstrip() for line in hunk.lines)
+    return hashlib.sha256(f"{filename}\n{normalized}".encode("utf-8")).hexdigest()
+
+
+def split_hunks(filename: str, patch: str) -> List[FileHunk]:
+    return [
+        FileHunk(
+            filename=filename,
+            fingerprint=fingerprint_hunk(filename, hunk),
+            new_start=hunk.new_start,
+            new_end=hunk.new_start + max(hunk.new_count - 1, 0),
+            text=hunk.text,
+        )
+        for file_diff in parser.iter_file_diffs(patch)
+        for hunk in file_diff.hunks
+    ]
+
+
+def collect_hunks(pull_request_files: List[Dict]) -> List[FileHunk]:
+    hunks = []
+    for file in pull_request_files:
+        patch = file.get("patch")
+        filename = file.get("filename", "").replace(" ", "")
+        if patch is None or parser.should_ignore_file(filename):
+            continue
+        hunks.extend(split_hunks(filename, patch))
+    return hunks
+
+
+def hunks_to_files(hunks: List[FileHunk]) -> List[Dict]:
+    patches = {}
+    for hunk in hunks:
+        patches.setdefault(hunk.filename, []).append(hunk.text)
+    return [
+        {"filename": filename, "patch": "\n".join(texts)}
+        for filename, texts in patches.items()
+    ]
+
+
+def _shift_line(value: Any, delta: int) -> Any:
+    try:
+        return int(value) + delta
+    except (TypeError, ValueError):
+        return value
+
+
+def _find_hunk(issue: Dict, hunks: List[FileHunk]) -> Optional[FileHunk]:
+    file_hunks = [h for h in hunks if h.filename == issue.get("file_path")]
+    if not file_hunks:
+        return None
+    line = _shift_line(issue.get("start_line"), 0)
+    if not isinstance(line, int):
+        return file_hunks[0]
+    for hunk in file_hunks:
+        if hunk.new_start <= line <= hunk.new_end:
+            return hunk
+    return min(
+        file_hunks,
+        key=lambda h: min(abs(line - h.new_start), abs(line - h.new_end)),
+    )
+
+
+def assign_issues(issues: List[Dict], hunks: List[FileHunk]) -> Dict[str, List[Dict]]:
+    """
+    Map reviewed issues to the hunks they were raised on.
+
+    Issues are stored with line numbers relative to the start of their hunk
+    so they can be re-attached after the hunk moves within the file.
+    """
+    assigned = {hunk.fingerprint: [] for hunk in hunks}
+    for issue in issues:
+        hunk = _find_hunk(issue, hunks)
+        if hunk is None:
+            continue
+        relative = dict(issue)
+        relative["start_line"] = _shift_line(issue.get("start_line"), -hunk.new_start)
+        relative["end_line"] = _shift_line(issue.get("end_line"), -hunk.new_start)
+        assigned[hunk.fingerprint].append(relative)
+    return assigned
+
+
+def reattach_issues(issues: List[Dict], hunk: FileHunk) -> List[Dict]:
+    reattached = []
+    for issue in issues:
+        absolute = dict(issue)
+        absolute["start_line"] = _shift_line(issue.get("start_line"), hunk.new_start)
+        absolute["end_line"] = _shift_line(issue.get("end_line"), hunk.new_start)
+        absolute["file_path"] = hunk.filename
+        absolute["cached"] = True
+        reattached.append(absolute)
+    return reattached
+
+
+class HunkReviewStore:
+    KEY_PREFIX = "hunk_reviews:"
+
+    def __init__(self, cache: ResponseCache):
+        self.cache = cache
+
+    def load(self, review_key: str) -> Dict[str, Any]:
+        stored = self.cache.get(self.KEY_PREFIX + review_key)
+        return stored or {"hunks": {}, "code_quality": None}
+
+    def save(
+        self,
+        review_key: str,
+        hunks: Dict[str, List[Dict]],
+        code_quality: Optional[float],
+    ) -> None:
+        self.cache.set(
+            self.KEY_PREFIX + review_key,
+            {"hunks": hunks, "code_quality": code_quality},
+        )
+
+
+def create_hunk_review_store(config: Dict[str, Any]) -> HunkReviewStore:
+    kwargs = {"ttl": DEFAULT_STORE_TTL, "max_entries": DEFAULT_STORE_MAX_ENTRIES}
+    if config.get("language_model", {}).get("redis_enabled", False):
+        return HunkReviewStore(RedisCache(key_prefix="kaizen:", **kwargs))
+    return HunkReviewStore(SQLiteCache(path=DEFAULT_STORE_PATH, **kwargs))
@@ -1,6 +1,6 @@
 from typing import Optional, List, Dict
 from kaizen.llms.provider import LLMProvider
-from kaizen.helpers import parser
+from kaizen.helpers import chunker, parser
 from kaizen.llms.prompts.work_summary_prompts import (
     WORK_SUMMARY_PROMPT,
     WORK_SUMMARY_SYSTEM_PROMPT,
@@ -31,31 +31,18 @@ class WorkSummaryGenerator:
     ):
         available_tokens = self.provider.available_tokens(WORK_SUMMARY_PROMPT)
         summaries = []
-        # Try to merge the files untill LLM can process the response
-        combined_diff_data = ""
-        for file_dict in diff_file_data:
-            temp_prompt = combined_diff_data
-            temp_prompt += f"""\n---->\nFile Name: {file_dict["file"]}\nPatch: {file_dict["patch"]}\n Status: {file_dict["status"]}"""
-
-            # If available tokens is greated than the new prompt size, process it.
-            if available_tokens - self.provider.get_token_count(temp_prompt) > 0:
-                combined_diff_data = temp_prompt
-                continue
-
-            # Process the prompt
+        # Merge the files into as few prompts as the LLM can process
+        diff_parts = (
+            f"""\n---->\nFile Name: {file_dict["file"]}\nPatch: {file_dict["patch"]}\n Status: {file_dict["status"]}"""
+            for file_dict in diff_file_data
+        )
+        for combined_diff_data in chunker.chunk_by_token_budget(
+            diff_parts, available_tokens, self.provider.get_token_count
+        ):
             prompt = WORK_SUMMARY_PROMPT.format(PATCH_DATA=combined_diff_data)
             response, usage = self.provider.chat_completion_with_json(prompt, user=user)
             self.total_usage = self.provider.update_usage(self.total_usage, usage)
             summaries.append(response)
-            combined_diff_data = ""
-
-        if combined_diff_data != "":
-            # process the remaining file diff pending
-            prompt = WORK_SUMMARY_PROMPT.format(PATCH_DATA=combined_diff_data)
-            response, usage = self.provider.chat_completion_with_json(prompt, user=user)
-            summaries.append(response)
-            combined_diff_data = ""
-            self.total_usage = self.provider.update_usage(self.total_usage, usage)
 
         if len(summaries) > 1:
             # TODO Merge summaries
@@ -0,0 +1,4 @@
+import os
+
+# github_app modules read the API base URL at import time.
+os.environ.setdefault("GITHUB_API_BASE_URL", "https://api.github.com")
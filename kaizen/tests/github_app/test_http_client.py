@@ -0,0 +1,61 @@
+from unittest.mock import Mock
+import pytest
+import requests
+from github_app.github_helper import http_client
+from kaizen.llms.cache import InMemoryCache
+
+URL = "https://api.github.com/repos/org/repo/pulls/7/files"
+LINK = f'<{URL}?page=2>; rel="next"'
+
+
+def make_response(status_code, body=b"", headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = body
+    response.headers.update(headers or {})
+    return response
+
+
+@pytest.fixture
+def session(monkeypatch):
+    session = Mock()
+    monkeypatch.setattr(http_client, "_http_cache", InMemoryCache())
+    monkeypatch.setattr(http_client, "get_session", lambda: session)
+    return session
+
+
+def test_304_serves_the_stored_body_and_link_header(session):
+    headers = {"Authorization": "Bearer token"}
+    session.get.return_value = make_response(
+        200, b'[{"filename": "a.py"}]', {"ETag": '"v1"', "Link": LINK}
+    )
+    first = http_client.cached_get(URL, headers=headers)
+    assert first.json() == [{"filename": "a.py"}]
+    assert "If-None-Match" not in session.get.call_args.kwargs["headers"]
+
+    session.get.return_value = make_response(304)
+    second = http_client.cached_get(URL, headers=headers)
+
+    assert session.get.call_args.kwargs["headers"]["If-None-Match"] == '"v1"'
+    assert second.status_code == 200
+    assert second.json() == [{"filename": "a.py"}]
+    assert second.links["next"]["url"] == f"{URL}?page=2"
+
+
+def test_other_credentials_do_not_share_cached_bodies(session):
+    session.get.return_value = make_response(200, b"[]", {"ETag": '"v1"'})
+    http_client.cached_get(URL, headers={"Authorization": "Bearer one"})
+
+    http_client.cached_get(URL, headers={"Authorization": "Bearer two"})
+
+    assert "If-None-Match" not in session.get.call_args.kwargs["headers"]
+
+
+def test_large_bodies_are_not_stored(session, monkeypatch):
+    monkeypatch.setattr(http_client, "DEFAULT_HTTP_CACHE_MAX_BODY", 4)
+    session.get.return_value = make_response(200, b"12345", {"ETag": '"v1"'})
+    http_client.cached_get(URL)
+
+    http_client.cached_get(URL)
+
+    assert "If-None-Match" not in session.get.call_args.kwargs["headers"]
@@ -0,0 +1,75 @@
+import threading
+from datetime import datetime, timezone
+from unittest.mock import Mock
+import pytest
+from github_app.github_helper import installation, utils
+
+EXPIRES_AT = datetime(2030, 1, 1, 12, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def github(monkeypatch):
+    monkeypatch.setattr(installation, "_token_cache", {})
+    monkeypatch.setattr(installation, "_token_locks", {})
+    monkeypatch.setattr(utils, "generate_jwt", lambda: "jwt")
+    session = Mock()
+    tokens = iter(f"token-{n}" for n in range(10))
+
+    def post(url, headers):
+        response = Mock()
+        response.json.return_value = {
+            "token": next(tokens),
+            "expires_at": EXPIRES_AT.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }
+        return response
+
+    session.post.side_effect = post
+    monkeypatch.setattr(installation.http_client, "get_session", lambda: session)
+    clock = Mock(return_value=EXPIRES_AT.timestamp() - 3600)
+    monkeypatch.setattr(installation.time, "time", clock)
+    return session, clock
+
+
+def test_token_is_reused_until_the_expiry_margin(github):
+    session, clock = github
+    first = installation.get_installation_access_token(1, {"issues": "write"})
+    clock.return_value = EXPIRES_AT.timestamp() - utils.CREDENTIAL_EXPIRY_MARGIN - 1
+    assert installation.get_installation_access_token(1) == first
+    assert session.post.call_count == 1
+    # The app's full grant is requested, not a narrowed permission set.
+    assert "json" not in session.post.call_args.kwargs
+
+
+def test_token_is_refreshed_inside_the_expiry_margin(github):
+    session, clock = github
+    first = installation.get_installation_access_token(1)
+    clock.return_value = EXPIRES_AT.timestamp() - utils.CREDENTIAL_EXPIRY_MARGIN
+    assert installation.get_installation_access_token(1) != first
+    assert session.post.call_count == 2
+
+
+def test_tokens_are_cached_per_installation(github):
+    session, _ = github
+    assert installation.get_installation_access_token(
+        1
+    ) != installation.get_installation_access_token(2)
+    assert set(installation._token_locks) == {1, 2}
+
+
+def test_concurrent_callers_mint_one_token(github):
+    session, _ = github
+    tokens = []
+    threads = [
+        threading.Thread(
+            target=lambda: tokens.append(installation.get_installation_access_token(1))
+        )
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(tokens)) == 1
+    assert session.post.call_count == 1
+    assert len(installation._token_locks) == 1
@@ -0,0 +1,186 @@
+import threading
+import time
+import pytest
+from github_app.github_helper.job_queue import (
+    JobNotRetryable,
+    SQLiteJobQueue,
+    WorkerPool,
+)
+
+
+def job_status(queue):
+    return [row[0] for row in queue._conn.execute("SELECT status FROM jobs")]
+
+
+def make_available(queue):
+    with queue._conn:
+        queue._conn.execute("UPDATE jobs SET available_at = 0")
+
+
+def test_duplicate_is_skipped_while_pending_or_running():
+    queue = SQLiteJobQueue(":memory:")
+    assert queue.enqueue("review", {}, "org/repo", "key")
+    assert not queue.enqueue("review", {}, "org/repo", "key")
+
+    job = queue.claim()
+    assert job.dedup_key == "key"
+    assert not queue.enqueue("review", {}, "org/repo", "key")
+
+    queue.complete(job)
+    assert queue.enqueue("review", {}, "org/repo", "key")
+
+
+def test_failed_job_does_not_block_a_new_delivery():
+    queue = SQLiteJobQueue(":memory:")
+    queue.enqueue("review", {}, "org/repo", "key")
+    queue.fail(queue.claim())
+
+    assert queue.enqueue("review", {}, "org/repo", "key")
+    assert sorted(job_status(queue)) == ["failed", "pending"]
+
+
+def test_delayed_job_is_not_claimed_early():
+    queue = SQLiteJobQueue(":memory:")
+    queue.enqueue("review", {}, "org/repo", "key", delay=60)
+    assert queue.claim() is None
+
+
+def test_job_is_claimed_again_after_its_lease_expires():
+    queue = SQLiteJobQueue(":memory:", lease_timeout=60)
+    queue.enqueue("review", {"n": 1}, "org/repo", "key")
+    job = queue.claim()
+    assert queue.claim() is None
+
+    make_available(queue)
+    reclaimed = queue.claim()
+    assert reclaimed.id == job.id
+    assert reclaimed.payload == {"n": 1}
+
+
+def test_claim_skips_busy_repos():
+    queue = SQLiteJobQueue(":memory:")
+    queue.enqueue("review", {}, "org/busy", "busy")
+    queue.enqueue("review", {}, "org/idle", "idle")
+    assert queue.claim(exclude_repos=["org/busy"]).repo == "org/idle"
+
+
+def test_concurrent_claims_never_hand_out_a_job_twice(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    queues = [SQLiteJobQueue(path) for _ in range(4)]
+    for index in range(100):
+        queues[0].enqueue("review", {}, f"org/repo{index}", f"key{index}")
+    claimed = []
+
+    def drain(queue):
+        while True:
+            job = queue.claim()
+            if job is None:
+                return
+            claimed.append(job.id)
+
+    threads = [threading.Thread(target=drain, args=(queue,)) for queue in queues]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(claimed) == len(set(claimed)) == 100
+
+
+def test_failing_job_backs_off_until_max_attempts():
+    queue = SQLiteJobQueue(":memory:")
+    handler_calls = []
+
+    def handler(payload):
+        handler_calls.append(payload)
+        raise RuntimeError("GitHub is down")
+
+    pool = WorkerPool(queue, {"review": handler}, max_attempts=2, retry_backoff=10)
+    queue.enqueue("review", {}, "org/repo", "key")
+
+    before = time.time()
+    pool.run_job(queue.claim())
+    status, attempts, available_at = queue._conn.execute(
+        "SELECT status, attempts, available_at FROM jobs"
+    ).fetchone()
+    assert (status, attempts) == ("pending", 1)
+    assert available_at >= before + 10
+    assert queue.claim() is None
+
+    make_available(queue)
+    pool.run_job(queue.claim())
+    assert job_status(queue) == ["failed"]
+    assert len(handler_calls) == 2
+
+
+def test_job_not_retryable_fails_immediately():
+    queue = SQLiteJobQueue(":memory:")
+
+    def handler(payload):
+        raise JobNotRetryable("review was partly posted")
+
+    pool = WorkerPool(queue, {"review": handler}, max_attempts=3)
+    queue.enqueue("review", {}, "org/repo", "key")
+    pool.run_job(queue.claim())
+
+    assert job_status(queue) == ["failed"]
+
+
+def test_jobs_of_one_repo_never_run_concurrently():
+    queue = SQLiteJobQueue(":memory:")
+    running = {"org/a": 0, "org/b": 0}
+    peak = {"org/a": 0, "org/b": 0}
+    lock = threading.Lock()
+    done = threading.Semaphore(0)
+
+    def handler(payload):
+        repo = payload["repo"]
+        with lock:
+            running[repo] += 1
+            peak[repo] = max(peak[repo], running[repo])
+        time.sleep(0.02)
+        with lock:
+            running[repo] -= 1
+        done.release()
+
+    pool = WorkerPool(
+        queue,
+        {"review": handler},
+        workers=4,
+        per_repo_concurrency=1,
+        poll_interval=0.01,
+    )
+    for index in range(6):
+        repo = "org/a" if index % 2 else "org/b"
+        pool.submit("review", {"repo": repo}, repo, f"key{index}")
+    pool.start()
+    try:
+        for _ in range(6):
+            assert done.acquire(timeout=5)
+    finally:
+        pool.stop(timeout=5)
+
+    assert peak == {"org/a": 1, "org/b": 1}
+
+
+def test_redis_claim_is_owned_by_one_worker(monkeypatch):
+    fakeredis = pytest.importorskip("fakeredis")
+    import redis
+
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        redis, "Redis", lambda **kwargs: fakeredis.FakeRedis(server=server)
+    )
+    from github_app.github_helper.job_queue import RedisJobQueue
+
+    first = RedisJobQueue(host="localhost", port="6379")
+    second = RedisJobQueue(host="localhost", port="6379")
+    assert first.enqueue("review", {}, "org/repo", "key")
+    assert not second.enqueue("review", {}, "org/repo", "key")
+
+    job = first.claim()
+    assert job is not None
+    assert second.claim() is None
+
+    first.complete(job)
+    assert second.enqueue("review", {}, "org/repo", "key")
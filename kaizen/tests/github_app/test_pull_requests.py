@@ -0,0 +1,171 @@
+import threading
+import time
+from unittest.mock import Mock, patch
+import pytest
+import requests
+from github_app.github_helper import pull_requests
+from github_app.github_helper.job_queue import JobNotRetryable
+from kaizen.reviewer.code_review import ReviewOutput
+
+PAYLOAD = {
+    "action": "opened",
+    "installation": {"id": 1},
+    "repository": {"full_name": "org/repo"},
+    "pull_request": {
+        "number": 7,
+        "title": "title",
+        "body": "desc",
+        "url": "https://api.github.com/repos/org/repo/pulls/7",
+        "comments_url": "https://api.github.com/repos/org/repo/issues/7/comments",
+        "head": {"sha": "abc"},
+    },
+}
+
+ISSUE = {
+    "category": "bug",
+    "description": "Off by one",
+    "impact": "critical",
+    "file_path": "app.py",
+    "start_line": 1,
+    "end_line": 1,
+}
+
+
+def make_response(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = b"{}"
+    return response
+
+
+def review_output():
+    return ReviewOutput(
+        topics={"bug": [dict(ISSUE)]},
+        issues=[dict(ISSUE)],
+        code_quality=80,
+        usage={},
+        model_name="model",
+        cost={},
+        file_count=1,
+    )
+
+
+@pytest.fixture
+def github(monkeypatch):
+    session = Mock()
+    store = Mock()
+    reviewer = Mock()
+    reviewer.review_pull_request.return_value = review_output()
+    monkeypatch.setattr(
+        pull_requests, "get_installation_access_token", lambda *args: "token"
+    )
+    monkeypatch.setattr(
+        pull_requests,
+        "get_pull_request_diff",
+        lambda *args: (
+            "diff",
+            [{"filename": "app.py", "patch": "@@ -1 +1 @@\n-a\n+b"}],
+        ),
+    )
+    monkeypatch.setattr(pull_requests, "CodeReviewer", lambda **kwargs: reviewer)
+    monkeypatch.setattr(pull_requests, "get_llm_provider", lambda **kwargs: None)
+    # The summary formatting is not under test here.
+    monkeypatch.setattr(pull_requests, "clean_keys", lambda topics, level: topics)
+    monkeypatch.setattr(pull_requests, "create_pr_review_text", lambda topics: "")
+    monkeypatch.setattr(pull_requests, "get_review_store", lambda: store)
+    monkeypatch.setattr(pull_requests.http_client, "get_session", lambda: session)
+    return session, store
+
+
+@pytest.mark.parametrize(
+    "summary_status, review_status", [(500, 200), (201, 500), (201, 403)]
+)
+def test_failed_post_does_not_save_reviewed_hunks(
+    github, summary_status, review_status
+):
+    session, store = github
+    session.post.side_effect = lambda url, **kwargs: make_response(
+        summary_status if url.endswith("/comments") else review_status
+    )
+
+    with pytest.raises(JobNotRetryable):
+        pull_requests.process_pull_request(PAYLOAD)
+
+    store.save.assert_not_called()
+
+
+def test_successful_post_saves_reviewed_hunks(github):
+    session, store = github
+    session.post.return_value = make_response(200)
+
+    pull_requests.process_pull_request(PAYLOAD)
+
+    assert session.post.call_count == 2
+    store.save.assert_called_once()
+
+
+def test_rejected_batch_is_posted_one_comment_at_a_time():
+    session = Mock()
+    # The batch and the second comment cannot be anchored to the diff.
+    session.post.side_effect = [
+        make_response(422),
+        make_response(200),
+        make_response(422),
+    ]
+    with patch.object(
+        pull_requests.http_client, "get_session", lambda: session
+    ), patch.object(
+        pull_requests, "get_installation_access_token", lambda *args: "token"
+    ):
+        pull_requests.post_pull_request_reviews("url", [ISSUE, ISSUE], 1)
+    assert session.post.call_count == 3
+
+    session.post.side_effect = [
+        make_response(422),
+        make_response(502),
+        make_response(200),
+    ]
+    with patch.object(
+        pull_requests.http_client, "get_session", lambda: session
+    ), patch.object(
+        pull_requests, "get_installation_access_token", lambda *args: "token"
+    ), pytest.raises(
+        requests.HTTPError
+    ):
+        pull_requests.post_pull_request_reviews("url", [ISSUE, ISSUE], 1)
+
+
+def test_pull_request_diff_falls_back_to_the_files_endpoint(monkeypatch):
+    files = [{"filename": "app.py", "patch": "@@ -1 +1 @@\n-a\n+b"}]
+    get_pr_files = Mock(return_value=files)
+    monkeypatch.setattr(pull_requests, "get_pr_diff", lambda *args: (None, None))
+    monkeypatch.setattr(pull_requests, "get_pr_files", get_pr_files)
+
+    diff_text, pr_files = pull_requests.get_pull_request_diff(PAYLOAD, "token")
+
+    assert (diff_text, pr_files) == (None, files)
+    get_pr_files.assert_called_once_with(
+        pull_requests.GITHUB_API_BASE_URL + "/repos/org/repo/pulls/7/files", "token"
+    )
+
+
+def test_concurrent_jobs_share_one_provider(monkeypatch):
+    def slow_provider(**kwargs):
+        time.sleep(0.01)
+        return object()
+
+    monkeypatch.setattr(pull_requests, "_providers", {})
+    monkeypatch.setattr(pull_requests, "LLMProvider", slow_provider)
+    providers = []
+    threads = [
+        threading.Thread(
+            target=lambda: providers.append(pull_requests.get_llm_provider())
+        )
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({id(provider) for provider in providers}) == 1
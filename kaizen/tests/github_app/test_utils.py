@@ -0,0 +1,107 @@
+import json
+from unittest.mock import Mock
+import pytest
+import requests
+from github_app.github_helper import utils
+
+FILES_URL = "https://api.github.com/repos/org/repo/pulls/7/files"
+PR_URL = "https://api.github.com/repos/org/repo/pulls/7"
+
+DIFF = """diff --git a/app.py b/app.py
+index 1111111..2222222 100644
+--- a/app.py
++++ b/app.py
+@@ -1,2 +1,2 @@
+ a = 1
+-b = 2
++b = 3
+diff --git a/new.py b/new.py
+new file mode 100644
+index 0000000..3333333
+--- /dev/null
++++ b/new.py
+@@ -0,0 +1 @@
++x = 1
+diff --git a/logo.png b/logo.png
+index 4444444..5555555 100644
+Binary files a/logo.png and b/logo.png differ
+"""
+
+
+def make_response(status_code, files=None, next_url=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps(files or []).encode()
+    if next_url:
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    return response
+
+
+def test_get_pr_files_follows_link_header(monkeypatch):
+    page_two = FILES_URL + "?per_page=100&page=2"
+    cached_get = Mock(
+        side_effect=[
+            make_response(200, [{"filename": "a.py"}], next_url=page_two),
+            make_response(200, [{"filename": "b.py"}]),
+        ]
+    )
+    monkeypatch.setattr(utils.http_client, "cached_get", cached_get)
+
+    files = utils.get_pr_files(FILES_URL, "token")
+
+    assert [file["filename"] for file in files] == ["a.py", "b.py"]
+    first, second = cached_get.call_args_list
+    assert first.kwargs["params"] == {"per_page": utils.PR_FILES_PAGE_SIZE}
+    assert first.kwargs["headers"]["Authorization"] == "Bearer token"
+    # The next link already carries the query parameters.
+    assert second.args[0] == page_two
+    assert second.kwargs["params"] is None
+
+
+def test_get_pr_files_returns_none_when_a_later_page_fails(monkeypatch):
+    cached_get = Mock(
+        side_effect=[
+            make_response(200, [{"filename": "a.py"}], next_url=FILES_URL + "?page=2"),
+            make_response(502),
+        ]
+    )
+    monkeypatch.setattr(utils.http_client, "cached_get", cached_get)
+
+    assert utils.get_pr_files(FILES_URL, "token") is None
+
+
+def test_split_diff_into_files_matches_the_files_endpoint():
+    assert utils.split_diff_into_files(DIFF) == [
+        {
+            "filename": "app.py",
+            "patch": "@@ -1,2 +1,2 @@\n a = 1\n-b = 2\n+b = 3",
+            "status": "modified",
+        },
+        {"filename": "new.py", "patch": "@@ -0,0 +1 @@\n+x = 1", "status": "added"},
+        {"filename": "logo.png", "patch": None, "status": "modified"},
+    ]
+
+
+@pytest.fixture
+def diff_cache(monkeypatch):
+    monkeypatch.setattr(utils, "_pr_diff_cache", {})
+    monkeypatch.setattr(utils, "_pr_diff_locks", {})
+
+
+def test_get_pr_diff_downloads_once_per_head(diff_cache, monkeypatch):
+    get_diff_text = Mock(return_value=DIFF)
+    monkeypatch.setattr(utils, "get_diff_text", get_diff_text)
+
+    first = utils.get_pr_diff(PR_URL, "abc", "token")
+    second = utils.get_pr_diff(PR_URL, "abc", "token")
+
+    assert first is second
+    assert first[0] == DIFF
+    assert get_diff_text.call_count == 1
+
+
+def test_failed_diff_download_does_not_keep_its_lock(diff_cache, monkeypatch):
+    monkeypatch.setattr(utils, "get_diff_text", Mock(return_value=None))
+
+    assert utils.get_pr_diff(PR_URL, "abc", "token") == (None, None)
+    assert utils._pr_diff_locks == {}
@@ -0,0 +1,76 @@
+import importlib
+import json
+import sys
+from unittest.mock import Mock
+import pytest
+from github_app.github_helper import deliveries
+from github_app.github_helper.deliveries import DeliveryTracker
+from github_app.github_helper.pr_heads import PullRequestHeads, pull_request_key
+from kaizen.utils.config import reload_config
+
+
+def make_payload(action="synchronize", sha="abc"):
+    return {
+        "action": action,
+        "repository": {"full_name": "org/repo"},
+        "pull_request": {"number": 7, "head": {"sha": sha}},
+    }
+
+
+def test_delivery_tracker_drops_redeliveries_until_they_expire(monkeypatch):
+    clock = Mock(return_value=1000.0)
+    monkeypatch.setattr(deliveries.time, "time", clock)
+    tracker = DeliveryTracker(ttl=60)
+
+    assert not tracker.is_duplicate("delivery-1")
+    assert tracker.is_duplicate("delivery-1")
+    assert not tracker.is_duplicate("delivery-2")
+
+    clock.return_value = 1061.0
+    assert not tracker.is_duplicate("delivery-1")
+
+
+def test_older_push_is_superseded_by_a_newer_head():
+    heads = PullRequestHeads()
+    old, new = make_payload(sha="old"), make_payload(sha="new")
+    assert not heads.is_superseded(old)
+
+    heads.set_head(pull_request_key(new), "new")
+    assert heads.is_superseded(old)
+    assert not heads.is_superseded(new)
+
+
+@pytest.fixture
+def main(tmp_path, monkeypatch):
+    config = {
+        "language_model": {"redis_enabled": False},
+        "github_app": {"job_queue": {"path": str(tmp_path / "jobs.db")}},
+    }
+    (tmp_path / "config.json").write_text(json.dumps(config))
+    monkeypatch.chdir(tmp_path)
+    reload_config()
+    sys.modules.pop("github_app.main", None)
+    module = importlib.import_module("github_app.main")
+    monkeypatch.setattr(module, "worker_pool", Mock())
+    yield module
+    sys.modules.pop("github_app.main", None)
+    reload_config()
+
+
+@pytest.mark.parametrize("action, delay", [("synchronize", 30), ("opened", 0)])
+def test_only_pushes_are_debounced(main, action, delay):
+    main.enqueue_job("process_pull_request", make_payload(action), debounce=30)
+    assert main.worker_pool.submit.call_args.kwargs["delay"] == delay
+
+
+def test_superseded_review_is_skipped_before_any_work(main, monkeypatch):
+    process = Mock()
+    monkeypatch.setattr(main, "process_pull_request", process)
+    main.enqueue_job("process_pull_request", make_payload(sha="old"))
+    main.enqueue_job("process_pull_request", make_payload(sha="new"))
+
+    main.run_pull_request_review(make_payload(sha="old"))
+    process.assert_not_called()
+
+    main.run_pull_request_review(make_payload(sha="new"))
+    process.assert_called_once()
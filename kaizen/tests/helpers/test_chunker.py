@@ -0,0 +1,31 @@
+from unittest.mock import Mock
+from kaizen.helpers.chunker import chunk_by_token_budget
+
+
+def test_chunks_preserve_order_within_budget():
+    parts = ["aaaa", "bbb", "cc", "dddddd", "e"]
+    chunks = list(chunk_by_token_budget(parts, 7, len))
+    assert chunks == ["aaaabbb", "cc", "dddddde"]
+
+
+def test_each_part_is_counted_once():
+    counter = Mock(side_effect=len)
+    parts = ["x" * n for n in (3, 4, 5, 1, 2)]
+    list(chunk_by_token_budget(parts, 6, counter))
+    assert counter.call_count == len(parts)
+
+
+def test_oversized_part_is_emitted_alone():
+    chunks = list(chunk_by_token_budget(["ab", "cdefghij", "k"], 4, len))
+    assert chunks == ["ab", "cdefghij", "k"]
+
+
+def test_empty_parts_are_skipped():
+    assert list(chunk_by_token_budget(["", "", ""], 4, len)) == []
+
+
+def test_bin_pack_minimises_chunks():
+    parts = ["aaaaa", "bbb", "cccc", "dd"]
+    assert len(list(chunk_by_token_budget(parts, 7, len))) == 3
+    chunks = list(chunk_by_token_budget(parts, 7, len, bin_pack=True))
+    assert chunks == ["aaaaadd", "bbbcccc"]
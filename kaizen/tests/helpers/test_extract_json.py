@@ -0,0 +1,43 @@
+import json
+import os
+
+import pytest
+
+from kaizen.helpers.parser import extract_json
+
+RESPONSES_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "data", "llm_responses", "code_review.json"
+)
+
+with open(RESPONSES_PATH) as f:
+    RECORDED_RESPONSES = json.load(f)
+
+
+@pytest.mark.parametrize("response", RECORDED_RESPONSES)
+def test_recorded_responses_parse(response):
+    data = extract_json(response)
+    assert isinstance(data["review"], list)
+    assert all(isinstance(issue, dict) for issue in data["review"])
+
+
+def test_fenced_json_is_parsed_directly():
+    text = 'Sure:\n```json\n{"review": [{"topic": "a {b} [c]"}]}\n```'
+    assert extract_json(text) == {"review": [{"topic": "a {b} [c]"}]}
+
+
+def test_raw_control_characters_in_strings_are_escaped():
+    text = '{"code": "if x {\n\treturn y\n}", "quote": "say \\"hi\\"\n"}'
+    assert extract_json(text) == {
+        "code": "if x {\n\treturn y\n}",
+        "quote": 'say "hi"\n',
+    }
+
+
+def test_stray_backslashes_between_tokens_are_dropped():
+    text = '{"a": "x"\\\n, "b": "line\\\nbreak"}'
+    assert extract_json(text) == {"a": "x", "b": "line\nbreak"}
+
+
+def test_invalid_json_still_raises():
+    with pytest.raises(ValueError):
+        extract_json('{"a": }')
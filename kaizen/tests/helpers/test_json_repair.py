@@ -0,0 +1,27 @@
+from kaizen.helpers.parser import repair_json
+
+
+def test_repairs_raw_newlines_and_trailing_commas():
+    text = 'Here you go:\n{"review": [{"comment": "first\nsecond",},], "ok": true,}'
+    assert repair_json(text) == {
+        "review": [{"comment": "first\nsecond"}],
+        "ok": True,
+    }
+
+
+def test_truncated_output_ends_at_last_complete_element():
+    text = '{"review": [{"topic": "a", "line": 1}, {"topic": "b", "comm'
+    assert repair_json(text) == {"review": [{"topic": "a", "line": 1}]}
+
+
+def test_closes_truncated_brackets():
+    assert repair_json('{"review": [{"topic": "a"}]') == {"review": [{"topic": "a"}]}
+
+
+def test_escaped_quotes_and_brackets_in_strings_are_kept():
+    assert repair_json('{"a": "x \\"}\\" ]"}') == {"a": 'x "}" ]'}
+
+
+def test_returns_none_when_unrepairable():
+    assert repair_json("no json here") is None
+    assert repair_json('{"review"') is None
@@ -0,0 +1,63 @@
+from kaizen.helpers.parser import JSONArrayStream, extract_json
+
+RESPONSE = """Here is the review:
+```json
+{
+  "summary": "see [review] below",
+  "review": [
+    {"topic": "Bug", "comment": "Closing \\"}\\" in a string", "lines": [1, 2]},
+    {"topic": "Style", "comment": "multi
+line comment"}
+  ],
+  "code_quality_percentage": 75
+}
+```
+"""
+
+
+def feed_in_pieces(stream, text, size):
+    items = []
+    for i in range(0, len(text), size):
+        items.extend(stream.feed(text[i : i + size]))
+    return items
+
+
+def feed_in_pieces_with_index(stream, text, size):
+    items = []
+    for i in range(0, len(text), size):
+        items.extend(stream.feed(text[i : i + size], with_index=True))
+    return items
+
+
+def test_emits_each_review_item_once_complete():
+    stream = JSONArrayStream()
+    first_item_end = RESPONSE.index("]},") + 2
+
+    assert stream.feed(RESPONSE[: first_item_end - 1]) == []
+    assert stream.feed(RESPONSE[first_item_end - 1 : first_item_end]) == [
+        {"topic": "Bug", "comment": 'Closing "}" in a string', "lines": [1, 2]}
+    ]
+    rest = stream.feed(RESPONSE[first_item_end:])
+    assert rest == [{"topic": "Style", "comment": "multi\nline comment"}]
+    assert stream.text == RESPONSE
+
+
+def test_items_do_not_depend_on_chunking():
+    expected = extract_json(RESPONSE)["review"]
+    for size in (1, 3, 7, len(RESPONSE)):
+        items = feed_in_pieces(JSONArrayStream(), RESPONSE, size)
+        assert [item["topic"] for item in items] == [r["topic"] for r in expected]
+
+
+def test_only_top_level_array_keys_are_streamed():
+    text = (
+        '{"meta": {"review": [{"x": 1}]}, "issues": [{"y": 2}]} {"review": [{"z": 3}]}'
+    )
+    assert feed_in_pieces(JSONArrayStream(), text, 2) == [{"y": 2}]
+
+
+def test_with_index_keeps_identical_items_apart():
+    text = '{"review": [{"x": 1}, {"broken": }, {"x": 1}]}'
+    items = feed_in_pieces_with_index(JSONArrayStream(), text, 4)
+    # The unparseable element still takes up its position in the array.
+    assert items == [(0, {"x": 1}), (2, {"x": 1})]
@@ -0,0 +1,93 @@
+from kaizen.helpers.parser import (
+    LINE_ADDED,
+    LINE_REMOVED,
+    parse_patch,
+    patch_to_combined_chunks,
+)
+
+GIT_DIFF = """From 1234 Mon Sep 17 00:00:00 2001
+Subject: [PATCH] example
+
+---
+ app.py | 2 +-
+diff --git a/app.py b/app.py
+index 1436a23..ffd0282 100644
+--- a/app.py
++++ b/app.py
+@@ -8,3 +8,3 @@ def main():
+ a = 1
+-b = 2
++b = 3
+ c = 4
+diff --git a/new.py b/new.py
+new file mode 100644
+index 0000000..e35d38c
+--- /dev/null
++++ b/new.py
+@@ -0,0 +1,2 @@
++x = 1
++y = 2
+\\ No newline at end of file
+diff --git a/old.py b/old.py
+deleted file mode 100644
+index e35d38c..0000000
+--- a/old.py
++++ /dev/null
+@@ -1 +0,0 @@
+-gone = True
+-- 
+2.39.0
+"""
+
+
+def test_parse_git_diff_files():
+    files = parse_patch(GIT_DIFF)
+    assert [(f.path, f.status) for f in files] == [
+        ("app.py", "modified"),
+        ("new.py", "added"),
+        ("old.py", "removed"),
+    ]
+    # The format-patch trailer is not mistaken for a removed line.
+    assert len(files[2].hunks[0].lines) == 1
+
+
+def test_line_numbers_and_offsets():
+    hunk = parse_patch(GIT_DIFF)[0].hunks[0]
+    assert (hunk.old_start, hunk.new_start, hunk.section) == (8, 8, "def main():")
+    removed, added = hunk.lines[1], hunk.lines[2]
+    assert (removed.kind, removed.old_lineno, removed.new_lineno) == (
+        LINE_REMOVED,
+        9,
+        None,
+    )
+    assert (added.kind, added.old_lineno, added.new_lineno) == (LINE_ADDED, None, 9)
+    assert GIT_DIFF[added.start : added.end] == "+b = 3"
+    assert hunk.text.startswith("@@ -8,3 +8,3 @@") and hunk.text.endswith(" c = 4")
+
+
+def test_file_patch_matches_per_file_format():
+    files = parse_patch(GIT_DIFF)
+    assert (
+        files[1].patch
+        == "@@ -0,0 +1,2 @@\n+x = 1\n+y = 2\n\\ No newline at end of file"
+    )
+    reparsed = parse_patch(files[0].patch)
+    assert reparsed[0].path is None
+    assert len(reparsed[0].hunks[0].lines) == 4
+
+
+def test_combined_chunks_accepts_parsed_files():
+    patch = "@@ -8,3 +8,3 @@ def main():\n a = 1\n-b = 2\n+b = 3\n c = 4"
+    expected = "\n".join(
+        [
+            "\n",
+            "[LINE 8    ] [CONTEXT] def main():",
+            "[LINE 8    ] [CONTEXT]  a = 1",
+            "[LINE 9    ] [REMOVED] b = 2",
+            "[LINE 9    ] [UPDATED] b = 3",
+            "[LINE 10   ] [CONTEXT]  c = 4",
+        ]
+    )
+    assert patch_to_combined_chunks(patch) == expected
+    assert patch_to_combined_chunks(parse_patch(patch)) == expected
+    assert "[REMOVED]" not in patch_to_combined_chunks(patch, ignore_deletions=True)
@@ -0,0 +1,75 @@
+import asyncio
+import json
+from unittest.mock import Mock, patch
+
+import httpx
+import litellm
+import pytest
+
+from kaizen.helpers.general import (
+    RetryPolicy,
+    is_transient_error,
+    retry_after_seconds,
+)
+
+
+def rate_limit_error(headers=None):
+    response = httpx.Response(
+        429, headers=headers or {}, request=httpx.Request("POST", "http://llm")
+    )
+    return litellm.RateLimitError("slow down", "openai", "gpt-4o-mini", response)
+
+
+def test_classifies_transient_and_deterministic_errors():
+    assert is_transient_error(rate_limit_error())
+    assert is_transient_error(ConnectionError("reset"))
+    assert is_transient_error(litellm.Timeout("timed out", "gpt-4o-mini", "openai"))
+    assert not is_transient_error(ValueError("bad json"))
+    assert not is_transient_error(TypeError("bug"))
+
+
+def test_retry_after_header_is_honoured():
+    error = rate_limit_error({"retry-after": "7"})
+    assert retry_after_seconds(error) == 7
+    policy = RetryPolicy(base_delay=0.1, max_delay=30)
+    assert policy.delay(1, error) == 7
+    assert RetryPolicy(max_delay=5).delay(1, error) == 5
+
+
+def test_backoff_is_exponential_with_full_jitter():
+    policy = RetryPolicy(base_delay=1, max_delay=10)
+    with patch("kaizen.helpers.general.random.uniform", side_effect=lambda a, b: b):
+        assert [policy.delay(attempt) for attempt in range(1, 6)] == [1, 2, 4, 8, 10]
+
+
+@patch("kaizen.helpers.general.time.sleep")
+def test_retries_only_transient_errors(mock_sleep):
+    policy = RetryPolicy(max_attempts=3, base_delay=0.1)
+    flaky = Mock(side_effect=[ConnectionError("reset"), "ok"])
+    assert policy(flaky)() == "ok"
+    assert flaky.call_count == 2
+    assert mock_sleep.call_count == 1
+
+    broken = Mock(side_effect=json.JSONDecodeError("bad", "", 0))
+    with pytest.raises(json.JSONDecodeError):
+        policy.call(broken)
+    assert broken.call_count == 1
+
+    down = Mock(side_effect=ConnectionError("down"))
+    with pytest.raises(ConnectionError):
+        policy.call(down)
+    assert down.call_count == 3
+
+
+def test_async_functions_are_retried_without_blocking():
+    calls = []
+
+    @RetryPolicy(max_attempts=2, base_delay=0)
+    async def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise asyncio.TimeoutError()
+        return "ok"
+
+    assert asyncio.run(flaky()) == "ok"
+    assert len(calls) == 2
@@ -0,0 +1,70 @@
+from unittest.mock import patch
+from kaizen.llms.cache import (
+    InMemoryCache,
+    SQLiteCache,
+    create_response_cache,
+    make_cache_key,
+)
+from kaizen.llms.provider import LLMProvider
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def test_cache_key_is_stable_and_param_sensitive():
+    key = make_cache_key("default", MESSAGES, {"temperature": 0})
+    assert key == make_cache_key("default", MESSAGES, {"temperature": 0})
+    assert key != make_cache_key("default", MESSAGES, {"temperature": 0.3})
+    assert key != make_cache_key("best", MESSAGES, {"temperature": 0})
+
+
+def test_in_memory_cache_evicts_least_recently_used():
+    cache = InMemoryCache(max_entries=2)
+    cache.set("a", {"content": "a"})
+    cache.set("b", {"content": "b"})
+    cache.get("a")
+    cache.set("c", {"content": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"content": "a"}
+
+
+def test_in_memory_cache_expires_entries():
+    cache = InMemoryCache(ttl=10)
+    with patch("kaizen.llms.cache.time.time", return_value=100):
+        cache.set("a", {"content": "a"})
+    with patch("kaizen.llms.cache.time.time", return_value=111):
+        assert cache.get("a") is None
+
+
+def test_sqlite_cache_round_trip_and_eviction(tmp_path):
+    cache = SQLiteCache(path=str(tmp_path / "cache.db"), max_entries=2)
+    cache.set("a", {"content": "a"})
+    cache.set("b", {"content": "b"})
+    cache.set("c", {"content": "c"})
+    assert cache.get("a") is None
+    assert cache.get("c") == {"content": "c"}
+    cache.delete("c")
+    assert cache.get("c") is None
+
+
+def test_create_response_cache_from_config():
+    assert create_response_cache({}) is None
+    cache = create_response_cache({"cache": {"enabled": True}})
+    assert isinstance(cache, InMemoryCache)
+
+
+def test_provider_serves_repeated_prompt_from_cache():
+    provider = LLMProvider(cache=InMemoryCache())
+    response = {
+        "model": "gpt-4o-mini",
+        "choices": [{"message": {"content": "response"}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 10, "total_tokens": 20},
+    }
+    with patch.object(
+        provider.provider, "completion", return_value=response
+    ) as mock_completion:
+        first, first_usage = provider.chat_completion("test prompt")
+        second, second_usage = provider.chat_completion("test prompt")
+
+    assert mock_completion.call_count == 1
+    assert first == second == "response"
+    assert second_usage["total_tokens"] == 0
@@ -0,0 +1,72 @@
+import asyncio
+from unittest.mock import patch
+
+import litellm
+import pytest
+
+from kaizen.llms.limits import (
+    AdaptiveConcurrency,
+    ModelGroupLimiter,
+    TokenBucket,
+    is_overload_error,
+)
+
+
+def test_token_bucket_delays_once_the_quota_is_used():
+    with patch("kaizen.llms.limits.time.monotonic", return_value=100.0):
+        bucket = TokenBucket(per_minute=600)
+        assert bucket.reserve(500) == 0
+        assert bucket.reserve(100) == 0
+        # 10 tokens per second refill, so 50 more tokens take 5 seconds.
+        assert bucket.reserve(50) == pytest.approx(5.0)
+
+
+def test_token_bucket_caps_oversized_requests_and_adjusts_usage():
+    with patch("kaizen.llms.limits.time.monotonic", return_value=100.0):
+        bucket = TokenBucket(per_minute=60)
+        assert bucket.reserve(1000) == 0
+        bucket.adjust(30)
+        assert bucket.reserve(0) == pytest.approx(30.0)
+
+
+def test_adaptive_concurrency_halves_on_overload_and_recovers():
+    concurrency = AdaptiveConcurrency(max_limit=8)
+    assert concurrency.try_acquire()
+    concurrency.release(succeeded=False, overloaded=True)
+    assert concurrency.limit == 4
+    # A burst of failures from the same overload only backs off once.
+    assert concurrency.try_acquire()
+    concurrency.release(succeeded=False, overloaded=True)
+    assert concurrency.limit == 4
+
+    for _ in range(4):
+        assert concurrency.try_acquire()
+        concurrency.release()
+    assert concurrency.limit == pytest.approx(5, abs=0.1)
+
+
+def test_adaptive_concurrency_blocks_at_the_limit():
+    concurrency = AdaptiveConcurrency(max_limit=1)
+    assert concurrency.try_acquire()
+    assert not concurrency.try_acquire()
+    concurrency.release()
+    assert concurrency.try_acquire()
+
+
+def test_limiter_backs_off_on_rate_limit_errors():
+    limiter = ModelGroupLimiter(max_concurrency=4)
+    error = litellm.RateLimitError("slow down", "openai", "gpt-4o-mini")
+    assert is_overload_error(error)
+
+    async def call():
+        async with limiter.alimit(10):
+            raise error
+
+    with pytest.raises(litellm.RateLimitError):
+        asyncio.run(call())
+    assert limiter.concurrency.limit == 2
+
+    with pytest.raises(ValueError):
+        with limiter.limit(10):
+            raise ValueError("bad prompt")
+    assert limiter.concurrency.limit == 2
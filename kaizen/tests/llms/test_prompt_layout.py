@@ -0,0 +1,30 @@
+from kaizen.llms.prompt_layout import PromptLayout
+
+
+def make_layout(diff):
+    return PromptLayout(
+        system="system", prefix=["instructions", "rules", ""], suffix=diff
+    )
+
+
+def test_plain_messages_put_the_variable_part_last():
+    messages = make_layout("diff").messages()
+    assert messages == [
+        {"role": "system", "content": "system"},
+        {"role": "user", "content": "instructions\nrules\ndiff"},
+    ]
+
+
+def test_cache_control_marks_the_end_of_the_stable_prefix():
+    first = make_layout("diff 1").messages(cache_control=True)
+    second = make_layout("diff 2").messages(cache_control=True)
+
+    prefix_block, diff_block = first[1]["content"]
+    assert prefix_block == {
+        "type": "text",
+        "text": "instructions\nrules",
+        "cache_control": {"type": "ephemeral"},
+    }
+    assert diff_block == {"type": "text", "text": "diff 1"}
+    assert first[:1] == second[:1]
+    assert first[1]["content"][0] == second[1]["content"][0]
@@ -1,6 +1,9 @@
+import asyncio
+from types import SimpleNamespace
 import pytest
-from unittest.mock import patch
-from kaizen.llms.provider import LLMProvider
+from unittest.mock import AsyncMock, patch
+from kaizen.llms import registry
+from kaizen.llms.provider import DEFAULT_MAX_TOKENS, LLMProvider
 
 
 @pytest.fixture
@@ -18,7 +21,10 @@ def mock_config_data():
 
 @pytest.fixture
 def llm_provider(mock_config_data):
-    return LLMProvider()
+    # Token counts are memoized process-wide; tests patch the tokenizer.
+    registry.clear()
+    yield LLMProvider()
+    registry.clear()
 
 
 def test_initialization(llm_provider):
@@ -64,7 +70,199 @@ def test_available_tokens(mock_get_max_tokens, mock_token_counter, llm_provider)
     assert llm_provider.available_tokens("test message") == 20
 
 
+@patch("kaizen.llms.provider.litellm.token_counter")
+@patch("kaizen.llms.provider.litellm.get_max_tokens")
+def test_available_tokens_for_unknown_model(
+    mock_get_max_tokens, mock_token_counter, llm_provider
+):
+    mock_token_counter.return_value = 100
+    mock_get_max_tokens.side_effect = Exception("unknown model")
+    assert llm_provider.available_tokens("test message") == (
+        int(DEFAULT_MAX_TOKENS * 0.8) - 100
+    )
+
+
+def test_providers_share_token_counts(llm_provider):
+    assert LLMProvider().token_counter is llm_provider.token_counter
+
+
+def test_providers_share_rate_quota_but_not_concurrency(llm_provider):
+    other = LLMProvider(max_concurrency=2)
+    limiter, _ = llm_provider._get_limiter([], {"model": "default"})
+    other_limiter, _ = other._get_limiter([], {"model": "default"})
+
+    assert limiter.quota is other_limiter.quota
+    assert limiter.concurrency is not other_limiter.concurrency
+    assert other_limiter.concurrency.max_limit == 2
+
+
 @patch("kaizen.llms.provider.litellm.token_counter")
 def test_get_token_count(mock_token_counter, llm_provider):
     mock_token_counter.return_value = 50
     assert llm_provider.get_token_count("test message") == 50
+
+
+def test_achat_completion(llm_provider):
+    mock_response = {
+        "model": "gpt-4o-mini",
+        "choices": [{"message": {"content": "response"}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 10},
+    }
+    with patch.object(
+        llm_provider.provider, "acompletion", AsyncMock(return_value=mock_response)
+    ):
+        response, usage = asyncio.run(llm_provider.achat_completion("test prompt"))
+    assert response == "response"
+    assert usage["prompt_tokens"] == 10
+
+
+def test_achat_completion_respects_max_concurrency(llm_provider):
+    llm_provider.max_concurrency = 2
+    in_flight = 0
+    peak = 0
+
+    async def fake_acompletion(**kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {
+            "model": "gpt-4o-mini",
+            "choices": [{"message": {"content": "{}"}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1},
+        }
+
+    async def run():
+        return await asyncio.gather(
+            *[llm_provider.achat_completion_with_json(str(i)) for i in range(6)]
+        )
+
+    with patch.object(llm_provider.provider, "acompletion", fake_acompletion):
+        results = asyncio.run(run())
+    assert len(results) == 6
+    assert peak == 2
+
+
+def test_chat_completion_is_stateless(llm_provider):
+    default_model = llm_provider.model
+    mock_response = {
+        "model": "gpt-4o",
+        "choices": [{"message": {"content": "response"}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+    }
+    with patch.object(
+        llm_provider.provider, "completion", return_value=mock_response
+    ) as mock_completion:
+        _, usage = llm_provider.chat_completion(
+            "test prompt", system_prompt="per-call prompt"
+        )
+
+    messages = mock_completion.call_args.kwargs["messages"]
+    assert messages[0] == {"role": "system", "content": "per-call prompt"}
+    assert usage["model"] == "gpt-4o"
+    assert llm_provider.model == default_model
+    assert llm_provider.get_usage_model(usage) == "gpt-4o"
+
+    total = llm_provider.update_usage(dict(llm_provider.DEFAULT_USAGE), usage)
+    assert total == {
+        "prompt_tokens": 10,
+        "completion_tokens": 5,
+        "total_tokens": 15,
+        "model": "gpt-4o",
+    }
+
+
+def _stream_chunk(content=None, usage=None):
+    delta = SimpleNamespace(content=content)
+    choices = [SimpleNamespace(delta=delta)] if content is not None else []
+    return SimpleNamespace(model="gpt-4o", choices=choices, usage=usage)
+
+
+def test_chat_completion_with_json_stream_reports_items_as_they_arrive(llm_provider):
+    pieces = [
+        '{"review": [{"a"',
+        ": 1}",
+        ', {"b": 2}',
+        '], "code_quality_percentage": 90}',
+    ]
+    reported = []
+
+    def fake_completion(**kwargs):
+        assert kwargs["stream"] is True
+        for i, piece in enumerate(pieces):
+            yield _stream_chunk(piece)
+            # Items must be reported before the rest of the stream is read.
+            if i == 1:
+                assert reported == [{"a": 1}]
+        yield _stream_chunk(
+            usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5)
+        )
+
+    with patch.object(llm_provider.provider, "completion", fake_completion):
+        response, usage = llm_provider.chat_completion_with_json_stream(
+            "test prompt", on_item=reported.append
+        )
+
+    assert reported == [{"a": 1}, {"b": 2}]
+    assert response["code_quality_percentage"] == 90
+    assert usage == {
+        "prompt_tokens": 10,
+        "completion_tokens": 5,
+        "total_tokens": 15,
+        "model": "gpt-4o",
+    }
+
+
+def test_chat_completion_with_json_stream_reports_identical_items(llm_provider):
+    reported = []
+
+    def fake_completion(**kwargs):
+        yield _stream_chunk('{"review": [{"a": 1}, {"a": 1}]}')
+        yield _stream_chunk(
+            usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5)
+        )
+
+    with patch.object(llm_provider.provider, "completion", fake_completion):
+        llm_provider.chat_completion_with_json_stream(
+            "test prompt", on_item=reported.append
+        )
+
+    assert reported == [{"a": 1}, {"a": 1}]
+
+
+def test_chat_completion_with_json_repairs_locally(llm_provider):
+    mock_response = {
+        "model": "gpt-4o",
+        "choices": [{"message": {"content": '{"review": [{"a": 1},], "b": "x\ny"'}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+    }
+    with patch.object(
+        llm_provider.provider, "completion", return_value=mock_response
+    ) as mock_completion:
+        response, usage = llm_provider.chat_completion_with_json("test prompt")
+
+    assert response == {"review": [{"a": 1}], "b": "x\ny"}
+    assert mock_completion.call_count == 1
+    assert usage["total_tokens"] == 15
+
+
+def test_chat_completion_with_json_asks_for_a_short_correction(llm_provider):
+    def completion(content, total_tokens):
+        return {
+            "model": "gpt-4o",
+            "choices": [{"message": {"content": content}}],
+            "usage": {"prompt_tokens": total_tokens, "total_tokens": total_tokens},
+        }
+
+    responses = [completion("{'review': oops}", 5000), completion('{"review": []}', 20)]
+    with patch.object(
+        llm_provider.provider, "completion", side_effect=responses
+    ) as mock_completion:
+        response, usage = llm_provider.chat_completion_with_json("long prompt")
+
+    assert response == {"review": []}
+    repair_messages = mock_completion.call_args.kwargs["messages"]
+    assert "long prompt" not in repair_messages[1]["content"]
+    assert "{'review': oops}" in repair_messages[1]["content"]
+    assert usage["total_tokens"] == 5020
@@ -0,0 +1,35 @@
+from unittest.mock import patch
+from kaizen.llms import registry
+
+
+def make_kwargs(model):
+    return {
+        "model_list": [{"model_name": "default", "litellm_params": {"model": model}}],
+        "allowed_fails": 1,
+        "routing_strategy": "simple-shuffle",
+    }
+
+
+def test_get_router_reuses_router_per_config():
+    registry.clear()
+    with patch.object(registry, "Router") as MockRouter:
+        MockRouter.side_effect = lambda **kwargs: object()
+        first = registry.get_router(make_kwargs("gpt-4o-mini"))
+        second = registry.get_router(make_kwargs("gpt-4o-mini"))
+        other = registry.get_router(make_kwargs("gpt-4o"))
+    registry.clear()
+
+    assert first is second
+    assert other is not first
+    assert MockRouter.call_count == 2
+
+
+def test_get_response_cache_is_shared():
+    registry.clear()
+    config = {"cache": {"enabled": True, "backend": "memory"}}
+    cache = registry.get_response_cache(config)
+    cache.set("key", {"content": "value"})
+
+    assert registry.get_response_cache(dict(config)).get("key") == {"content": "value"}
+    assert registry.get_response_cache({}) is None
+    registry.clear()
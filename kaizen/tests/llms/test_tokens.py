@@ -0,0 +1,53 @@
+from unittest.mock import patch
+
+from kaizen.llms.tokens import TokenCounter
+
+
+@patch("kaizen.llms.tokens.litellm.token_counter", return_value=42)
+def test_count_text_is_memoized_per_model(mock_token_counter):
+    counter = TokenCounter()
+
+    assert counter.count_text("gpt-4o", "some diff") == 42
+    assert counter.count_text("gpt-4o", "some diff") == 42
+    assert mock_token_counter.call_count == 1
+
+    counter.count_text("gpt-4o-mini", "some diff")
+    assert mock_token_counter.call_count == 2
+
+
+@patch("kaizen.llms.tokens.litellm.token_counter", return_value=7)
+def test_count_messages_is_memoized(mock_token_counter):
+    counter = TokenCounter()
+    messages = [
+        {"role": "system", "content": "system"},
+        {"role": "user", "content": "prompt"},
+    ]
+
+    counter.count_messages("gpt-4o", messages)
+    counter.count_messages("gpt-4o", [dict(m) for m in messages])
+    assert mock_token_counter.call_count == 1
+
+
+@patch("kaizen.llms.tokens.litellm.token_counter", side_effect=lambda **kw: 1)
+def test_count_cache_is_bounded(mock_token_counter):
+    counter = TokenCounter(max_entries=2)
+
+    counter.count_text("gpt-4o", "a")
+    counter.count_text("gpt-4o", "b")
+    counter.count_text("gpt-4o", "a")
+    counter.count_text("gpt-4o", "c")
+    assert len(counter._counts) == 2
+    assert mock_token_counter.call_count == 3
+
+    # "b" was least recently used and got evicted.
+    counter.count_text("gpt-4o", "b")
+    assert mock_token_counter.call_count == 4
+
+
+@patch("kaizen.llms.tokens.litellm.get_max_tokens", side_effect=Exception("unknown"))
+def test_max_tokens_failure_is_memoized(mock_get_max_tokens):
+    counter = TokenCounter()
+
+    assert counter.max_tokens("custom/model") is None
+    assert counter.max_tokens("custom/model") is None
+    assert mock_get_max_tokens.call_count == 1
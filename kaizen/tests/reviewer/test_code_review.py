@@ -0,0 +1,185 @@
+import asyncio
+from unittest.mock import Mock
+import pytest
+from kaizen.reviewer.code_review import CodeReviewer, ReviewCancelled
+from kaizen.llms.provider import LLMProvider
+
+
+def make_reviewer():
+    provider = Mock(spec=LLMProvider)
+    provider.max_concurrency = 4
+    provider.update_usage.side_effect = lambda total, current: {
+        key: total[key] + current[key] for key in total
+    }
+    reviewer = CodeReviewer(llm_provider=provider)
+    reviewer.custom_rules = ""
+    reviewer.files_processed = 0
+    return reviewer, provider
+
+
+def test_aprocess_files_keeps_chunk_order_and_min_quality():
+    reviewer, provider = make_reviewer()
+    chunks = ["chunk-0", "chunk-1", "chunk-2"]
+    reviewer._chunk_files_generator = Mock(return_value=iter(chunks))
+    qualities = {"chunk-0": 80, "chunk-1": 60, "chunk-2": 90}
+    delays = {"chunk-0": 0.03, "chunk-1": 0.0, "chunk-2": 0.01}
+
+    async def fake_completion(prompt, **kwargs):
+        chunk = next(c for c in chunks if c in prompt)
+        await asyncio.sleep(delays[chunk])
+        return (
+            {
+                "review": [{"description": chunk}],
+                "code_quality_percentage": qualities[chunk],
+            },
+            {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        )
+
+    provider.achat_completion_with_json.side_effect = fake_completion
+    reviews, quality = asyncio.run(
+        reviewer._aprocess_files([], "title", "desc", None, False, "", 2)
+    )
+
+    assert [r["description"] for r in reviews] == chunks
+    assert quality == 60
+    assert reviewer.total_usage["total_tokens"] == 6
+
+
+def test_review_pull_request_flags_sensitive_files():
+    reviewer, provider = make_reviewer()
+    provider.model = "default"
+    provider.available_tokens.return_value = 1000
+    provider.get_token_count.side_effect = len
+    provider.get_usage_cost.return_value = (0, 0)
+    provider.chat_completion_with_json.return_value = (
+        {"review": [], "code_quality_percentage": 90},
+        {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    )
+    files = [
+        {"filename": "app.py", "patch": "@@ -1 +1 @@\n-a\n+b"},
+        {"filename": "config.json", "patch": "@@ -3 +3 @@\n-x\n+y"},
+    ]
+
+    output = reviewer.review_pull_request(
+        diff_text="",
+        pull_request_title="title",
+        pull_request_desc="desc",
+        pull_request_files=files,
+        check_sensetive=True,
+    )
+
+    assert output.file_count == 2
+    assert output.code_quality == 90
+    assert [issue["start_line"] for issue in output.issues] == [3]
+
+
+def test_parallel_review_inside_event_loop():
+    reviewer, provider = make_reviewer()
+    provider.available_tokens.return_value = 1000
+    provider.get_token_count.side_effect = len
+    provider.get_usage_cost.return_value = (0, 0)
+    result = (
+        {"review": [], "code_quality_percentage": 90},
+        {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    )
+    provider.chat_completion_with_json.return_value = result
+
+    async def fake_completion(prompt, **kwargs):
+        return result
+
+    provider.achat_completion_with_json.side_effect = fake_completion
+    files = [{"filename": "app.py", "patch": "@@ -1 +1 @@\n-a\n+b"}]
+
+    async def review():
+        # asyncio.run cannot be nested, so the sync API falls back to the
+        # sequential path while the async API awaits the chunks directly.
+        sync_output = reviewer.review_pull_request(
+            "", "title", "desc", files, parallel=True
+        )
+        async_output = await reviewer.areview_pull_request("", "title", "desc", files)
+        return sync_output, async_output
+
+    sync_output, async_output = asyncio.run(review())
+
+    assert sync_output.code_quality == async_output.code_quality == 90
+    assert provider.chat_completion_with_json.call_count == 1
+    assert provider.achat_completion_with_json.call_count == 1
+
+
+def test_review_pull_request_stops_between_llm_calls_when_cancelled():
+    reviewer, provider = make_reviewer()
+    provider.available_tokens.return_value = 10
+    provider.get_token_count.side_effect = len
+    provider.chat_completion_with_json.return_value = (
+        {"review": [], "code_quality_percentage": 90},
+        {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    )
+    files = [
+        {"filename": f"file{i}.py", "patch": "@@ -1 +1 @@\n-a\n+b"} for i in range(3)
+    ]
+
+    with pytest.raises(ReviewCancelled):
+        reviewer.review_pull_request(
+            diff_text="",
+            pull_request_title="title",
+            pull_request_desc="desc",
+            pull_request_files=files,
+            is_cancelled=lambda: provider.chat_completion_with_json.call_count >= 1,
+        )
+
+    assert provider.chat_completion_with_json.call_count == 1
+
+
+def test_review_pull_request_streams_issues_to_on_issue():
+    reviewer, provider = make_reviewer()
+    provider.is_inside_token_limit.return_value = True
+    provider.get_usage_cost.return_value = (0, 0)
+    issues = [{"topic": "Bug", "category": "Bug"}]
+
+    def fake_stream(prompt, on_item, **kwargs):
+        for issue in issues:
+            on_item(issue)
+        return (
+            {"review": issues, "code_quality_percentage": 70},
+            {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        )
+
+    provider.chat_completion_with_json_stream.side_effect = fake_stream
+    streamed = []
+    output = reviewer.review_pull_request(
+        diff_text="@@ -1 +1 @@\n-a\n+b",
+        pull_request_title="title",
+        pull_request_desc="desc",
+        pull_request_files=[],
+        on_issue=streamed.append,
+    )
+
+    assert streamed == issues
+    assert output.issues == issues
+    provider.chat_completion_with_json.assert_not_called()
+
+
+def test_chunk_prompts_share_a_stable_prefix():
+    reviewer, provider = make_reviewer()
+    reviewer.custom_rules = "Use snake_case."
+    provider.layout_messages.side_effect = lambda layout, model: layout.messages(
+        cache_control=True
+    )
+    provider.chat_completion_with_json.return_value = (
+        {"review": []},
+        {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    )
+
+    for chunk in ("diff of chunk 1", "diff of chunk 2"):
+        reviewer._process_file_chunk(chunk, "title", "desc", None, False, "repo ctx")
+
+    calls = provider.chat_completion_with_json.call_args_list
+    prefixes = [call.kwargs["messages"][1]["content"][0] for call in calls]
+    assert prefixes[0] == prefixes[1]
+    assert "Use snake_case." in prefixes[0]["text"]
+    assert prefixes[0]["text"].endswith("repo ctx")
+    assert (
+        calls[1]
+        .kwargs["messages"][1]["content"][1]["text"]
+        .endswith("```diff of chunk 2```\n")
+    )
@@ -0,0 +1,76 @@
+from unittest.mock import Mock
+from kaizen.llms.cache import InMemoryCache
+from kaizen.llms.provider import LLMProvider
+from kaizen.reviewer.code_review import CodeReviewer
+from kaizen.reviewer.incremental import HunkReviewStore, split_hunks
+
+FIRST_PATCH = """@@ -1,2 +1,3 @@ def main():
+ a = 1
++b = 2
+ c = 3
+@@ -10,2 +11,3 @@ def helper():
+ x = 1
++y = 2
+ z = 3"""
+
+# The first hunk grew by two lines, which shifts the untouched second hunk.
+SECOND_PATCH = """@@ -1,2 +1,5 @@ def main():
+ a = 1
++b = 2
++b2 = 2
++b3 = 2
+ c = 3
+@@ -10,2 +13,3 @@ def helper():
+ x = 1
++y = 2
+ z = 3"""
+
+
+def test_fingerprint_ignores_hunk_position():
+    first = split_hunks("app.py", FIRST_PATCH)
+    second = split_hunks("app.py", SECOND_PATCH)
+    assert first[0].fingerprint != second[0].fingerprint
+    assert first[1].fingerprint == second[1].fingerprint
+    assert (second[1].new_start, second[1].new_end) == (13, 15)
+
+
+def test_incremental_review_only_sends_changed_hunks():
+    provider = Mock(spec=LLMProvider)
+    provider.available_tokens.return_value = 10000
+    provider.get_token_count.side_effect = len
+    provider.get_usage_cost.return_value = (0, 0)
+    provider.update_usage.side_effect = lambda total, current: total
+    provider.model = "gpt-4o-mini"
+    reviewer = CodeReviewer(llm_provider=provider)
+    store = HunkReviewStore(InMemoryCache())
+
+    def issue(line):
+        return {
+            "category": "bug",
+            "file_path": "app.py",
+            "start_line": line,
+            "end_line": line,
+        }
+
+    provider.chat_completion_with_json.return_value = (
+        {"review": [issue(2), issue(12)], "code_quality_percentage": 70},
+        {},
+    )
+    first = reviewer.review_pull_request_incremental(
+        "title", "desc", [{"filename": "app.py", "patch": FIRST_PATCH}], store, "pr#1"
+    )
+    assert len(first.issues) == 2
+    assert store.load("pr#1")["hunks"] == {}
+    store.save("pr#1", first.hunk_issues, first.code_quality)
+
+    provider.chat_completion_with_json.reset_mock()
+    provider.chat_completion_with_json.return_value = ({"review": []}, {})
+    second = reviewer.review_pull_request_incremental(
+        "title", "desc", [{"filename": "app.py", "patch": SECOND_PATCH}], store, "pr#1"
+    )
+
+    prompt = provider.chat_completion_with_json.call_args[0][0]
+    assert "b3 = 2" in prompt
+    assert "y = 2" not in prompt
+    assert second.issues == [dict(issue(14), cached=True)]
+    assert second.code_quality == 70
@@ -0,0 +1,46 @@
+import json
+import os
+import pytest
+from kaizen.utils import config
+from kaizen.utils.config import ConfigData, reload_config
+
+
+@pytest.fixture
+def config_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config, "CONFIG_FILE_PATH", str(tmp_path / "missing.json"))
+    reload_config()
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"language_model": {"provider": "a"}}))
+    yield path
+    reload_config()
+
+
+def test_config_is_read_once_until_file_changes(config_file, monkeypatch):
+    assert ConfigData().get_language_model_config()["provider"] == "a"
+
+    loads = []
+    with monkeypatch.context() as m:
+        m.setattr(config.json, "loads", lambda text: loads.append(text) or {})
+        ConfigData()
+    assert loads == []
+
+    config_file.write_text(json.dumps({"language_model": {"provider": "bb"}}))
+    stat = config_file.stat()
+    os.utime(config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert ConfigData().get_language_model_config()["provider"] == "bb"
+
+
+def test_update_config_data_does_not_leak_into_cache(config_file):
+    ConfigData().update_config_data({"github_app": {"auto_pr_review": True}})
+    assert "github_app" not in ConfigData().get_config_data()
+
+
+def test_reload_config_forces_read(config_file):
+    ConfigData()
+    config_file.write_text(json.dumps({"language_model": {"provider": "b"}}))
+    stat = config_file.stat()
+    # Same size and mtime: only an explicit reload picks up the change.
+    os.utime(config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    reload_config()
+    assert ConfigData().get_language_model_config()["provider"] == "b"
@@ -1,18 +1,57 @@
 import json
-from pathlib import Path
 import os
+import threading
+
+CONFIG_LOCAL_PATH = "config.json"
+CONFIG_FILE_PATH = "~/.kaizen_config.json"
+
+_config_cache = {"key": None, "data": None}
+_config_cache_lock = threading.Lock()
+
+
+def _find_config_file():
+    for path in (CONFIG_LOCAL_PATH, os.path.expanduser(CONFIG_FILE_PATH)):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        return path, stat.st_mtime_ns, stat.st_size
+    return None
+
+
+def load_config_file():
+    """
+    Return the parsed config file, re-reading it only when its path, mtime
+    or size changed since the last call. The result is shared by every
+    ConfigData in the process and must not be mutated.
+    """
+    key = _find_config_file()
+    if key is None:
+        return None
+    with _config_cache_lock:
+        if _config_cache["key"] == key:
+            return _config_cache["data"]
+        with open(key[0], "r") as f:
+            data = json.loads(f.read())
+        _config_cache["key"] = key
+        _config_cache["data"] = data
+        return data
+
+
+def reload_config():
+    """Drop the cached config so the next ConfigData reads it from disk."""
+    with _config_cache_lock:
+        _config_cache["key"] = None
+        _config_cache["data"] = None
 
 
 class ConfigData:
     def __init__(self, config_data=None):
-        config_local_path = "config.json"
-        config_file_path = os.path.expanduser("~/.kaizen_config.json")
-        if Path(config_local_path).is_file():
-            with open(config_local_path, "r") as f:
-                self.config_data = json.loads(f.read())
-        elif Path(config_file_path).is_file():
-            with open(config_file_path, "r") as f:
-                self.config_data = json.loads(f.read())
+        file_config = load_config_file()
+        if file_config is not None:
+            # update_config_data only replaces top-level sections, so a shallow
+            # copy keeps instances from leaking updates into the shared cache.
+            self.config_data = dict(file_config)
         else:
             self.config_data = {
                 "language_model": {